@@ -11,9 +11,10 @@
 # limitations under the License.
 
 import time
-from threading import Lock
+from threading import Condition, Lock, Thread
 from typing import List, Tuple, Union, Optional
 
+from ovos_audio.config import ConfigStore, get_config_store
 from ovos_audio.utils import require_default_session
 from ovos_bus_client.message import Message
 from ovos_bus_client.message import dig_for_message
@@ -66,13 +67,20 @@ class AudioService:
         to be played.
     """
 
-    def __init__(self, bus, autoload=True, disable_ocp=False, validate_source=True):
+    def __init__(self, bus, autoload=True, disable_ocp=False, validate_source=True,
+                 config_store: Optional[ConfigStore] = None):
         """
             Args:
                 bus: Mycroft messagebus
+                config_store: source of the "Audio" config, the shared store
+                    reloaded from mycroft.conf if not set
         """
         self.bus = bus
-        self.config = Configuration().get("Audio") or {}
+        if config_store is None:
+            config_store = get_config_store()
+            # pick up changes made before the config watcher was registered
+            config_store.reload(Configuration())
+        self.config = config_store.snapshot.section("Audio").thaw()
         self.service_lock = Lock()
 
         self.default = None
@@ -85,9 +93,22 @@ class AudioService:
         self.disable_ocp = disable_ocp
         self.validate_source = validate_source
         self._loaded = MonotonicEvent()
+        self._plugin_order = []
+        self._plugin_backends = {}  # plugin name -> loaded backends
+        self.load_times = {}  # plugin name -> seconds
+        self._loading = set()  # plugins whose loader thread is still running
+        self._load_done = Condition()
+        self._shutting_down = False
+        config_store.subscribe(self.handle_config_change, sections=["Audio"])
         if autoload:
             self.load_services()
 
+    def handle_config_change(self, snapshot, changes):
+        """backends are only loaded at startup, the default can be changed live"""
+        self.config = snapshot.section("Audio").thaw()
+        if "default-backend" in changes["Audio"] and self.service:
+            self.find_default()
+
     def find_ocp(self):
         if self.disable_ocp:
             LOG.info("classic OCP is disabled in config, OCP bus api not available!")
@@ -100,7 +121,7 @@ class AudioService:
             LOG.debug("classic OCP not installed")
             return False
         # config from legacy location in default mycroft.conf
-        ocp_config = Configuration().get("Audio", {}).get("backends", {}).get("OCP", {})
+        ocp_config = (self.config.get("backends") or {}).get("OCP", {})
         self.ocp = OCPAudioBackend(ocp_config, bus=self.bus)
         try:
             self.ocp.player.validate_source = self.validate_source
@@ -124,35 +145,93 @@ class AudioService:
             self.default = self.service[0]
             LOG.info(f'preferred audio player not configured, defaulting to {self.default}')
 
+    def _load_plugin(self, plugin_name, plugin_module):
+        """load one plugin, runs in its own thread"""
+        start = time.monotonic()
+        try:
+            backends = setup_audio_service(plugin_module, config=self.config, bus=self.bus)
+        except Exception as e:
+            LOG.exception(f"failed to load audio service plugin {plugin_name}: {e}")
+            backends = None
+        self.load_times[plugin_name] = round(time.monotonic() - start, 3)
+        try:
+            if not backends:
+                LOG.debug(f"{plugin_name} not loaded! config: {self.config}")
+                return
+            LOG.info(f"loaded audio service plugin {plugin_name} in {self.load_times[plugin_name]}s")
+            self._register_backends(plugin_name, backends)
+        finally:
+            with self._load_done:
+                self._loading.discard(plugin_name)
+                self._load_done.notify_all()
+
+    def _backends_ready(self) -> bool:
+        """every plugin finished loading, or the configured default backend did"""
+        if not self._loading:
+            return True
+        default_name = self.config.get('default-backend', '')
+        with self.service_lock:
+            return any(s.name == default_name for s in self.service)
+
+    def _register_backends(self, plugin_name, backends):
+        for s in backends:
+            # Register end of track callback
+            s.set_track_start_callback(self.track_start)
+        with self.service_lock:
+            shutting_down = self._shutting_down
+            if not shutting_down:
+                self._register_locked(plugin_name, backends)
+        if shutting_down:  # finished loading after shutdown
+            for s in backends:
+                s.shutdown()
+            return
+        if self._loaded.is_set():  # a slow plugin finished in the background
+            default_name = self.config.get('default-backend', '')
+            if self.default is None or any(s.name == default_name for s in backends):
+                self.find_default()
+
+    def _register_locked(self, plugin_name, backends):
+        """caller holds service_lock"""
+        self._plugin_backends[plugin_name] = list(backends)
+        local = []
+        remote = []
+        for name in self._plugin_order:
+            for s in self._plugin_backends.get(name, []):
+                if isinstance(s, RemoteAudioBackend):
+                    remote.append(s)
+                else:
+                    local.append(s)
+        # Sort services so local services are checked first
+        self.service = local + remote
+
     def load_services(self):
         """Method for loading services.
 
         Sets up the global service, default and registers the event handlers
         for the subsystem.
+
+        plugins are loaded concurrently and each is registered as soon as it
+        is ready. Loading is reported done once the default backend (or every
+        plugin) is in, those still loading after "load_timeout" seconds
+        keep loading in the background and are added once ready
         """
         found_plugins = find_audio_service_plugins()
         if 'ovos_common_play' in found_plugins:
             found_plugins.pop('ovos_common_play')
 
-        local = []
-        remote = []
+        self._plugin_order = list(found_plugins)
+        self._loading = set(found_plugins)
         for plugin_name, plugin_module in found_plugins.items():
             LOG.info(f'Found audio service plugin: {plugin_name}')
-            s = setup_audio_service(plugin_module, config=self.config, bus=self.bus)
-            if not s:
-                LOG.debug(f"{plugin_name} not loaded! config: {self.config}")
-                continue
-            if isinstance(s, RemoteAudioBackend):
-                remote += s
-            else:
-                local += s
-
-        # Sort services so local services are checked first
-        self.service = local + remote
-
-        # Register end of track callback
-        for s in self.service:
-            s.set_track_start_callback(self.track_start)
+            # daemon, a hung plugin must not block shutdown
+            Thread(target=self._load_plugin, args=(plugin_name, plugin_module),
+                   name=f"load_{plugin_name}", daemon=True).start()
+        with self._load_done:
+            self._load_done.wait_for(self._backends_ready, self.config.get("load_timeout", 10))
+            pending = sorted(self._loading)
+        LOG.info(f"audio service plugins load times: {self.load_times}")
+        if pending:
+            LOG.warning(f"audio service plugins still loading in the background: {pending}")
 
         # load OCP
         # NOTE: this will be replace by ovos-media in a future release
@@ -579,6 +658,8 @@ class AudioService:
             self.current.seek_backward(seconds)
 
     def shutdown(self):
+        with self.service_lock:
+            self._shutting_down = True
         for s in self.service:
             try:
                 LOG.info('shutting down ' + s.name)
@@ -0,0 +1,141 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import base64
+import binascii
+import hashlib
+import os
+from glob import glob
+from tempfile import NamedTemporaryFile
+from threading import Lock
+from typing import Callable, Dict, Iterable, Optional
+
+from ovos_utils.file_utils import get_temp_path
+from ovos_utils.log import LOG
+
+# bytes decoded per step when streaming an encoded payload to disk
+_WINDOW = 64 * 1024
+
+
+class AudioBlobStore:
+    """Content addressed store for audio received over the messagebus
+
+    files are named after the sha256 of the decoded audio, sending the same
+    sound twice does not write it twice. The least recently used blobs are
+    evicted once the store grows over max_size_mb
+
+    blobs are never evicted while pinned (see pin=True / unpin) or while
+    in_use(path) is True, eg. because they wait in the playback queue
+    """
+
+    def __init__(self, path: str = None, max_size_mb: float = 50,
+                 in_use: Optional[Callable[[str], bool]] = None):
+        self.path = path or get_temp_path("ovos_audio", "blobs")
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.in_use = in_use
+        self._lock = Lock()
+        self._pins: Dict[str, int] = {}  # path -> number of holders
+        os.makedirs(self.path, exist_ok=True)
+
+    def put_bytes(self, data: bytes, audio_ext: str = "wav", pin: bool = False) -> str:
+        """store raw audio bytes, returns the file path"""
+        return self._write((data[i:i + _WINDOW] for i in range(0, len(data), _WINDOW)),
+                           audio_ext, pin)
+
+    def put_hex(self, hex_data: str, audio_ext: str = "wav", pin: bool = False) -> str:
+        """store hex encoded audio, eg. binascii.hexlify(byte_data).decode('utf-8')"""
+        step = 2 * _WINDOW
+        return self._write((binascii.unhexlify(hex_data[i:i + step])
+                            for i in range(0, len(hex_data), step)),
+                           audio_ext, pin)
+
+    def put_b64(self, b64_data: str, audio_ext: str = "wav", pin: bool = False) -> str:
+        """store base64 encoded audio"""
+        b64_data = "".join(b64_data.split())
+        step = 4 * _WINDOW  # multiple of 4, each window decodes on its own
+        return self._write((base64.b64decode(b64_data[i:i + step])
+                            for i in range(0, len(b64_data), step)),
+                           audio_ext, pin)
+
+    def get(self, handle: str, pin: bool = False) -> Optional[str]:
+        """path of a stored blob, handle is the sha256 digest (extension optional)"""
+        digest = os.path.basename(handle).split(".")[0]
+        if not digest or not all(c in "0123456789abcdef" for c in digest):
+            return None
+        with self._lock:
+            for path in glob(os.path.join(self.path, f"{digest}.*")):
+                os.utime(path)  # mark as recently used
+                if pin:
+                    self._pins[path] = self._pins.get(path, 0) + 1
+                return path
+        return None
+
+    def unpin(self, path: str):
+        """release a blob returned with pin=True, paths not in the store are ignored"""
+        with self._lock:
+            users = self._pins.pop(path, 0) - 1
+            if users > 0:
+                self._pins[path] = users
+
+    @staticmethod
+    def handle(path: str) -> str:
+        """the handle clients can send instead of the audio"""
+        return os.path.basename(path).split(".")[0]
+
+    def _write(self, chunks: Iterable[bytes], audio_ext: str, pin: bool = False) -> str:
+        audio_ext = (audio_ext or "wav").lstrip(".")
+        sha = hashlib.sha256()
+        with NamedTemporaryFile(dir=self.path, suffix=".part", delete=False) as f:
+            try:
+                for chunk in chunks:
+                    sha.update(chunk)
+                    f.write(chunk)
+            except Exception:
+                f.close()
+                os.remove(f.name)
+                raise
+        audio_file = os.path.join(self.path, f"{sha.hexdigest()}.{audio_ext}")
+        with self._lock:
+            if os.path.isfile(audio_file):
+                os.remove(f.name)
+                os.utime(audio_file)
+            else:
+                os.replace(f.name, audio_file)
+            if pin:
+                self._pins[audio_file] = self._pins.get(audio_file, 0) + 1
+            self._evict(keep=audio_file)
+        return audio_file
+
+    def _evict(self, keep: str = None):
+        entries = []
+        for name in os.listdir(self.path):
+            if name.endswith(".part"):
+                continue  # being written
+            path = os.path.join(self.path, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(e[1] for e in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            if path == keep or path in self._pins or \
+                    (self.in_use and self.in_use(path)):
+                continue
+            try:
+                os.remove(path)
+                total -= size
+                LOG.debug(f"evicted audio blob: {path}")
+            except FileNotFoundError:
+                pass
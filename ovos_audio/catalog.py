@@ -0,0 +1,115 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import hashlib
+import json
+import os
+import sys
+from threading import Lock
+from typing import Callable, Optional
+
+from ovos_config.locations import get_xdg_cache_save_path
+from ovos_utils.log import LOG
+
+_DIST_SUFFIXES = (".dist-info", ".egg-info", ".egg-link")
+
+
+def distributions_fingerprint() -> str:
+    """hash of the installed python distributions and their versions
+
+    only lists the dist-info folder names found in sys.path, cheap enough
+    to be checked on every query
+    """
+    names = []
+    for path in sys.path:
+        try:
+            names += [e for e in os.listdir(path or ".") if e.endswith(_DIST_SUFFIXES)]
+        except OSError:
+            continue
+    return hashlib.md5("\n".join(sorted(names)).encode("utf-8")).hexdigest()
+
+
+def filter_lang(data: dict, lang: str) -> dict:
+    """only the entries of a language, dialects included if lang has no region"""
+    lang = lang.lower()
+
+    def match(code: str) -> bool:
+        code = code.lower()
+        return code == lang or ("-" not in lang and code.split("-")[0] == lang)
+
+    langs = [l for l in data["langs"] if match(l)]
+    plugins = {l: data["plugins"][l] for l in langs}
+    names = {p for l in langs for p in plugins[l]}
+    return {
+        "plugins": plugins,
+        "langs": langs,
+        "configs": {p: {l: c for l, c in cfgs.items() if match(l)}
+                    for p, cfgs in data["configs"].items() if p in names},
+        "options": {l: o for l, o in data["options"].items() if match(l)}
+    }
+
+
+class PluginCatalog:
+    """Answers for opm.*.query, built once and kept until plugins change
+
+    build() scans the plugins and returns {"plugins", "langs", "configs",
+    "options"}, the result is rebuilt when the installed distributions change.
+    With persist the catalog is saved to disk and survives restarts
+    """
+
+    def __init__(self, name: str, build: Callable[[], dict], persist: bool = False,
+                 path: str = None):
+        self.name = name
+        self.build = build
+        self.persist = persist
+        self.path = path or os.path.join(get_xdg_cache_save_path("ovos_audio"),
+                                         f"{name}_catalog.json")
+        self._lock = Lock()
+        self._data = None
+        self._fingerprint = None
+        if persist:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                cached = json.load(f)
+            self._data, self._fingerprint = cached["data"], cached["fingerprint"]
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            LOG.warning(f"ignoring corrupt {self.name} plugin catalog: {e}")
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path + ".part", "w") as f:
+                json.dump({"fingerprint": self._fingerprint, "data": self._data}, f)
+            os.replace(self.path + ".part", self.path)
+        except (OSError, TypeError, ValueError) as e:
+            LOG.warning(f"failed to save {self.name} plugin catalog: {e}")
+
+    def invalidate(self):
+        with self._lock:
+            self._data = self._fingerprint = None
+
+    def get(self, lang: Optional[str] = None) -> dict:
+        """the catalog, restricted to a language if given"""
+        fingerprint = distributions_fingerprint()
+        with self._lock:
+            if self._data is None or self._fingerprint != fingerprint:
+                LOG.debug(f"building {self.name} plugin catalog")
+                self._data, self._fingerprint = self.build(), fingerprint
+                if self.persist:
+                    self._save()
+            data = self._data
+        return filter_lang(data, lang) if lang else data
@@ -0,0 +1,191 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from collections.abc import Mapping
+from threading import Lock
+from typing import Callable, Dict, Iterable, Optional, Set
+from weakref import WeakMethod
+
+from ovos_config import Configuration
+from ovos_utils.log import LOG
+
+# {section: {changed keys}}, keys are empty if the section is not a dict
+ConfigChanges = Dict[str, Set[str]]
+
+
+class FrozenDict(Mapping):
+    """read only, hashable dict, the hash is computed once"""
+
+    def __init__(self, data=()):
+        self._data = dict(data)
+        self._hash = None
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(frozenset(self._data.items()))
+        return self._hash
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self._data!r})"
+
+    def thaw(self) -> dict:
+        """mutable deep copy, for plugins that expect a plain dict"""
+        return thaw(self)
+
+
+def freeze(value):
+    if isinstance(value, Mapping):
+        return FrozenDict((k, freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    if isinstance(value, set):
+        return frozenset(value)
+    return value
+
+
+def thaw(value):
+    if isinstance(value, Mapping):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+
+def synth_concurrency(tts: Mapping) -> int:
+    """parallel syntheses per TTS engine, the process pool size if one is configured"""
+    pool = tts.get("process_pool") or {}
+    return max(1, tts.get("concurrent_synth") or pool.get("size", 0) or 1)
+
+
+class ConfigSnapshot(FrozenDict):
+    """Immutable copy of mycroft.conf
+
+    keys read for every utterance are exposed as plain attributes
+    """
+
+    def __init__(self, config: Mapping):
+        super().__init__(freeze(config))
+        tts = self.section("tts")
+        attrs = {
+            "tts": tts,
+            "lang": self.get("lang") or "en-us",
+            "pulse_duck": bool(tts.get("pulse_duck", False)),
+            "ocp_cork": bool(tts.get("ocp_cork", False)),
+            "ocp_duck": bool(tts.get("ocp_duck", False)),
+            "sentence_pipeline": bool(tts.get("sentence_pipeline", False)),
+            "concurrent_synth": synth_concurrency(tts),
+        }
+        for k, v in attrs.items():
+            object.__setattr__(self, k, v)
+
+    def __setattr__(self, key, value):
+        if key in ("_data", "_hash"):
+            return object.__setattr__(self, key, value)
+        raise AttributeError(f"{self.__class__.__name__} is read only")
+
+    def section(self, name: str) -> FrozenDict:
+        value = self.get(name)
+        return value if isinstance(value, FrozenDict) else FrozenDict()
+
+    def diff(self, other: "ConfigSnapshot") -> ConfigChanges:
+        """sections (and keys inside them) that differ in other"""
+        changes = {}
+        for name in set(self) | set(other):
+            old, new = self.get(name), other.get(name)
+            if old == new:
+                continue
+            if isinstance(old, Mapping) and isinstance(new, Mapping):
+                changes[name] = {k for k in set(old) | set(new) if old.get(k) != new.get(k)}
+            else:
+                changes[name] = set()
+        return changes
+
+
+class ConfigStore:
+    """Holds the current ConfigSnapshot and swaps it when the config changes
+
+    subscribers are called with the new snapshot and the keys that changed
+    in the sections they asked for
+    """
+
+    def __init__(self, config: Optional[Mapping] = None):
+        self._lock = Lock()
+        self._subscribers = []  # [(sections, callback or WeakMethod)]
+        self.snapshot = ConfigSnapshot(Configuration() if config is None else config)
+
+    def subscribe(self, callback: Callable[[ConfigSnapshot, ConfigChanges], None],
+                  sections: Iterable[str] = None):
+        """bound methods are kept as weak references"""
+        ref = WeakMethod(callback) if hasattr(callback, "__self__") else callback
+        with self._lock:
+            self._subscribers.append((set(sections) if sections else None, ref))
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers = [(s, ref) for s, ref in self._subscribers
+                                 if self._resolve(ref) not in (None, callback)]
+
+    @staticmethod
+    def _resolve(ref):
+        return ref() if isinstance(ref, WeakMethod) else ref
+
+    def reload(self, config: Optional[Mapping] = None) -> ConfigChanges:
+        """build a new snapshot and notify subscribers of what changed"""
+        with self._lock:
+            new = ConfigSnapshot(Configuration() if config is None else config)
+            changes = self.snapshot.diff(new)
+            self.snapshot = new
+            subscribers = list(self._subscribers)
+        if changes:
+            LOG.debug(f"config changed: {sorted(changes)}")
+            self._notify(new, changes, subscribers)
+        return changes
+
+    def _notify(self, new: ConfigSnapshot, changes: ConfigChanges, subscribers: list):
+        for sections, ref in subscribers:
+            callback = self._resolve(ref)
+            if callback is None:
+                continue
+            relevant = {k: v for k, v in changes.items()
+                        if sections is None or k in sections}
+            if not relevant:
+                continue
+            try:
+                callback(new, relevant)
+            except Exception as e:
+                LOG.exception(f"config change handler failed: {e}")
+        with self._lock:
+            self._subscribers = [(s, ref) for s, ref in self._subscribers
+                                 if self._resolve(ref) is not None]
+
+
+_store: Optional[ConfigStore] = None
+_store_lock = Lock()
+
+
+def get_config_store() -> ConfigStore:
+    """the ConfigStore shared by all ovos-audio components"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ConfigStore()
+            Configuration.set_config_watcher(_store.reload)
+    return _store
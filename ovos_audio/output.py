@@ -0,0 +1,296 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+import wave
+from abc import ABC, abstractmethod
+from queue import Queue
+from threading import Thread, Event
+from typing import Callable, Optional, Tuple
+
+import time
+from ovos_utils.log import LOG
+
+try:
+    import sounddevice
+except ImportError:
+    sounddevice = None
+
+try:
+    import miniaudio
+except ImportError:
+    miniaudio = None
+
+# (sample_rate, channels, sample_width)
+AudioFormat = Tuple[int, int, int]
+
+
+class UnsupportedAudio(ValueError):
+    """the audio can not be decoded in process"""
+
+
+def decode_audio(path: str) -> Tuple[bytes, AudioFormat]:
+    """decode an audio file into interleaved PCM
+
+    wav is decoded with the standard library, other formats need miniaudio
+    """
+    path = str(path).split("?")[0].replace("file://", "")
+    if path.lower().endswith(".wav"):
+        try:
+            with wave.open(path, "rb") as w:
+                return w.readframes(w.getnframes()), \
+                    (w.getframerate(), w.getnchannels(), w.getsampwidth())
+        except wave.Error as e:  # eg. float wavs, let miniaudio try
+            if miniaudio is None:
+                raise UnsupportedAudio(f"{path}: {e}")
+    if miniaudio is None:
+        raise UnsupportedAudio(f"can not decode {path}, pip install miniaudio")
+    try:
+        decoded = miniaudio.decode_file(path, output_format=miniaudio.SampleFormat.SIGNED16)
+    except miniaudio.DecodeError as e:
+        raise UnsupportedAudio(f"{path}: {e}")
+    return decoded.samples.tobytes(), (decoded.sample_rate, decoded.nchannels, 2)
+
+
+class PlaybackHandle:
+    """subprocess.Popen like handle for audio queued in an AudioOutput"""
+
+    def __init__(self):
+        self.cancelled = False
+        self._done = Event()
+
+    @property
+    def returncode(self) -> Optional[int]:
+        return 0 if self._done.is_set() else None
+
+    def poll(self) -> Optional[int]:
+        return self.returncode
+
+    def wait(self, timeout=None) -> Optional[int]:
+        self._done.wait(timeout)
+        return self.returncode
+
+    def communicate(self, timeout=None):
+        self.wait(timeout)
+        return None, None
+
+    def terminate(self):
+        self.cancelled = True
+
+    kill = terminate
+
+    def _finish(self):
+        self._done.set()
+
+
+class AudioSink(ABC):
+    """a PCM destination kept open between queued items"""
+
+    def open(self, fmt: AudioFormat):
+        pass
+
+    @abstractmethod
+    def write(self, frames: bytes):
+        """write interleaved PCM frames in the format given to open"""
+
+    def close(self):
+        pass
+
+
+class NullSink(AudioSink):
+    """discards audio, optionally in real time, for headless setups and tests"""
+
+    def __init__(self, realtime: bool = False):
+        self.realtime = realtime
+        self.fmt = None
+        self.frames_written = 0
+
+    def open(self, fmt: AudioFormat):
+        self.fmt = fmt
+
+    def write(self, frames: bytes):
+        rate, channels, width = self.fmt
+        n = len(frames) // (channels * width)
+        self.frames_written += n
+        if self.realtime:
+            time.sleep(n / rate)
+
+
+class FileSink(AudioSink):
+    """writes everything played to a wav file
+
+    a wav file holds a single format, each format change starts a new
+    numbered segment next to it, eg. out.wav, out.1.wav, out.2.wav
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.segments = []
+        self._wav = None
+
+    def _segment_path(self) -> str:
+        if not self.segments:
+            return self.path
+        base, ext = os.path.splitext(self.path)
+        return f"{base}.{len(self.segments)}{ext}"
+
+    def open(self, fmt: AudioFormat):
+        rate, channels, width = fmt
+        path = self._segment_path()
+        self.segments.append(path)
+        self._wav = wave.open(path, "wb")
+        self._wav.setframerate(rate)
+        self._wav.setnchannels(channels)
+        self._wav.setsampwidth(width)
+
+    def write(self, frames: bytes):
+        self._wav.writeframes(frames)
+
+    def close(self):
+        if self._wav:
+            self._wav.close()
+            self._wav = None
+
+
+class SoundDeviceSink(AudioSink):
+    """plays on the default output device via the sounddevice package"""
+    _DTYPES = {1: "uint8", 2: "int16", 3: "int24", 4: "int32"}
+
+    def __init__(self, device=None):
+        if sounddevice is None:
+            raise ImportError("pip install sounddevice")
+        self.device = device
+        self._stream = None
+
+    def open(self, fmt: AudioFormat):
+        rate, channels, width = fmt
+        self._stream = sounddevice.RawOutputStream(samplerate=rate, channels=channels,
+                                                   dtype=self._DTYPES[width],
+                                                   device=self.device)
+        self._stream.start()
+
+    def write(self, frames: bytes):
+        self._stream.write(frames)
+
+    def close(self):
+        if self._stream:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+
+class AudioOutput(Thread):
+    """Long lived audio output engine
+
+    Decodes audio in process and writes PCM to a sink that stays open
+    between items, consecutive items with the same format play gapless.
+    Playback is written in small blocks so terminating a handle stops
+    the audio within block_ms
+
+    decoder can be replaced, eg. by a cache of decoded sounds
+    """
+
+    def __init__(self, sink: AudioSink, block_ms: int = 50,
+                 decoder: Callable[[str], Tuple[bytes, AudioFormat]] = decode_audio):
+        super().__init__(daemon=True)
+        self.sink = sink
+        self.block_ms = block_ms
+        self.decoder = decoder
+        self._queue = Queue()
+        self._fmt = None
+        self._running = True
+        self.start()
+
+    def play(self, uri: str) -> Optional[PlaybackHandle]:
+        """queue an audio file, None if it can not be decoded in process"""
+        try:
+            pcm, fmt = self.decoder(uri)
+        except (UnsupportedAudio, FileNotFoundError) as e:
+            LOG.debug(f"in process playback not possible: {e}")
+            return None
+        return self.play_pcm(pcm, fmt)
+
+    def play_pcm(self, pcm: bytes, fmt: AudioFormat) -> PlaybackHandle:
+        """queue a decoded PCM buffer"""
+        handle = PlaybackHandle()
+        self._queue.put((pcm, fmt, handle))
+        return handle
+
+    def run(self):
+        while self._running:
+            item = self._queue.get()
+            if item is None:
+                break
+            pcm, fmt, handle = item
+            try:
+                self._write(pcm, fmt, handle)
+            except Exception as e:
+                LOG.exception(f"audio output failed: {e}")
+                self._close_sink()
+            handle._finish()
+        self._close_sink()
+        # release anyone waiting on audio that will never play
+        while not self._queue.empty():
+            item = self._queue.get()
+            if item is not None:
+                item[2]._finish()
+
+    def _write(self, pcm: bytes, fmt: AudioFormat, handle: PlaybackHandle):
+        if handle.cancelled:
+            return
+        if fmt != self._fmt:
+            self._close_sink()
+            self.sink.open(fmt)
+            self._fmt = fmt
+        rate, channels, width = fmt
+        frame = channels * width
+        block = max(1, rate * self.block_ms // 1000) * frame
+        for i in range(0, len(pcm), block):
+            if handle.cancelled or not self._running:
+                break
+            self.sink.write(pcm[i:i + block])
+
+    def _close_sink(self):
+        if self._fmt is not None:
+            self.sink.close()
+            self._fmt = None
+
+    def shutdown(self):
+        self._running = False
+        self._queue.put(None)
+
+
+def create_audio_output(config: dict) -> Optional[AudioOutput]:
+    """build the output engine selected in the "audio_output" config section
+
+    None means audio is played with a player subprocess per file
+    """
+    engine = config.get("engine", "subprocess")
+    if engine == "subprocess":
+        return None
+    try:
+        if engine == "sounddevice":
+            sink = SoundDeviceSink(config.get("device"))
+        elif engine == "file":
+            if not config.get("path"):
+                LOG.warning("'file' audio output needs a 'path', using player subprocess")
+                return None
+            sink = FileSink(config["path"])
+        elif engine == "null":
+            sink = NullSink(realtime=config.get("realtime", True))
+        else:
+            LOG.error(f"unknown audio output engine: {engine}")
+            return None
+    except Exception as e:
+        LOG.error(f"failed to create '{engine}' audio output, using player subprocess: {e}")
+        return None
+    return AudioOutput(sink, block_ms=config.get("block_ms", 50))
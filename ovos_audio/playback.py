@@ -1,18 +1,163 @@
+import heapq
+import itertools
 import random
-from queue import Empty
-from threading import Thread, Event
-from typing import Optional
-
+from contextlib import contextmanager
+from enum import IntEnum
+from queue import Empty, Queue
+from threading import Thread, Event, Lock, Condition, local
+from typing import Optional, Callable
+
+from ovos_audio.config import ConfigStore, get_config_store
+from ovos_audio.output import create_audio_output
 from ovos_audio.transformers import TTSTransformersService
+from ovos_audio.visemes import VisemeService
 from ovos_bus_client.message import Message
 from ovos_bus_client.util import get_message_lang
-from ovos_config import Configuration
-from ovos_plugin_manager.g2p import OVOSG2PFactory
-from ovos_plugin_manager.templates.g2p import OutOfVocabulary, Grapheme2PhonemePlugin
 from ovos_plugin_manager.templates.tts import TTS
 from ovos_utils.log import LOG
 from ovos_utils.sound import play_audio
-from time import time
+from time import time, monotonic
+
+
+class PlaybackPriority(IntEnum):
+    """playback classes, lower values are played first"""
+    ALERT = 0
+    SPEECH = 1  # interactive TTS, default for everything
+    ANNOUNCEMENT = 2
+    BACKGROUND = 3
+
+
+class PlaybackQueue(Queue):
+    """Queue of (data, visemes, listen, tts_id, message) tuples waiting for playback
+
+    Items are played by priority class, FIFO within a class. The class is
+    chosen by the producer with message.data["priority"] (name or value),
+    SPEECH if not set. With message.data["preempt"] an item also interrupts
+    a lower class item being played.
+
+    Speech of the session being played (its group) is played back to back,
+    while that session has sentences queued the speech of other sessions in
+    the same or a lower class waits. Once nothing of it is queued, eg. its
+    next sentence is still being synthesized, anything else may play. Sounds
+    (tts_id "sounds") are never held back
+
+    Remembers when each item was queued and can be cleared atomically
+    """
+
+    def _init(self, maxsize):
+        self.queue = []  # heap of (priority, seq, queued_at, item)
+        self._seq = itertools.count()
+        self._front = itertools.count(-1, -1)
+        # called with the priority of an item asking to preempt playback
+        self.preempt_callback: Optional[Callable[[int], None]] = None
+        # applied to items before they are queued, in the producer thread
+        self.transform_callback: Optional[Callable[[tuple], tuple]] = None
+        self._current = None  # (group, priority) being played back to back
+
+    @staticmethod
+    def priority_of(item) -> int:
+        message = item[4] if len(item) > 4 else None
+        prio = getattr(message, "data", {}).get("priority")
+        if isinstance(prio, str):
+            try:
+                return PlaybackPriority[prio.upper()]
+            except KeyError:
+                LOG.warning(f"unknown playback priority: {prio}")
+        elif isinstance(prio, int):
+            return min(max(prio, PlaybackPriority.ALERT), PlaybackPriority.BACKGROUND)
+        return PlaybackPriority.SPEECH
+
+    @staticmethod
+    def group_of(message) -> str:
+        """items are grouped by the session that produced them"""
+        sess = (getattr(message, "context", None) or {}).get("session") or {}
+        return sess.get("session_id") or "default"
+
+    @classmethod
+    def _item_group(cls, item) -> Optional[str]:
+        """session of a speech item, None for sounds"""
+        if len(item) > 3 and item[3] == "sounds":
+            return None
+        return cls.group_of(item[4] if len(item) > 4 else None)
+
+    def put(self, item, block=True, timeout=None):
+        if self.transform_callback:
+            item = self.transform_callback(item)
+        super().put(item, block, timeout)
+        message = item[4] if len(item) > 4 else None
+        if self.preempt_callback and getattr(message, "data", {}).get("preempt"):
+            self.preempt_callback(self.priority_of(item))
+
+    def requeue(self, item):
+        """put an interrupted item back in front of its class"""
+        with self.not_empty:
+            heapq.heappush(self.queue, (self.priority_of(item), next(self._front),
+                                        monotonic(), item))
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def _put(self, item):
+        heapq.heappush(self.queue, (self.priority_of(item), next(self._seq),
+                                    monotonic(), item))
+
+    def _next_index(self) -> Optional[int]:
+        """heap index of the next item to play"""
+        if not self.queue:
+            return None
+        if self._current is not None:
+            group, prio = self._current
+            groups = [self._item_group(e[-1]) for e in self.queue]
+            if group in groups:
+                # higher classes and sounds still jump ahead of the group
+                candidates = [i for i, e in enumerate(self.queue)
+                              if e[0] < prio or groups[i] in (group, None)]
+                return min(candidates, key=lambda i: self.queue[i][:2])
+            self._current = None
+        return 0  # heap root
+
+    def _get(self):
+        idx = self._next_index()
+        entry = self.queue.pop(idx or 0)
+        heapq.heapify(self.queue)
+        prio, item = entry[0], entry[-1]
+        group = self._item_group(item)
+        if group is not None and (self._current is None or prio >= self._current[1]):
+            self._current = (group, prio)
+        return item
+
+    def oldest_age(self) -> float:
+        """seconds the longest waiting item has been in the queue"""
+        with self.mutex:
+            if not self.queue:
+                return 0.0
+            return monotonic() - min(e[2] for e in self.queue)
+
+    def discard(self, message) -> int:
+        """drop the pending items queued for message, returns how many were dropped"""
+        with self.mutex:
+            kept = [e for e in self.queue if e[-1][4] is not message]
+            n = len(self.queue) - len(kept)
+            if not n:
+                return 0
+            heapq.heapify(kept)
+            self.queue[:] = kept
+            self.unfinished_tasks = max(0, self.unfinished_tasks - n)
+            if not self.unfinished_tasks:
+                self.all_tasks_done.notify_all()
+            self.not_full.notify_all()
+        return n
+
+    def clear(self) -> int:
+        """drop all pending items at once, returns how many were dropped"""
+        with self.mutex:
+            n = len(self.queue)
+            self.queue.clear()
+            self._current = None
+            self.unfinished_tasks = max(0, self.unfinished_tasks - n)
+            if not self.unfinished_tasks:
+                self.all_tasks_done.notify_all()
+            self.not_full.notify_all()
+        return n
 
 
 class PlaybackThread(Thread):
@@ -20,25 +165,57 @@ class PlaybackThread(Thread):
     viseme data to enclosure.
     """
 
-    def __init__(self, queue=TTS.queue, bus=None):
+    def __init__(self, queue=TTS.queue, bus=None, load_transformers: bool = True,
+                 config_store: Optional[ConfigStore] = None):
         super(PlaybackThread, self).__init__(daemon=True)
+        if queue is None and TTS.queue is None:
+            TTS.queue = PlaybackQueue()
         self.queue = queue or TTS.queue
+        # items put in a PlaybackQueue are transformed by the producer,
+        # overlapped with playback of the previous item
+        self._transform_on_put = isinstance(self.queue, PlaybackQueue)
         self._terminated = False
         self._processing_queue = False
         self._do_playback = Event()
+        # OPM always attaches an EnclosureAPI, it is only a bus emitter and
+        # does not mean anything displays visemes, see VisemeService.add_consumer
         self.enclosure = None
         self.p = None
         self.bus = bus or None
         self._now_playing = None
         self._started = Event()
-        self.tts_transform = TTSTransformersService(self.bus)
-        self.g2p = None
-        if Configuration().get("g2p", {}).get("module"):
-            LOG.debug("Loading Grapheme2Phoneme plugin for mouth movements")
-            try:
-                self.g2p: Optional[Grapheme2PhonemePlugin] = OVOSG2PFactory.create()
-            except:  # not mission critical
-                pass
+        # pause / resume / cancel notifications for the item being played
+        self._state = Condition()
+        self._cancelled = False
+        self._paused_replay = False
+        self._preempted = False
+        self._stop_requested = None
+        self.last_stop_latency = None
+        # sentence pipelines still synthesizing, end of speech is deferred until they finish
+        self._pipelines = 0
+        self._deferred_end = None
+        self._end_lock = Lock()
+        # threads shutting down a replaced TTS engine, see detach
+        self._detached = local()
+        self._config_store = config_store or get_config_store()
+        if self._transform_on_put:
+            self.queue.preempt_callback = self.preempt
+            self.queue.transform_callback = self.transform_item
+        # without load_transformers plugins are attached later by replacing tts_transform
+        self.tts_transform = TTSTransformersService(self.bus, autoload=load_transformers,
+                                                    config_store=self._config_store)
+        # None -> a player subprocess per utterance
+        self.output = create_audio_output(self.config.section("audio_output"))
+        self.visemes = VisemeService(self.config.section("g2p"))
+
+    @property
+    def g2p(self):
+        return self.visemes.g2p
+
+    @property
+    def config(self):
+        """read only snapshot of mycroft.conf"""
+        return self._config_store.snapshot
 
     @property
     def is_running(self):
@@ -57,22 +234,120 @@ class PlaybackThread(Thread):
         self.tts_transform.set_bus(bus)
 
     def clear_queue(self):
-        """Remove all pending playbacks."""
-        while not self.queue.empty():
-            self.queue.get()
+        """Remove all pending playbacks and cancel the current one."""
+        if isinstance(self.queue, PlaybackQueue):
+            self.queue.clear()
+        else:
+            with self.queue.mutex:
+                self.queue.queue.clear()
+        self._cancel_current()
+
+    def discard(self, message: Message):
+        """Remove the pending playbacks of a message, cancel it if being played.
+
+        audio queued by other sessions and skills is kept
+        """
+        if isinstance(self.queue, PlaybackQueue):
+            self.queue.discard(message)
+        else:
+            with self.queue.mutex:
+                kept = [e for e in self.queue.queue if e[4] is not message]
+                self.queue.queue.clear()
+                self.queue.queue.extend(kept)
+        item = self._now_playing
+        if item is not None and item[4] is message:
+            self._cancel_current()
+
+    def _cancel_current(self):
+        if self._now_playing is not None:
+            self._stop_requested = monotonic()
+        with self._state:
+            self._cancelled = True
+            self._state.notify_all()
         try:
             self.p.terminate()
         except Exception:
             pass
 
+    def is_queued(self, data: str) -> bool:
+        """the audio file is waiting in the queue or being played"""
+        item = self._now_playing
+        if item is not None and item[0] == data:
+            return True
+        with self.queue.mutex:
+            entries = list(self.queue.queue)
+        if isinstance(self.queue, PlaybackQueue):
+            entries = [e[-1] for e in entries]
+        return any(e[0] == data for e in entries)
+
+    @property
+    def stats(self) -> dict:
+        """playback queue metrics"""
+        return {
+            "queue_depth": self.queue.qsize(),
+            "oldest_item_age": self.queue.oldest_age()
+            if isinstance(self.queue, PlaybackQueue) else None,
+            "playing": self._now_playing is not None,
+            "paused": not self._do_playback.is_set(),
+            # seconds between a stop request and the audio actually stopping
+            "stop_latency": self.last_stop_latency
+        }
+
+    def _submit_visemes(self, visemes, message):
+        """start computing visemes unless the TTS provided them"""
+        if visemes:
+            return None
+        return self.visemes.submit(message.data.get("utterance"),
+                                   get_message_lang(message))
+
+    def transform_item(self, item: tuple) -> tuple:
+        """run the tts transformers on a queue item, TTS results are cached
+
+        visemes are computed at the same time, so they are ready for playback
+        """
+        data, visemes, listen, tts_id, message = item
+        future = self._submit_visemes(visemes, message)
+        try:
+            data, message.context = self.tts_transform.transform(
+                data, message.context, cache=tts_id != "sounds")
+        except Exception as e:
+            LOG.exception(f"tts transformers failed: {e}")
+        if future is not None:
+            visemes = future.result()
+        return data, visemes, listen, tts_id, message
+
+    def preempt(self, priority: int):
+        """interrupt the current item if it belongs to a lower priority class
+
+        the interrupted item is queued again and played from the start
+        """
+        item = self._now_playing
+        if item is None or PlaybackQueue.priority_of(item) <= priority:
+            return
+        LOG.debug(f"preempting playback of {item[0]}")
+        with self._state:
+            self._preempted = True
+            self._state.notify_all()
+        try:
+            self.p.terminate()
+        except Exception:
+            pass
+
+    def _wakeup(self):
+        """wake the playback loop to re-check its state"""
+        with self.queue.not_empty:
+            self.queue.not_empty.notify_all()
+        with self._state:
+            self._state.notify_all()
+
     def begin_audio(self, message=None):
         """Perform beginning of speech actions."""
         if self.bus:
-            cfg = Configuration().get("tts", {})
-            if not cfg.get("pulse_duck"):  # OS is configured to use pulseaudio modules directly
-                if cfg.get("ocp_cork", False):
+            cfg = self.config
+            if not cfg.pulse_duck:  # OS is configured to use pulseaudio modules directly
+                if cfg.ocp_cork:
                     self.bus.emit(Message("ovos.common_play.cork"))
-                elif cfg.get("ocp_duck", False):
+                elif cfg.ocp_duck:
                     self.bus.emit(Message("ovos.common_play.duck"))
             message = message or Message("speak")
             self.bus.emit(message.forward("recognizer_loop:audio_output_start"))
@@ -87,11 +362,11 @@ class PlaybackThread(Thread):
             listen (bool): True if listening event should be emitted
         """
         if self.bus:
-            cfg = Configuration().get("tts", {})
-            if not cfg.get("pulse_duck"):  # OS is configured to use pulseaudio modules directly
-                if cfg.get("ocp_cork", False):
+            cfg = self.config
+            if not cfg.pulse_duck:  # OS is configured to use pulseaudio modules directly
+                if cfg.ocp_cork:
                     self.bus.emit(Message("ovos.common_play.uncork"))
-                elif cfg.get("ocp_duck", False):
+                elif cfg.ocp_duck:
                     self.bus.emit(Message("ovos.common_play.unduck"))
             # Send end of speech signals to the system
             message = message or Message("speak")
@@ -101,6 +376,41 @@ class PlaybackThread(Thread):
         else:
             LOG.warning("Speech started before bus was attached.")
 
+    def begin_pipeline(self):
+        """Announce an utterance that will be queued one sentence at a time.
+
+        While any pipeline is open an empty queue does not mean speech ended,
+        the next sentence may still be synthesizing
+        """
+        with self._end_lock:
+            self._pipelines += 1
+
+    def end_pipeline(self):
+        """All sentences of a pipelined utterance have been queued (or dropped).
+
+        Emits the end of speech signals if playback already drained the queue
+        """
+        with self._end_lock:
+            self._pipelines = max(0, self._pipelines - 1)
+            if self._pipelines or self._deferred_end is None:
+                return
+            listen, message = self._deferred_end
+            self._deferred_end = None
+            if self._now_playing is not None or not self.queue.empty():
+                return  # the item being played will end speech
+        self.on_end(listen, message)
+
+    def _maybe_end(self, listen=False, message=None):
+        """end of speech once the queue is drained and no pipeline is pending"""
+        with self._end_lock:
+            self._now_playing = None
+            if not self.queue.empty():
+                return
+            if self._pipelines:
+                self._deferred_end = (listen, message)
+                return
+        self.on_end(listen, message)
+
     def on_start(self, message=None):
         self.blink(0.5)
         if not self._processing_queue:
@@ -123,35 +433,51 @@ class PlaybackThread(Thread):
     def _play(self):
         try:
             data, visemes, listen, tts_id, message = self._now_playing
+            with self._end_lock:
+                self._deferred_end = None
 
             self.on_start(message)
 
-            data, message.context = self.tts_transform.transform(data, message.context)
+            future = self._submit_visemes(visemes, message)
+            if not self._transform_on_put:
+                data, message.context = self.tts_transform.transform(data, message.context)
 
             # emit info for GUI to render text feedback real time if wanted
-            # send full message.data and message.context
+            # send message.data and message.context, minus any audio payload
             if self.bus:
-                self.bus.emit(message.forward("recognizer_loop:utterance_start", message.data))
+                utt_data = {k: v for k, v in message.data.items()
+                            if k not in ("binary_data", "b64_data")}
+                self.bus.emit(message.forward("recognizer_loop:utterance_start", utt_data))
 
-            self.p = play_audio(data)
+            self._start_player(data)
 
-            if not visemes and self.g2p is not None:
-                try:
-                    visemes = self.g2p.utterance2visemes(message.data["utterance"],
-                                                         get_message_lang(message))
-                except OutOfVocabulary:
-                    pass
-                except:
-                    # this one is unplanned, let devs know all the info so they can fix it
-                    LOG.exception(f"Unexpected failure in G2P plugin: {self.g2p}")
+            if future is not None:
+                visemes = future.result()
             if visemes:
                 self.show_visemes(visemes)
-            if self.p:
-                self.p.communicate()
-                self.p.wait()
-
-            if self.queue.empty():
-                self.on_end(listen, message)
+            while True:
+                if self.p:
+                    self.p.communicate()
+                    self.p.wait()
+                # paused -> hold the item and play it again from the start once resumed
+                with self._state:
+                    if self._preempted and not self._cancelled:
+                        self.queue.requeue(self._now_playing)
+                        break
+                    while not self._do_playback.is_set() and \
+                            not self._cancelled and not self._terminated:
+                        self._state.wait()
+                    if self._cancelled or self._terminated or not self._paused_replay:
+                        break
+                    self._paused_replay = False
+                self._start_player(data)
+                if visemes:
+                    self.show_visemes(visemes)
+
+            if self._stop_requested is not None:
+                self.last_stop_latency = monotonic() - self._stop_requested
+                self._stop_requested = None
+            self._maybe_end(listen, message)
         except Empty:
             pass
         except Exception as e:
@@ -160,6 +486,34 @@ class PlaybackThread(Thread):
                 self.on_end()
         self._now_playing = None
 
+    def _start_player(self, data):
+        if self._cancelled or self._preempted:  # interrupted before playback started
+            self.p = None
+            return
+        self.p = self.output.play(data) if self.output else None
+        if self.p is None:  # no output engine or format not supported by it
+            self.p = play_audio(data)
+
+    def _next_item(self):
+        """block until an item can be played, None once terminated
+
+        waits on the queue condition, no wakeups while idle or paused
+        """
+        q = self.queue
+        with q.not_empty:
+            while not self._terminated and \
+                    not (self._do_playback.is_set() and q._qsize()):
+                q.not_empty.wait()
+            if self._terminated:
+                return None
+            item = q._get()
+            q.not_full.notify()
+            with self._state:
+                self._cancelled = False
+                self._preempted = False
+            self._now_playing = item
+        return item
+
     def run(self, cb=None):
         """Thread main loop. Get audio and extra data from queue and play.
 
@@ -180,18 +534,15 @@ class PlaybackThread(Thread):
         self._do_playback.set()
         self._started.set()
         while not self._terminated:
-            self._do_playback.wait()
             try:
-                data, visemes, listen, tts_id, message = self.queue.get(timeout=2)
-                self._now_playing = (data, visemes, listen, tts_id, message)
+                if self._next_item() is None:
+                    break
                 self._play()
-            except Empty:
-                pass
             except Exception as e:
                 LOG.error(e)
 
     def show_visemes(self, pairs):
-        """Send viseme data to enclosure
+        """Send viseme data to enclosure, or over the bus to subscribers
 
         Args:
             pairs (list): Visime and timing pair
@@ -201,18 +552,23 @@ class PlaybackThread(Thread):
         """
         if self.enclosure:
             self.enclosure.mouth_viseme(time(), pairs)
+        elif self.bus and self.visemes.enabled:
+            # same message EnclosureAPI.mouth_viseme emits
+            self.bus.emit(Message("enclosure.mouth.viseme_list",
+                                  {"start": time(), "visemes": pairs}))
 
     def pause(self):
-        """pause thread"""
-        self._do_playback.clear()
+        """pause thread, the current item is played again on resume"""
+        with self._state:
+            self._do_playback.clear()
+            self._paused_replay = self._now_playing is not None
         if self.p:
             self.p.terminate()
 
     def resume(self):
         """resume thread"""
-        if self._now_playing:
-            self._play()
         self._do_playback.set()
+        self._wakeup()
 
     def clear(self):
         """Clear all pending actions for the TTS playback thread."""
@@ -223,14 +579,32 @@ class PlaybackThread(Thread):
         if self.enclosure and random.random() < rate:
             self.enclosure.eyes_blink("b")
 
+    @contextmanager
+    def detach(self):
+        """ stop() calls made by this thread inside the block are ignored
+
+        TTS.shutdown stops the playback thread all engines share, a replaced
+        engine is shut down detached while its replacement keeps speaking
+        """
+        self._detached.active = True
+        try:
+            yield
+        finally:
+            self._detached.active = False
+
     def stop(self):
         """Stop thread"""
-        self._now_playing = None
+        if getattr(self._detached, "active", False):
+            return
         self._terminated = True
         self.clear_queue()
+        self._wakeup()
 
     def shutdown(self):
         self.stop()
+        self.visemes.shutdown()
+        if self.output:
+            self.output.shutdown()
 
     def __del__(self):
         self.shutdown()
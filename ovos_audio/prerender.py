@@ -0,0 +1,223 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Render skill dialogs into the persistent TTS cache ahead of time
+
+    ovos-audio-prerender --lang en-us --workers 4
+
+every variant of every .dialog file of the installed skills (or of the
+given directories) is synthesized with the configured TTS. Entries already
+in the cache are skipped, an interrupted run resumes where it stopped.
+Lines with {placeholders} are rendered at runtime and skipped here
+"""
+import argparse
+import inspect
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterable, List, Optional, Tuple
+
+from ovos_config import Configuration
+from ovos_plugin_manager.utils.tts_cache import hash_sentence
+from ovos_utils.bracket_expansion import expand_options
+from ovos_utils.log import LOG
+from time import monotonic
+
+from ovos_audio.tts import TTSFactory
+from ovos_audio.utils import speech_chunks
+
+SYNTHESIZED = "synthesized"
+CACHED = "cached"
+FAILED = "failed"
+
+# per worker process state, set by _init_worker
+_tts = None
+_transformer = None
+_sentence_pipeline = False
+
+
+def skill_resource_dirs() -> List[str]:
+    """directories of the installed skill plugins"""
+    from ovos_plugin_manager.skills import find_skill_plugins
+    dirs = []
+    for skill_id, clazz in find_skill_plugins().items():
+        try:
+            dirs.append(os.path.dirname(inspect.getfile(clazz)))
+        except (TypeError, OSError) as e:
+            LOG.warning(f"can not locate {skill_id}: {e}")
+    return sorted(set(dirs))
+
+
+def find_dialog_files(roots: Iterable[str], lang: str) -> List[str]:
+    """.dialog files below a folder named after lang
+
+    covers both locale/<lang>/... and the legacy dialog/<lang>/ layouts
+    """
+    lang = lang.lower()
+    found = []
+    for root in roots:
+        for folder, _, files in os.walk(root):
+            parts = [p.lower() for p in os.path.relpath(folder, root).split(os.sep)]
+            if lang not in parts:
+                continue
+            found += [os.path.join(folder, f) for f in files if f.endswith(".dialog")]
+    return sorted(found)
+
+
+def expand_dialog(path: str) -> List[str]:
+    """every variant of the static lines of a dialog file"""
+    variants = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if "{" in line:  # filled in at runtime
+                continue
+            variants += [v.strip() for v in expand_options(line) if v.strip()]
+    return variants
+
+
+def collect_utterances(roots: Iterable[str], langs: Iterable[str]) -> List[Tuple[str, str]]:
+    """unique (lang, utterance) pairs of the dialog files, in a stable order"""
+    roots = list(roots)
+    seen = set()
+    for lang in langs:
+        for path in find_dialog_files(roots, lang):
+            try:
+                seen.update((lang, utt) for utt in expand_dialog(path))
+            except (OSError, UnicodeDecodeError) as e:
+                LOG.warning(f"skipping {path}: {e}")
+    return sorted(seen)
+
+
+def render_utterance(tts, utterance: str, lang: str, sentence_pipeline: bool = False,
+                     transformer=None) -> str:
+    """synthesize an utterance into the cache the same way ovos-audio would speak it
+
+    returns CACHED if every chunk was already in the cache, including the
+    transformed audio when a transformer is given
+    """
+    ctxt = tts._get_ctxt({"lang": lang})
+    cache = ctxt.get_cache(tts.audio_ext, tts.config)
+    status = CACHED
+    for chunk in speech_chunks(tts, utterance, lang, sentence_pipeline):
+        cached = hash_sentence(chunk) in cache
+        if cached and transformer is None:
+            continue
+        audio_file, _ = tts.synth(chunk, ctxt)  # served from the cache if already rendered
+        if transformer is not None:
+            if cached and transformer.is_cached(str(audio_file)):
+                continue
+            transformer.transform(str(audio_file), {}, cache=True)
+        status = SYNTHESIZED
+    return status
+
+
+def _init_worker(config: dict, transformers: bool):
+    global _tts, _transformer, _sentence_pipeline
+    _tts = TTSFactory.create(config)
+    _sentence_pipeline = bool(config.get("tts", {}).get("sentence_pipeline", False))
+    if transformers:
+        from ovos_audio.transformers import TTSTransformersService
+        _transformer = TTSTransformersService(config=config.get("tts_transformers") or {})
+
+
+def _render(lang: str, utterance: str) -> Tuple[str, Optional[str]]:
+    try:
+        return render_utterance(_tts, utterance, lang, _sentence_pipeline, _transformer), None
+    except Exception as e:
+        return FAILED, str(e)
+
+
+def persistent_config(config: dict, cache_dir: str = None) -> dict:
+    """config with every synthesized sentence written to the persistent cache"""
+    # plain dict, it is pickled into the worker processes
+    config = json.loads(json.dumps(config))
+    tts = config.get("tts") or {}
+    tts.pop("process_pool", None)  # the workers already are the pool
+    module = tts.get("module")
+    overrides = {"persist_cache": True, "persist_thresh": 1}
+    if cache_dir:
+        overrides["preloaded_cache"] = cache_dir
+    tts.update(overrides)
+    if module:
+        tts[module] = {**(tts.get(module) or {}), **overrides}
+    config["tts"] = tts
+    return config
+
+
+def prerender(utterances: List[Tuple[str, str]], config: dict, workers: int = None,
+              transformers: bool = True, report_every: float = 5) -> dict:
+    """synthesize (lang, utterance) pairs in a process pool, returns counters"""
+    stats = {SYNTHESIZED: 0, CACHED: 0, FAILED: 0}
+    start = last_report = monotonic()
+    total = len(utterances)
+    # spawn, plugins may start threads at import time
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                             initargs=(config, transformers)) as pool:
+        futures = {pool.submit(_render, lang, utt): utt for lang, utt in utterances}
+        for done, future in enumerate(as_completed(futures), 1):
+            status, error = future.result()
+            stats[status] += 1
+            if error:
+                LOG.error(f"failed to render '{futures[future]}': {error}")
+            if monotonic() - last_report >= report_every or done == total:
+                last_report = monotonic()
+                elapsed = last_report - start
+                print(f"{done}/{total} done, {stats[SYNTHESIZED]} synthesized, "
+                      f"{stats[CACHED]} cached, {stats[FAILED]} failed, "
+                      f"{stats[SYNTHESIZED] / elapsed:.2f} utterances/s", flush=True)
+    stats["seconds"] = round(monotonic() - start, 2)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="ovos-audio-prerender",
+                                     description="render skill dialogs into the persistent TTS cache")
+    parser.add_argument("paths", nargs="*",
+                        help="skill directories to scan, defaults to the installed skills")
+    parser.add_argument("--lang", action="append",
+                        help="language to render, can be repeated, defaults to the configured lang")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="synthesis processes, defaults to the number of CPUs")
+    parser.add_argument("--cache-dir", default=None,
+                        help="persistent cache directory, defaults to the TTS plugin cache")
+    parser.add_argument("--no-transformers", action="store_true",
+                        help="only cache the raw TTS audio")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="list the utterances that would be rendered")
+    args = parser.parse_args(argv)
+
+    config = Configuration()
+    langs = args.lang or [config.get("lang", "en-us")]
+    roots = args.paths or skill_resource_dirs()
+    utterances = collect_utterances(roots, langs)
+    print(f"{len(utterances)} dialog variants in {len(roots)} skills", flush=True)
+    if args.dry_run:
+        for lang, utt in utterances:
+            print(f"{lang}\t{utt}")
+        return 0
+    if not utterances:
+        return 0
+
+    stats = prerender(utterances, persistent_config(config, args.cache_dir),
+                      workers=args.workers, transformers=not args.no_transformers)
+    print(f"rendered in {stats['seconds']}s: {stats[SYNTHESIZED]} synthesized, "
+          f"{stats[CACHED]} already cached, {stats[FAILED]} failed", flush=True)
+    return 1 if stats[FAILED] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
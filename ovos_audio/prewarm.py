@@ -0,0 +1,196 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import heapq
+import itertools
+import json
+import os
+from threading import Condition, Lock, Thread
+from typing import Callable, List, Optional
+
+from ovos_bus_client.message import Message
+from ovos_config.locations import get_xdg_data_save_path
+from ovos_utils.log import LOG
+from time import monotonic
+
+# background synthesis priorities, lower runs first
+PREFETCH = 0
+PREWARM = 1
+
+
+class UtteranceStats:
+    """How often each utterance was synthesized, per voice
+
+    persisted as json, {tts_id: {"lang": lang, "utterances": {utterance: count}}}
+    only the max_entries most frequent utterances of each voice are kept
+    """
+
+    def __init__(self, path: str = None, max_entries: int = 500, save_every: int = 10):
+        self.path = path or os.path.join(get_xdg_data_save_path("ovos_audio"), "tts_usage.json")
+        self.max_entries = max_entries
+        self.save_every = save_every
+        self._lock = Lock()
+        self._unsaved = 0
+        self.voices = self._load()
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            LOG.warning(f"ignoring corrupt TTS usage stats {self.path}: {e}")
+            return {}
+
+    def record(self, tts_id: str, lang: str, utterance: str):
+        with self._lock:
+            voice = self.voices.setdefault(tts_id, {"lang": lang, "utterances": {}})
+            counts = voice["utterances"]
+            counts[utterance] = counts.get(utterance, 0) + 1
+            if len(counts) > self.max_entries * 2:  # amortize the pruning
+                voice["utterances"] = dict(sorted(counts.items(), key=lambda k: k[1],
+                                                  reverse=True)[:self.max_entries])
+            self._unsaved += 1
+            save = self._unsaved >= self.save_every
+        if save:
+            self.save()
+
+    def top(self, tts_id: str, n: int) -> List[str]:
+        """the n most frequent utterances of a voice"""
+        with self._lock:
+            counts = self.voices.get(tts_id, {}).get("utterances", {})
+            return [u for u, _ in sorted(counts.items(), key=lambda k: k[1], reverse=True)[:n]]
+
+    def lang(self, tts_id: str) -> Optional[str]:
+        return self.voices.get(tts_id, {}).get("lang")
+
+    def save(self):
+        with self._lock:
+            data = json.dumps(self.voices)
+            self._unsaved = 0
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path + ".part", "w") as f:
+                f.write(data)
+            os.replace(self.path + ".part", self.path)
+        except OSError as e:
+            LOG.warning(f"failed to save TTS usage stats: {e}")
+
+
+class RateLimiter:
+    """token bucket, rate tokens per second up to burst"""
+
+    def __init__(self, rate: float = 1.0, burst: int = 5):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = monotonic()
+        self._lock = Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            now = monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class BackgroundSynth(Thread):
+    """Synthesizes utterances into the TTS cache while nothing else happens
+
+    a job only runs while is_idle(priority) is true, and after each job the
+    thread sleeps so synthesis takes at most max_cpu of the wall clock time.
+    Jobs past their deadline are dropped
+    """
+
+    def __init__(self, synth: Callable[[str, Optional[str], Optional[Message]], None],
+                 is_idle: Callable[[int], bool], max_cpu: float = 0.25, poll: float = 0.5):
+        super().__init__(daemon=True)
+        self.synth = synth
+        self.is_idle = is_idle
+        self.max_cpu = min(max(max_cpu, 0.01), 1.0)
+        self.poll = poll
+        self._jobs = []  # heap of (priority, seq, deadline, utterance, lang, message, synth)
+        self._seq = itertools.count()
+        self._pending = set()
+        self._cond = Condition()
+        self._running = True
+        self.done = 0
+
+    def submit(self, utterance: str, lang: str = None, message: Message = None,
+               priority: int = PREWARM, deadline: float = None,
+               synth: Callable[[str, Optional[str], Optional[Message]], None] = None) -> bool:
+        """queue an utterance, False if it is already waiting
+
+        synth replaces the default synth function for this job
+        """
+        key = (utterance, lang)
+        with self._cond:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+            heapq.heappush(self._jobs, (priority, next(self._seq), deadline,
+                                        utterance, lang, message, synth or self.synth))
+            self._cond.notify()
+        return True
+
+    @property
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._jobs)
+
+    def clear(self, priority: int = None):
+        """drop waiting jobs, only those of a priority if given"""
+        with self._cond:
+            self._jobs = [j for j in self._jobs if priority is not None and j[0] != priority]
+            heapq.heapify(self._jobs)
+            self._pending = {(j[3], j[4]) for j in self._jobs}
+
+    def _next_job(self):
+        with self._cond:
+            while self._running:
+                if self._jobs and self.is_idle(self._jobs[0][0]):
+                    job = heapq.heappop(self._jobs)
+                    self._pending.discard((job[3], job[4]))
+                    return job
+                # idle state is polled, nothing notifies when playback ends
+                self._cond.wait(self.poll if self._jobs else None)
+        return None
+
+    def run(self):
+        while self._running:
+            job = self._next_job()
+            if job is None:
+                break
+            _, _, deadline, utterance, lang, message, synth = job
+            if deadline is not None and monotonic() > deadline:
+                continue
+            start = monotonic()
+            try:
+                synth(utterance, lang, message)
+                self.done += 1
+            except Exception as e:
+                LOG.warning(f"background synthesis of '{utterance}' failed: {e}")
+            # duty cycle, leave the CPU to everything else
+            rest = (monotonic() - start) * (1 - self.max_cpu) / self.max_cpu
+            if rest > 0:
+                with self._cond:
+                    self._cond.wait_for(lambda: not self._running, timeout=rest)
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
@@ -1,34 +1,41 @@
 import base64
-import json
 import os
 import warnings
-import os.path
-from hashlib import md5
-from os.path import exists
-from queue import Queue
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
 from tempfile import gettempdir
-from threading import Thread, Lock
+from threading import Thread, Lock, RLock, Timer
 from typing import Optional
 
-import binascii
 import time
 from ovos_bus_client import Message, MessageBusClient
+from ovos_bus_client.message import dig_for_message
 from ovos_bus_client.session import SessionManager
+from ovos_bus_client.util import get_message_lang
 from ovos_config.config import Configuration
 from ovos_plugin_manager.g2p import get_g2p_lang_configs, get_g2p_supported_langs, get_g2p_module_configs
 from ovos_plugin_manager.tts import TTS
 from ovos_plugin_manager.tts import get_tts_supported_langs, get_tts_lang_configs, get_tts_module_configs
-from ovos_utils.file_utils import resolve_resource_file
+from ovos_utils.gui import can_use_local_gui
 from ovos_utils.log import LOG, deprecated
 from ovos_utils.metrics import Stopwatch
 from ovos_utils.process_utils import ProcessStatus, StatusCallbackMap
 from ovos_utils.sound import play_audio
 
 from ovos_audio.audio import AudioService
-from ovos_audio.playback import PlaybackThread
-from ovos_audio.transformers import DialogTransformersService
-from ovos_audio.tts import TTSFactory
-from ovos_audio.utils import report_timing, require_default_session
+from ovos_audio.blobs import AudioBlobStore
+from ovos_audio.catalog import PluginCatalog
+from ovos_audio.config import ConfigSnapshot, ConfigStore, FrozenDict, get_config_store, thaw
+from ovos_audio.output import create_audio_output
+from ovos_audio.playback import PlaybackThread, PlaybackQueue
+from ovos_audio.prewarm import PREFETCH, PREWARM, BackgroundSynth, RateLimiter, UtteranceStats
+from ovos_audio.sounds import SoundCache, resolve_sound_uri
+from ovos_audio.startup import StartupGraph
+from ovos_audio.transformers import DialogTransformersService, TTSTransformersService
+from ovos_audio.tts import TTSFactory, limit_synth
+from ovos_audio.utils import report_timing, require_default_session, \
+    speech_chunks, split_sentences
+from ovos_audio.volume import VolumeCache
 
 
 def on_ready():
@@ -51,13 +58,18 @@ def on_stopping():
     LOG.info('TTS service is shutting down...')
 
 
+# startup steps needed to serve "speak"
+SPEAK_STEPS = ("playback", "tts")
+
+
 class PlaybackService(Thread):
     def __init__(self, ready_hook=on_ready, error_hook=on_error,
                  stopping_hook=on_stopping, alive_hook=on_alive,
                  started_hook=on_started, watchdog=lambda: None,
                  bus=None, disable_ocp=None, validate_source=True,
                  tts: Optional[TTS] = None,
-                 disable_fallback: bool = False):
+                 disable_fallback: bool = False,
+                 config_store: Optional[ConfigStore] = None):
         super(PlaybackService, self).__init__()
 
         LOG.info("Starting Audio Service")
@@ -65,40 +77,78 @@ class PlaybackService(Thread):
                                       on_stopping=stopping_hook,
                                       on_alive=alive_hook,
                                       on_started=started_hook)
+        # orders mycroft.audio.queue requests, speech is ordered per session
         self.playback_lock = Lock()
+        self._session_locks = {}
+        self._session_locks_lock = Lock()
         self.status = ProcessStatus('audio', callback_map=callbacks)
         self.status.set_started()
 
-        self.config = Configuration()
+        # an explicit store is not reloaded from mycroft.conf
+        self._follow_config = config_store is None
+        if config_store is None:
+            config_store = get_config_store()
+            # pick up changes made before the config watcher was registered
+            config_store.reload(Configuration())
+        self.config_store = config_store
         self.tts: Optional[TTS] = tts
         self._tts_hash = None
+        # guards swapping engines, never held while an engine loads or synthesizes
         self.lock = Lock()
+        self._reload_lock = Lock()
+        self._reload_timer: Optional[Timer] = None
+        self._engine_users = {}  # id(engine) -> requests using it
+        self._retired = {}  # id(engine) -> replaced engine still in use
+        if tts is not None:
+            # engines created by TTSFactory are limited already
+            limit_synth(tts, self.config.concurrent_synth)
         self.disable_reload = tts is not None
         self.disable_fallback = disable_fallback
         self.fallback_tts: Optional[TTS] = None
+        self._fallback_lock = RLock()
         self._fallback_tts_hash = None
         self._last_stop_signal = 0
+        self._active_pipelines = 0
+        self._pipelines_lock = Lock()
         self.validate_source = validate_source
+        # blobs waiting in the playback queue are not evicted
+        self.blob_store = AudioBlobStore(**self.config.get("audio_blob_store", {}),
+                                         in_use=self._is_queued)
+        # instant sounds may play over speech, they get their own sink
+        out_cfg = self.config.get("audio_output", {})
+        self.sound_output = create_audio_output(dict(out_cfg, path=out_cfg.get("sounds_path")))
+        self.sound_cache = SoundCache(**self.config.get("sound_cache", {}))
+        # instant sounds play in workers, the bus thread never waits on them
+        snd_cfg = self.config.get("instant_sounds", {})
+        self._sound_pool = ThreadPoolExecutor(max_workers=snd_cfg.get("max_concurrent", 4),
+                                              thread_name_prefix="instant_sound")
+        self._pending_sounds = 0
+        self._recent_sounds = {}  # audio_file -> (monotonic, future)
+        self._sounds_lock = Lock()
 
         if not bus:
             bus = MessageBusClient()
             bus.run_in_thread()
         self.bus = bus
         self.status.bind(self.bus)
+        self.volume = VolumeCache(self.bus, **self.config.get("volume_cache", {}))
+        persist_catalog = self.config.get("plugin_catalog", {}).get("persist", False)
+        self.tts_catalog = PluginCatalog("tts", self._build_tts_catalog, persist=persist_catalog)
+        self.g2p_catalog = PluginCatalog("g2p", self._build_g2p_catalog, persist=persist_catalog)
         self.init_messagebus()
-        self.dialog_transform = DialogTransformersService(self.bus)
         if TTS.queue is None:
-            TTS.queue = Queue()
-        self.playback_thread = PlaybackThread(TTS.queue, self.bus)
-        self.playback_thread.start()
-
-        try:
-            self._maybe_reload_tts()
-            if not self.disable_reload:
-                Configuration.set_config_watcher(self._maybe_reload_tts)
-        except Exception as e:
-            LOG.exception(e)
-            self.status.set_error(e)
+            TTS.queue = PlaybackQueue()
+
+        # frequent utterances are synthesized into the TTS cache when idle
+        prewarm_cfg = self.config.tts.get("prewarm") or {}
+        self.tts_usage = UtteranceStats(max_entries=prewarm_cfg.get("max_entries", 500)) \
+            if prewarm_cfg.get("enabled") else None
+        self.background_synth = BackgroundSynth(self._synth_to_cache, self._is_idle,
+                                                max_cpu=prewarm_cfg.get("max_cpu", 0.25))
+        self.background_synth.start()
+        prefetch_cfg = self.config.tts.get("prefetch") or {}
+        self.prefetch_limiter = RateLimiter(rate=prefetch_cfg.get("rate", 1.0),
+                                            burst=prefetch_cfg.get("burst", 5))
 
         self.audio = None
         self.audio_enabled = self.config.get("enable_old_audioservice", True)  # TODO default to False soon
@@ -106,12 +156,114 @@ class PlaybackService(Thread):
             disable_ocp = self.config.get("disable_ocp", False)  # TODO default to True soon
         self.disable_ocp = disable_ocp
         LOG.debug(f"legacy audio service enabled: {self.audio_enabled}")
+
+        # independent components load in parallel, speak only needs playback and TTS,
+        # the others attach once ready
+        self.dialog_transform: Optional[DialogTransformersService] = None
+        self.playback_thread: Optional[PlaybackThread] = None
+        self.startup = StartupGraph(on_complete=self._report_startup)
+        self.startup.add("playback", self._start_playback)
+        self.startup.add("tts", self._load_tts, after=["playback"])
+        self.startup.add("fallback_tts", self._reload_fallback_tts, after=["playback"])
+        self.startup.add("tts_transformers", self._load_tts_transformers, after=["playback"])
+        self.startup.add("sounds", self._warmup_sounds, after=["playback"])
+        self.startup.add("visemes", self._detect_viseme_display, after=["playback"])
+        self.startup.add("dialog_transformers", self._load_dialog_transformers)
+        # speak waits this long in total for the dialog transformers, a plugin
+        # stuck loading does not delay every utterance
+        load_timeout = (self.config.get("dialog_transformers") or {}).get("load_timeout", 5)
+        self._dialog_transform_deadline = time.monotonic() + load_timeout
         if self.audio_enabled:
-            try:
-                self.audio = AudioService(self.bus, disable_ocp=disable_ocp,
-                                          validate_source=validate_source)
-            except Exception as e:
-                LOG.exception(e)
+            self.startup.add("audio", lambda: self._load_audio(validate_source))
+        self.startup.start()
+        self.startup.wait(SPEAK_STEPS)
+
+    @property
+    def config(self) -> ConfigSnapshot:
+        """ read only snapshot of mycroft.conf, replaced on config changes """
+        return self.config_store.snapshot
+
+    @config.setter
+    def config(self, config: dict):
+        """ use a fixed config instead of mycroft.conf, eg. in tests
+
+        the service and its playback thread switch to an explicit store built
+        from config, bus and file config updates are ignored from now on
+        """
+        self.config_store = ConfigStore(config)
+        self._follow_config = False
+        if not self.disable_reload:
+            self.config_store.subscribe(self.handle_config_change, sections=["tts"])
+        if self.playback_thread is not None:
+            self.playback_thread._config_store = self.config_store
+
+    def _start_playback(self):
+        # tts transformers are loaded by their own startup step
+        self.playback_thread = PlaybackThread(TTS.queue, self.bus, load_transformers=False,
+                                              config_store=self.config_store)
+        self.playback_thread.start()
+
+    def _load_tts(self):
+        try:
+            self._reload_tts()
+            if not self.disable_reload:
+                self.config_store.subscribe(self.handle_config_change, sections=["tts"])
+            else:
+                self._prewarm()
+        except Exception as e:
+            self.status.set_error(e)
+            raise
+
+    def _load_tts_transformers(self):
+        # replaced as a whole, the playback thread never sees a half loaded service
+        self.playback_thread.tts_transform = TTSTransformersService(self.bus,
+                                                                    config_store=self.config_store)
+
+    def _detect_viseme_display(self):
+        """ a local GUI displays mouth movements, other displays (eg. a mk1 faceplate)
+        subscribe with ovos.audio.visemes.subscribe """
+        if can_use_local_gui():
+            LOG.debug("local GUI running, computing visemes")
+            self.playback_thread.visemes.add_consumer("gui")
+
+    def _load_dialog_transformers(self):
+        self.dialog_transform = DialogTransformersService(self.bus, config_store=self.config_store)
+
+    def _load_audio(self, validate_source: bool):
+        self.audio = AudioService(self.bus, disable_ocp=self.disable_ocp,
+                                  validate_source=validate_source,
+                                  config_store=self.config_store)
+        if self.audio.wait_for_load() and len(self.audio.service) == 0:
+            LOG.warning('No audio backends loaded! '
+                        'Audio playback is not available')
+            LOG.info("Running audio service in TTS only mode")
+
+    def _report_startup(self, report: dict):
+        """ emit how long each startup step took """
+        if self.audio:
+            report["audio_backends"] = dict(self.audio.load_times)
+        LOG.info(f"startup timings: {report}")
+        self.bus.emit(Message("ovos.audio.startup.timings", report))
+
+    def handle_config_reload(self, message: Message = None):
+        """ refresh the config snapshot after a bus config update """
+        if self._follow_config:
+            self.config_store.reload(Configuration())
+
+    def handle_config_change(self, snapshot: ConfigSnapshot, changes: dict):
+        """ called by the ConfigStore when keys of the "tts" section changed
+
+        a burst of changes (eg. a settings UI saving field by field) triggers a
+        single reload once the config is quiet for "reload_debounce" seconds
+        """
+        LOG.debug(f"tts config changed: {sorted(changes['tts'])}")
+        with self.lock:
+            if self._reload_timer:
+                self._reload_timer.cancel()
+            self._reload_timer = Timer(snapshot.tts.get("reload_debounce", 1.0),
+                                       self._maybe_reload_tts)
+            self._reload_timer.daemon = True
+            self._reload_timer.start()
 
     @staticmethod
     def get_tts_lang_options(lang, blacklist=None):
@@ -189,15 +341,7 @@ class PlaybackService(Thread):
         opts = []
         return opts
 
-    def handle_opm_tts_query(self, message):
-        """ Responds to opm.tts.query with data about installed plugins
-
-        Response message.data will contain:
-        "langs" - list of supported languages
-        "plugins" - {lang: [list_of_plugins]}
-        "configs" - {plugin_name: {lang: [list_of_valid_configs]}}
-        "options" - {lang: [list_of_valid_ui_metadata]}
-        """
+    def _build_tts_catalog(self) -> dict:
         plugs = get_tts_supported_langs()
         configs = {}
         opts = {}
@@ -206,16 +350,18 @@ class PlaybackService(Thread):
                 configs[p] = get_tts_module_configs(p)
             opts[lang] = self.get_tts_lang_options(lang)
 
-        data = {
+        return {
             "plugins": plugs,
             "langs": list(plugs.keys()),
             "configs": configs,
             "options": opts
         }
-        self.bus.emit(message.response(data))
 
-    def handle_opm_g2p_query(self, message):
-        """ Responds to opm.g2p.query with data about installed plugins
+    def handle_opm_tts_query(self, message):
+        """ Responds to opm.tts.query with data about installed plugins
+
+        answered from the plugin catalog, only rebuilt when plugins change,
+        an optional "lang" in message.data restricts the response to that language
 
         Response message.data will contain:
         "langs" - list of supported languages
@@ -223,6 +369,9 @@ class PlaybackService(Thread):
         "configs" - {plugin_name: {lang: [list_of_valid_configs]}}
         "options" - {lang: [list_of_valid_ui_metadata]}
         """
+        self.bus.emit(message.response(self.tts_catalog.get(message.data.get("lang"))))
+
+    def _build_g2p_catalog(self) -> dict:
         plugs = get_g2p_supported_langs()
         configs = {}
         opts = {}
@@ -231,13 +380,26 @@ class PlaybackService(Thread):
                 configs[p] = get_g2p_module_configs(p)
             opts[lang] = self.get_g2p_lang_options(lang)
 
-        data = {
+        return {
             "plugins": plugs,
             "langs": list(plugs.keys()),
             "configs": configs,
             "options": opts
         }
-        self.bus.emit(message.response(data))
+
+    def handle_opm_g2p_query(self, message):
+        """ Responds to opm.g2p.query with data about installed plugins
+
+        answered from the plugin catalog, only rebuilt when plugins change,
+        an optional "lang" in message.data restricts the response to that language
+
+        Response message.data will contain:
+        "langs" - list of supported languages
+        "plugins" - {lang: [list_of_plugins]}
+        "configs" - {plugin_name: {lang: [list_of_valid_configs]}}
+        "options" - {lang: [list_of_valid_ui_metadata]}
+        """
+        self.bus.emit(message.response(self.g2p_catalog.get(message.data.get("lang"))))
 
     @deprecated("audio service moved to ovos-media", "0.1.0")
     def handle_opm_audio_query(self, message):
@@ -267,11 +429,8 @@ class PlaybackService(Thread):
             if not self.disable_ocp:
                 LOG.warning("OCP has moved to ovos-media, if you already migrated to ovos-media "
                             'set "disable_ocp": true in mycroft.conf')
-            if self.audio.wait_for_load():
-                if len(self.audio.service) == 0:
-                    LOG.warning('No audio backends loaded! '
-                                'Audio playback is not available')
-                    LOG.info("Running audio service in TTS only mode")
+        # the audio backends and transformers may still be loading
+        self.startup.wait(SPEAK_STEPS)
         # If at least TTS exists, report ready
         if self.tts:
             self.status.set_ready()
@@ -289,8 +448,10 @@ class PlaybackService(Thread):
         utterance = message.data['utterance']
         listen = message.data.get("listen", False)
 
-        ctxt = self.tts._get_ctxt({"message": message})
-        wav, _ = self.tts.synth(utterance, ctxt)
+        with self._use_tts() as tts:
+            ctxt = tts._get_ctxt({"message": message})
+            wav, _ = tts.synth(utterance, ctxt)
+            tts_id = tts.plugin_id
         # cast to str() to get a path, as it is a AudioFile object from tts cache
         with open(str(wav), "rb") as f:
             audio = f.read()
@@ -298,13 +459,76 @@ class PlaybackService(Thread):
         b64_audio = base64.b64encode(audio).decode("utf-8")
         self.bus.emit(message.response({"audio": b64_audio,
                                         "listen": listen,
-                                        'tts_id': self.tts.plugin_id,
+                                        'tts_id': tts_id,
                                         "utterance": utterance}))
 
         stopwatch.stop()
         report_timing(sess.session_id, stopwatch,
                       {'utterance': utterance,
-                       'tts': self.tts.plugin_id})
+                       'tts': tts_id})
+
+    def handle_b64_audio_stream(self, message):
+        """synthesizes speech and streams it b64 encoded in the bus
+
+        streaming variant of speak:b64_audio, the utterance is synthesized
+        one sentence at a time and each sentence is emitted as soon as it is
+        ready, optionally split in windows of "chunk_size" bytes
+
+        chunks are emitted as "speak:b64_audio.stream.chunk" with an
+        increasing "seq" and a terminal "speak:b64_audio.stream.end"
+        message reports the number of chunks sent
+
+        every sentence is a complete audio file, with "chunk_size" only the
+        first chunk of a sentence carries the file header and chunks are not
+        aligned to audio frames. Clients concatenate the chunks of the same
+        "sentence_index" and decode them once "sentence_end" is True
+        """
+        sess = SessionManager.get(message)
+        stopwatch = Stopwatch()
+        stopwatch.start()
+        utterance = message.data['utterance']
+        listen = message.data.get("listen", False)
+        chunk_size = message.data.get("chunk_size") or 0
+
+        seq = 0
+        error = None
+        # the whole utterance is spoken by one voice, even if it is replaced meanwhile
+        with self._use_tts() as tts:
+            tts_id = tts.plugin_id
+            ctxt = tts._get_ctxt({"message": message})
+            try:
+                for idx, sentence in enumerate(split_sentences(utterance, ctxt.lang)):
+                    wav, _ = tts.synth(sentence, ctxt)
+                    with open(str(wav), "rb") as f:
+                        audio = f.read()
+                    step = chunk_size or len(audio) or 1
+                    for start in range(0, len(audio), step):
+                        chunk = audio[start:start + step]
+                        self.bus.emit(message.reply("speak:b64_audio.stream.chunk",
+                                                    {"audio": base64.b64encode(chunk).decode("utf-8"),
+                                                     "seq": seq,
+                                                     "sentence_index": idx,
+                                                     "sentence_end": start + step >= len(audio),
+                                                     "sentence": sentence,
+                                                     'tts_id': tts_id,
+                                                     "utterance": utterance}))
+                        seq += 1
+            except Exception as e:
+                LOG.exception(f"TTS stream failed! {e}")
+                error = str(e)
+
+        end = {"chunks": seq,
+               "listen": listen,
+               'tts_id': tts_id,
+               "utterance": utterance}
+        if error:
+            end["error"] = error
+        self.bus.emit(message.reply("speak:b64_audio.stream.end", end))
+
+        stopwatch.stop()
+        report_timing(sess.session_id, stopwatch,
+                      {'utterance': utterance,
+                       'tts': tts_id})
 
     @require_default_session()
     def handle_speak(self, message):
@@ -312,44 +536,95 @@ class PlaybackService(Thread):
 
         Parse sentences and invoke text to speech service.
         """
-        # NOTE: lock is needed to avoid race conditions,
-        # dont allow queuing until TTS synth finishes
-        with self.playback_lock:
-            # if the message is targeted and audio is not the target don't
-            # don't synthesise speech
-            message.context = message.context or {}
+        # if the message is targeted and audio is not the target don't
+        # don't synthesise speech
+        message.context = message.context or {}
 
-            # Get conversation ID
-            if 'ident' in message.context:
-                LOG.warning("'ident' context metadata is deprecated, use session_id instead")
+        # Get conversation ID
+        if 'ident' in message.context:
+            LOG.warning("'ident' context metadata is deprecated, use session_id instead")
 
-            sess = SessionManager.get(message)
+        sess = SessionManager.get(message)
 
+        # NOTE: lock is needed to avoid race conditions, dont allow queuing
+        # until TTS synth finishes, other sessions are not blocked
+        with self._session_lock(sess.session_id):
             stopwatch = Stopwatch()
             stopwatch.start()
 
-            utterance = message.data['utterance']
+            utterance = self._transform_dialog(message.data['utterance'], message, sess)
 
-            # allow dialog transformers to rewrite speech
-            skill_id = message.data.get("meta", {}).get("skill") or message.context.get("skill_id")
-            if skill_id and skill_id not in self.dialog_transform.blacklisted_skills:
-                utt2, message.context = self.dialog_transform.transform(dialog=utterance,
-                                                                        context=message.context,
-                                                                        sess=sess)
-                if utterance != utt2:
-                    LOG.debug(f"original dialog: {utterance}")
-                    LOG.info(f"dialog transformed to: {utt2}")
-                    utterance = utt2
+            # the engine recorded and reported is the one that speaks
+            with self._use_tts() as tts:
+                if self.tts_usage and tts:
+                    ctxt = tts._get_ctxt({"message": message})
+                    self.tts_usage.record(ctxt.tts_id, ctxt.lang, utterance)
 
-            listen = message.data.get('expect_response', False)
-            self.execute_tts(utterance, sess.session_id, listen, message)
+                listen = message.data.get('expect_response', False)
+                if self.config.sentence_pipeline:
+                    self.execute_tts_pipelined(utterance, sess.session_id, listen, message, tts)
+                else:
+                    self.execute_tts(utterance, sess.session_id, listen, message, tts)
+                plugin_id = tts.plugin_id if tts else ""
 
             stopwatch.stop()
-            plugin_id = self.tts.plugin_id if self.tts else ""
             report_timing(sess.session_id, stopwatch,
                           {'utterance': utterance,
                            'tts': plugin_id})
 
+    def _transform_dialog(self, utterance: str, message: Message, sess) -> str:
+        """ allow dialog transformers to rewrite speech """
+        if self.dialog_transform is None:  # still loading
+            remaining = self._dialog_transform_deadline - time.monotonic()
+            self.startup.wait(["dialog_transformers"], max(0.0, remaining))
+            if self.dialog_transform is None:
+                LOG.warning("dialog transformers not loaded, speaking the dialog untransformed")
+                return utterance
+        skill_id = message.data.get("meta", {}).get("skill") or message.context.get("skill_id")
+        if skill_id and skill_id not in self.dialog_transform.blacklisted_skills:
+            utt2, message.context = self.dialog_transform.transform(dialog=utterance,
+                                                                    context=message.context,
+                                                                    sess=sess)
+            if utterance != utt2:
+                LOG.debug(f"original dialog: {utterance}")
+                LOG.info(f"dialog transformed to: {utt2}")
+                utterance = utt2
+        return utterance
+
+    @require_default_session()
+    def handle_speak_prefetch(self, message):
+        """Handle "speak.prefetch" message
+
+        Synthesize an utterance into the TTS cache without playing it, so a
+        later "speak" with the same text starts right away. Prefetching runs
+        in the background after any speak being synthesized, dialog
+        transformers included
+        """
+        message.context = message.context or {}
+        utterance = message.data.get("utterance")
+        cfg = self.config.tts.get("prefetch") or {}
+        queued, reason = False, None
+        if not utterance:
+            reason = "no utterance"
+        elif not cfg.get("enabled", True):
+            reason = "disabled"
+        elif self.background_synth.pending >= cfg.get("max_pending", 20):
+            reason = "queue full"
+        elif not self.prefetch_limiter.allow():
+            reason = "rate limited"
+        else:
+            deadline = time.monotonic() + cfg.get("ttl", 30)
+            queued = self.background_synth.submit(utterance, message.data.get("lang"), message,
+                                                  priority=PREFETCH, deadline=deadline,
+                                                  synth=self._prefetch_to_cache)
+            if not queued:
+                reason = "already queued"
+        if reason:
+            LOG.debug(f"speak.prefetch ignored, {reason}: {utterance}")
+        self.bus.emit(message.response({"utterance": utterance,
+                                        "queued": queued,
+                                        "reason": reason}))
+
     def _maybe_reload_tts(self):
         """
         Load TTS modules if not yet loaded or if configuration has changed.
@@ -358,30 +633,55 @@ class PlaybackService(Thread):
         if self.disable_reload:
             LOG.debug("skipping TTS reload")
             return
+        self._reload_tts()
+        self._reload_fallback_tts()
 
-        config = Configuration().get("tts", {})
-        tts_m = config.get("module", "")
-        ftts_m = config.get("fallback_module", "")
-        _tts_hash = hash(json.dumps(config.get(tts_m, {}),
-                                    sort_keys=True))
-        _ftts_hash = hash(json.dumps(config.get(ftts_m, {}),
-                                     sort_keys=True))
+    def _reload_tts(self):
+        """ (re)load the main TTS engine if its configuration changed
 
-        # update TTS object if configuration has changed
-        if not self._tts_hash or self._tts_hash != _tts_hash:
+        the new engine is loaded and warmed up while the current one keeps
+        serving speak requests, then swapped in
+        """
+        if self.disable_reload:
+            return
+        with self._reload_lock:
+            config = self.config.tts
+            tts_m = config.get("module", "")
+            # hashes of frozen config sections are computed once per snapshot
+            _tts_hash = hash((tts_m, config.get(tts_m, FrozenDict())))
+            if self._tts_hash and self._tts_hash == _tts_hash:
+                return
+            LOG.info("(re)loading TTS engine")
+            try:
+                tts = TTSFactory.create(config.thaw())
+                tts.init(self.bus, self.playback_thread)
+            except Exception:
+                if self.tts is None:
+                    raise
+                LOG.exception(f"failed to load TTS engine {tts_m}, keeping the current one")
+                return
+            if self.tts is not None:
+                self._warmup_tts(tts)
             with self.lock:
-                if self.tts:
-                    self.tts.shutdown()
-                # Create new tts instance
-                LOG.info("(re)loading TTS engine")
-                self.tts = TTSFactory.create(config)
-                self.tts.init(self.bus, self.playback_thread)
+                old, self.tts = self.tts, tts
                 self._tts_hash = _tts_hash
+            self._retire_tts(old)
+        self._prewarm()
+
+    def _reload_fallback_tts(self):
+        """ (re)load the fallback TTS engine if its configuration changed
 
+        same as the main engine, a replacement is loaded in the background
+        """
+        if self.disable_reload:
+            return
         if self.disable_fallback:
             LOG.debug("skipping fallback TTS reload")
             return
 
+        config = self.config.tts
+        if not config.get("fallback_module", ""):
+            self._unload_fallback_tts()
         # if fallback TTS is the same as main TTS dont load it
         if config.get("module", "") == config.get("fallback_module", "") or not config.get("fallback_module", ""):
             LOG.debug("Skipping fallback TTS init, fallback is empty or same as main TTS")
@@ -391,47 +691,232 @@ class PlaybackService(Thread):
             LOG.debug("Skipping fallback TTS init")
             return
 
-        if not self._fallback_tts_hash or \
-                self._fallback_tts_hash != ftts_m:
-            with self.lock:
-                if self.fallback_tts:
-                    self.fallback_tts.shutdown()
-                # Create new tts instance
-                LOG.info("(re)loading fallback TTS engine")
+        ftts_m = config.get("fallback_module", "")
+        _ftts_hash = hash((ftts_m, config.get(ftts_m, FrozenDict())))
+        with self._fallback_lock:
+            if self._fallback_tts_hash and self._fallback_tts_hash == _ftts_hash:
+                return
+            if self.fallback_tts is None:
                 self._get_tts_fallback()
-                self._fallback_tts_hash = _ftts_hash
+            else:
+                LOG.info("reloading fallback TTS engine")
+                try:
+                    tts = self._create_fallback_tts(config)
+                except Exception:
+                    LOG.exception(f"failed to load fallback TTS engine {ftts_m}, keeping the current one")
+                    return
+                self._warmup_tts(tts)
+                with self.lock:
+                    old, self.fallback_tts = self.fallback_tts, tts
+                self._retire_tts(old)
+            self._fallback_tts_hash = _ftts_hash
+
+    def _unload_fallback_tts(self):
+        """ retire the fallback engine after it was removed from the config """
+        with self._fallback_lock:
+            with self.lock:
+                old, self.fallback_tts = self.fallback_tts, None
+                self._fallback_tts_hash = None
+        if old is not None:
+            LOG.info("fallback TTS removed from config, unloading it")
+            self._retire_tts(old)
+
+    @staticmethod
+    def _warmup_tts(tts: Optional[TTS]):
+        """ synthesize a word so lazily loaded models are ready before the swap """
+        if tts is None:
+            return
+        wav_file = os.path.join(gettempdir(), f"ovos_tts_swap_warmup_{id(tts)}.wav")
+        try:
+            tts.get_tts("hello", wav_file)
+        except Exception as e:
+            LOG.warning(f"TTS warmup failed: {e}")
+        if os.path.isfile(wav_file):
+            os.remove(wav_file)
+
+    @contextmanager
+    def _use_tts(self, fallback: bool = False):
+        """ the current engine, not shut down until the block exits even if replaced meanwhile """
+        if fallback:
+            self._get_tts_fallback()
+        with self.lock:
+            tts = self.fallback_tts if fallback else self.tts
+            self._engine_users[id(tts)] = self._engine_users.get(id(tts), 0) + 1
+        try:
+            yield tts
+        finally:
+            with self.lock:
+                users = self._engine_users.pop(id(tts)) - 1
+                if users:
+                    self._engine_users[id(tts)] = users
+                retired = self._retired.pop(id(tts), None) if not users else None
+            if retired is not None:
+                self._shutdown_tts(retired)
+
+    def _retire_tts(self, tts: Optional[TTS]):
+        """ shut down a replaced engine once the requests using it are done """
+        with self.lock:
+            if tts is None or tts is self.tts or tts is self.fallback_tts:
+                return
+            if self._engine_users.get(id(tts)):
+                self._retired[id(tts)] = tts
+                return
+        self._shutdown_tts(tts)
 
-    def execute_tts(self, utterance, ident, listen=False, message: Message = None):
+    def _shutdown_tts(self, tts: TTS):
+        LOG.debug(f"shutting down replaced TTS engine {tts}")
+        # TTS.shutdown stops the shared playback thread, the replacement may be speaking
+        detached = self.playback_thread.detach() if self.playback_thread else nullcontext()
+        try:
+            with detached:
+                tts.shutdown()
+        except Exception as e:
+            LOG.warning(f"failed to shutdown TTS engine: {e}")
+
+    def execute_tts(self, utterance, ident, listen=False, message: Message = None,
+                    tts: Optional[TTS] = None):
         """Mute mic and start speaking the utterance using selected tts backend.
 
         Args:
             utterance:  The sentence to be spoken
             ident:      Ident tying the utterance to the source query
             listen:     True if a user response is expected
+            tts:        engine held by the caller, defaults to the current one
         """
         LOG.info("Speak: " + utterance)
-        with self.lock:
+        with (nullcontext(tts) if tts else self._use_tts()) as tts:
             try:
-                self.tts.execute(utterance, ident, listen,
-                                 message=message)  # accepts random kwargs
+                tts.execute(utterance, ident, listen,
+                            message=message)  # accepts random kwargs
             except Exception as e:
                 LOG.exception(f"TTS synth failed! {e}")
                 if self._tts_hash != self._fallback_tts_hash:
                     self.execute_fallback_tts(utterance, ident, listen, message)
 
+    def execute_tts_pipelined(self, utterance, ident, listen=False, message: Message = None,
+                              tts: Optional[TTS] = None):
+        """Speak the utterance one sentence at a time.
+
+        Each sentence is queued as soon as it is synthesized, so playback of
+        sentence N overlaps synthesis of sentence N+1. Only the last sentence
+        carries the listen flag and a stop signal drops the remaining sentences
+
+        Args:
+            utterance:  The text to be spoken
+            ident:      Ident tying the utterance to the source query
+            listen:     True if a user response is expected
+            tts:        engine held by the caller, defaults to the current one
+        """
+        # the sentences are queued with this message, a stop drops them by it
+        message = message or dig_for_message() or \
+            Message("speak", {"utterance": utterance}, {"session": {"session_id": ident}})
+        lang = get_message_lang(message)
+        sentences = split_sentences(utterance, lang)
+        started = time.time()
+        with self._pipelines_lock:
+            self._active_pipelines += 1
+        self.playback_thread.begin_pipeline()
+        try:
+            for idx, sentence in enumerate(sentences):
+                if self._last_stop_signal > started:
+                    LOG.debug(f"speech stopped, dropping {len(sentences) - idx} sentences")
+                    break
+                is_last = idx == len(sentences) - 1
+                self.execute_tts(sentence, ident, listen and is_last, message, tts)
+            if self._last_stop_signal > started:
+                # the sentence being synthesized when stop was received got queued
+                # anyway, drop it but keep what others queued after the stop
+                self.playback_thread.discard(message)
+        finally:
+            with self._pipelines_lock:
+                self._active_pipelines -= 1
+            self.playback_thread.end_pipeline()
+
+    def _is_idle(self, priority: int = PREWARM) -> bool:
+        """ nothing is being spoken, queued or synthesized
+
+        prefetch only waits for speak requests being synthesized,
+        it does not compete with playback
+        """
+        if self._session_locks or self._active_pipelines:
+            return False
+        return priority <= PREFETCH or (not self.is_speaking and TTS.queue.empty())
+
+    def _synth_to_cache(self, utterance: str, lang: str = None, message: Message = None):
+        """ synthesize and transform an utterance into the caches, nothing is played
+
+        sentences are split the same way handle_speak would, so a later
+        speak with the same text and voice hits the cache
+        """
+        kwargs = {"message": message} if message else {}
+        if lang:
+            kwargs["lang"] = lang
+        with self._use_tts() as tts:
+            ctxt = tts._get_ctxt(kwargs)
+            for chunk in speech_chunks(tts, utterance, ctxt.lang, self.config.sentence_pipeline):
+                audio_file, _ = tts.synth(chunk, ctxt)
+                context = dict(message.context) if message else {}
+                self.playback_thread.tts_transform.transform(str(audio_file), context, cache=True)
+
+    def _prefetch_to_cache(self, utterance: str, lang: str = None, message: Message = None):
+        """ runs in the background synth thread, transformers may be slow or remote """
+        utterance = self._transform_dialog(utterance, message, SessionManager.get(message))
+        self._synth_to_cache(utterance, lang, message)
+
+    def _prewarm(self):
+        """ queue the most frequent utterances of the current voice for synthesis """
+        if not self.tts_usage or not self.tts:
+            return
+        cfg = self.config.tts.get("prewarm") or {}
+        deadline = time.monotonic() + cfg.get("max_seconds", 120)
+        self.background_synth.clear(PREWARM)  # jobs of a previous voice
+        for tts_id in list(self.tts_usage.voices):
+            lang = self.tts_usage.lang(tts_id)
+            if self.tts._get_ctxt({"lang": lang}).tts_id != tts_id:
+                continue  # recorded with another voice
+            for utterance in self.tts_usage.top(tts_id, cfg.get("top_n", 20)):
+                self.background_synth.submit(utterance, lang, deadline=deadline)
+
+    @contextmanager
+    def _session_lock(self, session_id: str):
+        """serialize speak requests of a single session
+
+        locks are reference counted and dropped once no request holds them
+        """
+        with self._session_locks_lock:
+            lock, users = self._session_locks.get(session_id) or (Lock(), 0)
+            self._session_locks[session_id] = (lock, users + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._session_locks_lock:
+                lock, users = self._session_locks[session_id]
+                if users <= 1:
+                    self._session_locks.pop(session_id)
+                else:
+                    self._session_locks[session_id] = (lock, users - 1)
+
+    def _create_fallback_tts(self, config: FrozenDict) -> Optional[TTS]:
+        engine = config.get("fallback_module", "")
+        if not engine:
+            return None
+        cfg = {"tts": {"module": engine,
+                       engine: thaw(config.get(engine, {}))}}
+        tts = TTSFactory.create(cfg)
+        tts.validator.validate()
+        tts.init(self.bus, self.playback_thread)
+        return tts
+
     def _get_tts_fallback(self) -> Optional[TTS]:
         """Lazily initializes the fallback TTS if needed."""
-        if not self.fallback_tts:
-            config = Configuration()
-            engine = config.get('tts', {}).get("fallback_module", "")
-            if not engine:
-                return
-            cfg = {"tts": {"module": engine,
-                           engine: config.get('tts', {}).get(engine, {})}}
-            self.fallback_tts = TTSFactory.create(cfg)
-            self.fallback_tts.validator.validate()
-            self.fallback_tts.init(self.bus, self.playback_thread)
-
+        if self.fallback_tts:  # a reload in progress does not block it
+            return self.fallback_tts
+        with self._fallback_lock:
+            if not self.fallback_tts:
+                tts = self._create_fallback_tts(self.config.tts)
+                with self.lock:
+                    self.fallback_tts = tts
         return self.fallback_tts
 
     def execute_fallback_tts(self, utterance, ident, listen, message: Message = None):
@@ -443,13 +928,13 @@ class PlaybackService(Thread):
             listen (bool): True if interaction should end with mycroft listening
         """
         try:
-            tts = self._get_tts_fallback()
-            if tts is None:
-                LOG.error("No fallback TTS available and main TTS failed!")
-                return
-            LOG.debug("TTS fallback, utterance : " + str(utterance))
-            tts.execute(utterance, ident, listen,
-                        message=message)  # accepts random kwargs
+            with self._use_tts(fallback=True) as tts:
+                if tts is None:
+                    LOG.error("No fallback TTS available and main TTS failed!")
+                    return
+                LOG.debug("TTS fallback, utterance : " + str(utterance))
+                tts.execute(utterance, ident, listen,
+                            message=message)  # accepts random kwargs
             return
         except Exception as e:
             LOG.error(e)
@@ -464,13 +949,53 @@ class PlaybackService(Thread):
         self.bus.emit(message.reply("mycroft.audio.is_speaking",
                                     {"speaking": self.is_speaking}))
 
+    def handle_playback_stats(self, message: Message):
+        """ Responds to ovos.audio.playback.stats with playback queue metrics
+
+        Response message.data will contain:
+        "queue_depth" - number of items waiting for playback
+        "oldest_item_age" - seconds the next item has been waiting
+        "playing" - if something is being played
+        "paused" - if playback is paused
+        "stop_latency" - seconds it took to go silent after the last stop
+        """
+        self.bus.emit(message.response(self.playback_thread.stats))
+
+    def handle_transformers_stats(self, message: Message):
+        """ Responds to ovos.audio.transformers.stats with per plugin timings
+
+        Response message.data will contain:
+        "dialog_transformers" / "tts_transformers" - {plugin_name: {
+            "calls", "failures", "timeouts", "skipped", "avg_time", "max_time", "disabled"}}
+        "dialog_cache" - {"entries", "hits", "misses"} if the dialog memo cache is enabled
+        """
+        dialog_transform = self.dialog_transform
+        cache = dialog_transform.cache if dialog_transform else None
+        self.bus.emit(message.response({
+            "dialog_transformers": dialog_transform.stats if dialog_transform else {},
+            "tts_transformers": self.playback_thread.tts_transform.stats,
+            "dialog_cache": cache.stats if cache else None}))
+
+    def handle_visemes_subscribe(self, message: Message):
+        """ Handle ovos.audio.visemes.subscribe, start sending enclosure.mouth.viseme_list
+
+        the G2P plugin is loaded on demand, once the first consumer subscribes
+        """
+        name = message.data.get("consumer") or message.context.get("skill_id") or "bus"
+        self.playback_thread.visemes.add_consumer(name)
+
+    def handle_visemes_unsubscribe(self, message: Message):
+        """ Handle ovos.audio.visemes.unsubscribe, G2P is unloaded without consumers """
+        name = message.data.get("consumer") or message.context.get("skill_id") or "bus"
+        self.playback_thread.visemes.remove_consumer(name)
+
     def handle_stop(self, message: Message):
         """Handle stop message.
 
         Shutdown any speech.
         """
-        # check PlaybackThread
-        if self.is_speaking:
+        # check PlaybackThread and sentences still being synthesized
+        if self.is_speaking or self._active_pipelines:
             self._last_stop_signal = time.time()
             self.tts.playback.clear()  # Clear here to get instant stop
             self.bus.emit(message.forward("mycroft.stop.handled", {"by": "TTS"}))
@@ -478,34 +1003,61 @@ class PlaybackService(Thread):
     @staticmethod
     def _resolve_sound_uri(uri: str) -> Optional[str]:
         """ helper to resolve sound files full path"""
-        if uri is None:
-            return None
-        if uri.startswith("snd/") or uri.startswith("snd\\"):
-            local_uri = os.path.join(os.path.dirname(__file__), "res", uri)
-            if os.path.isfile(local_uri):
-                return local_uri
-        audio_file = resolve_resource_file(uri)
-        if audio_file is None or not exists(audio_file):
-            raise FileNotFoundError(f"{audio_file} does not exist")
-        return audio_file
+        return resolve_sound_uri(uri)
 
-    @staticmethod
-    def _path_from_hexdata(hex_audio, audio_ext=None) -> str:
-        """ hex_audio contains hex string encoded bytes
-         audio_ext if not provided assumed to be wav
+    def _warmup_sounds(self):
+        """ decoded sounds are served from memory by the in process output
+        engines, without one only the resolved paths are cached """
+        outputs = [o for o in (self.sound_output, self.playback_thread.output) if o]
+        for output in outputs:
+            output.decoder = self.sound_cache.decode
+        Thread(target=self.sound_cache.warmup, kwargs={"decode": bool(outputs)},
+               daemon=True).start()
 
-        recommended encoding via binascii.hexlify(byte_data).decode('utf-8')
+    def _is_queued(self, audio_file: str) -> bool:
+        return self.playback_thread is not None and self.playback_thread.is_queued(audio_file)
+
+    def _path_from_payload(self, data: dict) -> Optional[str]:
+        """ store audio sent in message.data, returns the file path
+
+        the returned blob is pinned, release it with self.blob_store.unpin
+        once it is queued or played
+
+        accepted payloads:
+         "blob" - handle of audio previously stored via mycroft.audio.blob.put
+         "binary_data" - hex string encoded bytes (or raw bytes)
+         "b64_data" - base64 encoded bytes
+        audio_ext if not provided assumed to be wav
+
+        recommended encoding via base64.b64encode(byte_data).decode('utf-8')
         """
-        fname = md5(hex_audio.encode("utf-8")).hexdigest()
-        bindata = binascii.unhexlify(hex_audio)
+        if data.get("blob"):
+            audio_file = self.blob_store.get(data["blob"], pin=True)
+            if not audio_file:
+                raise FileNotFoundError(f"unknown audio blob: {data['blob']}")
+            return audio_file
+        hex_audio = data.get("binary_data")
+        b64_audio = data.get("b64_data")
+        if not hex_audio and not b64_audio:
+            return None
+        audio_ext = data.get("audio_ext")
         if not audio_ext:
             LOG.warning("audio extension not sent, assuming wav")
             audio_ext = "wav"
+        if isinstance(hex_audio, (bytes, bytearray)):
+            return self.blob_store.put_bytes(bytes(hex_audio), audio_ext, pin=True)
+        if hex_audio:
+            return self.blob_store.put_hex(hex_audio, audio_ext, pin=True)
+        return self.blob_store.put_b64(b64_audio, audio_ext, pin=True)
 
-        audio_file = f"{gettempdir()}/{fname}.{audio_ext}"
-        with open(audio_file, "wb") as f:
-            f.write(bindata)
-        return audio_file
+    def handle_blob_put(self, message):
+        """ store audio once and reply with a handle that can be sent as
+        "blob" in mycroft.audio.queue / mycroft.audio.play_sound requests """
+        audio_file = self._path_from_payload(message.data)
+        if not audio_file:
+            raise ValueError(f"message.data needs to provide 'binary_data' or 'b64_data': {message.data}")
+        self.blob_store.unpin(audio_file)
+        self.bus.emit(message.response({"blob": self.blob_store.handle(audio_file)}))
 
     @require_default_session()
     def handle_queue_audio(self, message):
@@ -513,61 +1065,99 @@ class PlaybackService(Thread):
          ensures it doesnt play over TTS """
         with self.playback_lock:
             viseme = message.data.get("viseme")
-            audio_file = message.data.get("uri") or \
-                         message.data.get("filename")  # backwards compat
-            hex_audio = message.data.get("binary_data")
-            audio_ext = message.data.get("audio_ext")
-            if hex_audio:
-                audio_file = self._path_from_hexdata(hex_audio, audio_ext)
-
+            audio_file = self._path_from_payload(message.data)
             if not audio_file:
-                raise ValueError(f"message.data needs to provide 'uri' or 'binary_data': {message.data}")
-            audio_file = self._resolve_sound_uri(audio_file)
+                uri = message.data.get("uri") or \
+                      message.data.get("filename")  # backwards compat
+                if not uri:
+                    raise ValueError(f"message.data needs to provide 'uri' or 'binary_data': {message.data}")
+                audio_file = self.sound_cache.resolve(uri)
 
             listen = message.data.get("listen", False)
 
             # expected queue contents: (data, visemes, listen, tts_id, message)
             # a sound does not have a tts_id, assign that to "sounds"
-            TTS.queue.put((str(audio_file), viseme, listen, "sounds", message))
+            try:
+                TTS.queue.put((str(audio_file), viseme, listen, "sounds", message))
+            finally:
+                # from now on the playback queue keeps it from being evicted
+                self.blob_store.unpin(audio_file)
 
     @require_default_session()
     def handle_instant_play(self, message):
-        """ play a sound file immediately (may play over TTS) """
-        audio_file = message.data.get("uri")
-        hex_audio = message.data.get("binary_data")
-        audio_ext = message.data.get("audio_ext")
-        if hex_audio:
-            audio_file = self._path_from_hexdata(hex_audio, audio_ext)
+        """ play a sound file immediately (may play over TTS)
+
+        playback runs in a worker pool, the response is emitted once the sound
+        finished playing. Identical sounds requested within "coalesce_window"
+        seconds are merged with the one already playing (or dropped)
+        """
+        audio_file = self._path_from_payload(message.data)
         if not audio_file:
-            raise ValueError(f"message.data needs to provide 'uri' or 'binary_data': {message.data}")
-
-        audio_file = self._resolve_sound_uri(audio_file)
-
-        # volume handling and audio service ducking
-        ensure_volume = message.data.get("force_unmute", False)
-        duck_pulse_handled = bool(self.tts and self.tts.config.get("pulse_duck"))
-        if ensure_volume:
-            volume_poll: Message = self.bus.wait_for_response(Message("mycroft.volume.get"), timeout=0.3)
-            volume = volume_poll.data.get("percent", 0) if volume_poll else 80
-            muted = volume_poll.data.get("muted", False) if volume_poll else False
-            volume_changed = False
-            if volume == 0:
-                self.bus.emit(Message("mycroft.volume.set", {"percent": 80,
-                                                             "play_sound": False}))
-                volume_changed = True
-            elif muted:
-                self.bus.emit(Message("mycroft.volume.unmute"))
-
-        play_audio(audio_file).wait()
-
-        if ensure_volume:
-            if volume_changed:
-                self.bus.emit(Message("mycroft.volume.set", {"percent": volume,
-                                                             "play_sound": False}))
-            if muted:
-                self.bus.emit(Message("mycroft.volume.mute"))
-
-        self.bus.emit(message.response({}))
+            if not message.data.get("uri"):
+                raise ValueError(f"message.data needs to provide 'uri' or 'binary_data': {message.data}")
+            audio_file = self.sound_cache.resolve(message.data["uri"])
+
+        snd_cfg = self.config.get("instant_sounds", {})
+        window = snd_cfg.get("coalesce_window", 0.5)
+        policy = snd_cfg.get("duplicate_policy", "coalesce")  # coalesce / drop / play
+        now = time.monotonic()
+        with self._sounds_lock:
+            self._recent_sounds = {k: v for k, v in self._recent_sounds.items()
+                                   if now - v[0] < window}
+            recent = self._recent_sounds.get(audio_file)
+            if recent and policy == "coalesce":
+                self.blob_store.unpin(audio_file)
+                recent[1].add_done_callback(
+                    lambda _: self.bus.emit(message.response({"coalesced": True})))
+                return
+            if (recent and policy == "drop") or \
+                    self._pending_sounds >= snd_cfg.get("max_pending", 16):
+                LOG.debug(f"dropped instant sound: {audio_file}")
+                self.blob_store.unpin(audio_file)
+                self.bus.emit(message.response({"dropped": True}))
+                return
+            self._pending_sounds += 1
+            future = self._sound_pool.submit(self._play_instant, audio_file, message)
+            self._recent_sounds[audio_file] = (now, future)
+
+    def _play_instant(self, audio_file: str, message: Message):
+        """ runs in the instant sound pool """
+        try:
+            # volume handling and audio service ducking
+            ensure_volume = message.data.get("force_unmute", False)
+            if ensure_volume:
+                volume, muted = self.volume.get()
+                volume_changed = False
+                if volume == 0:
+                    self.bus.emit(Message("mycroft.volume.set", {"percent": 80,
+                                                                 "play_sound": False}))
+                    self.volume.update(80)
+                    volume_changed = True
+                elif muted:
+                    self.bus.emit(Message("mycroft.volume.unmute"))
+                    self.volume.update(muted=False)
+
+            p = self.sound_output.play(audio_file) if self.sound_output else None
+            if p is None:  # no output engine or format not supported by it
+                p = play_audio(audio_file)
+            if p:
+                p.wait()
+
+            if ensure_volume:
+                if volume_changed:
+                    self.bus.emit(Message("mycroft.volume.set", {"percent": volume,
+                                                                 "play_sound": False}))
+                    self.volume.update(volume)
+                if muted:
+                    self.bus.emit(Message("mycroft.volume.mute"))
+                    self.volume.update(muted=True)
+        except Exception as e:
+            LOG.exception(f"failed to play {audio_file}: {e}")
+        finally:
+            self.blob_store.unpin(audio_file)
+            with self._sounds_lock:
+                self._pending_sounds -= 1
+            self.bus.emit(message.response({}))
 
     def handle_get_languages_tts(self, message):
         """
@@ -585,24 +1175,48 @@ class PlaybackService(Thread):
         Stop any playing audio and make sure threads are joined correctly.
         """
         self.status.set_stopping()
+        if self._reload_timer:
+            self._reload_timer.cancel()
+        # components still loading would be left running
+        if not self.startup.wait(timeout=10):
+            LOG.warning(f"shutting down before startup finished: {self.startup.timings}")
         if self.playback_thread:
             self.playback_thread.shutdown()
             self.playback_thread.join()
         if self.audio:
             self.audio.shutdown()
+        self._sound_pool.shutdown(wait=False, cancel_futures=True)
+        if self.sound_output:
+            self.sound_output.shutdown()
+        self.background_synth.stop()
+        if self.tts_usage:
+            self.tts_usage.save()
 
     def init_messagebus(self):
         """
         Start speech related handlers.
         """
         Configuration.set_config_update_handlers(self.bus)
+        # the file watcher only reports changes on disk, patches and remote
+        # config arrive on the bus. Registered after Configuration's own handlers
+        for msg_type in ("configuration.updated", "configuration.patch",
+                         "configuration.patch.clear", "configuration.cache.clear",
+                         "mycroft.paired", "mycroft.internet.connected"):
+            self.bus.on(msg_type, self.handle_config_reload)
         self.bus.on('mycroft.stop', self.handle_stop)
         self.bus.on('mycroft.audio.speech.stop', self.handle_stop)
         self.bus.on('mycroft.audio.speak.status', self.handle_speak_status)
+        self.bus.on('ovos.audio.playback.stats', self.handle_playback_stats)
+        self.bus.on('ovos.audio.transformers.stats', self.handle_transformers_stats)
+        self.bus.on('ovos.audio.visemes.subscribe', self.handle_visemes_subscribe)
+        self.bus.on('ovos.audio.visemes.unsubscribe', self.handle_visemes_unsubscribe)
         self.bus.on('mycroft.audio.queue', self.handle_queue_audio)
         self.bus.on('mycroft.audio.play_sound', self.handle_instant_play)
+        self.bus.on('mycroft.audio.blob.put', self.handle_blob_put)
         self.bus.on('speak', self.handle_speak)
+        self.bus.on('speak.prefetch', self.handle_speak_prefetch)
         self.bus.on('speak:b64_audio', self.handle_b64_audio)
+        self.bus.on('speak:b64_audio.stream', self.handle_b64_audio_stream)
         self.bus.on('ovos.languages.tts', self.handle_get_languages_tts)
         self.bus.on("opm.tts.query", self.handle_opm_tts_query)
         self.bus.on("opm.audio.query", self.handle_opm_audio_query)
@@ -0,0 +1,141 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+from collections import OrderedDict
+from os.path import exists
+from threading import Lock
+from typing import Iterable, List, Optional, Tuple
+
+from ovos_utils.file_utils import resolve_resource_file
+from ovos_utils.log import LOG
+
+from ovos_audio.output import AudioFormat, UnsupportedAudio, decode_audio
+
+RES_DIR = os.path.join(os.path.dirname(__file__), "res")
+
+
+def resolve_sound_uri(uri: str) -> Optional[str]:
+    """ helper to resolve sound files full path"""
+    if uri is None:
+        return None
+    if uri.startswith("snd/") or uri.startswith("snd\\"):
+        local_uri = os.path.join(RES_DIR, uri)
+        if os.path.isfile(local_uri):
+            return local_uri
+    audio_file = resolve_resource_file(uri)
+    if audio_file is None or not exists(audio_file):
+        raise FileNotFoundError(f"{audio_file} does not exist")
+    return audio_file
+
+
+def bundled_sounds() -> List[str]:
+    """uris of the sounds shipped in ovos_audio/res/snd"""
+    snd_dir = os.path.join(RES_DIR, "snd")
+    if not os.path.isdir(snd_dir):
+        return []
+    return [f"snd/{f}" for f in sorted(os.listdir(snd_dir))]
+
+
+class SoundCache:
+    """Bounded in-memory cache for sound effects
+
+    keeps the resolved path of sound uris and the decoded PCM of those
+    files, a hit skips the filesystem entirely. Both are least recently
+    used caches, PCM is bounded by size since a single long sound could
+    otherwise take all the memory
+
+    only files resolved through this cache have their PCM kept,
+    TTS audio is decoded on every call
+    """
+
+    def __init__(self, max_entries: int = 64, max_size_mb: float = 10,
+                 preload: Iterable[str] = ()):
+        self.max_entries = max_entries
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.preload = list(preload)
+        self._paths = OrderedDict()  # uri -> path
+        self._pcm = OrderedDict()  # path -> (pcm, fmt)
+        self._pcm_size = 0
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, uri: str) -> Optional[str]:
+        """full path of a sound uri, raises FileNotFoundError"""
+        if uri is None:
+            return None
+        with self._lock:
+            path = self._paths.get(uri)
+            if path is not None:
+                self._paths.move_to_end(uri)
+                self.hits += 1
+                return path
+        path = resolve_sound_uri(uri)
+        with self._lock:
+            self.misses += 1
+            self._paths[uri] = path
+            while len(self._paths) > self.max_entries:
+                self._paths.popitem(last=False)
+        return path
+
+    def decode(self, path: str) -> Tuple[bytes, AudioFormat]:
+        """decode_audio replacement for AudioOutput, raises UnsupportedAudio"""
+        with self._lock:
+            cached = self._pcm.get(path)
+            if cached is not None:
+                self._pcm.move_to_end(path)
+                self.hits += 1
+                return cached
+            known = path in self._paths.values()
+        pcm, fmt = decode_audio(path)
+        if known and len(pcm) <= self.max_size:
+            with self._lock:
+                if path not in self._pcm:
+                    self._pcm[path] = (pcm, fmt)
+                    self._pcm_size += len(pcm)
+                while self._pcm_size > self.max_size:
+                    _, (old, _) = self._pcm.popitem(last=False)
+                    self._pcm_size -= len(old)
+        return pcm, fmt
+
+    def warmup(self, uris: Iterable[str] = None, decode: bool = True):
+        """resolve (and decode) sounds ahead of the first request
+
+        defaults to the bundled sounds and the configured preload list
+        """
+        if uris is None:
+            uris = bundled_sounds() + self.preload
+        for uri in uris:
+            try:
+                path = self.resolve(uri)
+                if decode:
+                    self.decode(path)
+            except (FileNotFoundError, UnsupportedAudio) as e:
+                LOG.debug(f"sound not prewarmed: {e}")
+            except Exception as e:
+                LOG.warning(f"failed to prewarm sound {uri}: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._paths.clear()
+            self._pcm.clear()
+            self._pcm_size = 0
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            return {"paths": len(self._paths),
+                    "decoded": len(self._pcm),
+                    "decoded_bytes": self._pcm_size,
+                    "hits": self.hits,
+                    "misses": self.misses}
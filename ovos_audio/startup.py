@@ -0,0 +1,88 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from threading import Event, Lock, Thread
+from typing import Callable, Dict, Iterable, Optional
+
+from ovos_utils.log import LOG
+from time import monotonic
+
+
+class StartupGraph:
+    """Runs initialization steps in parallel, each once its dependencies are done
+
+    a step whose dependency failed is skipped. Timings are seconds since
+    start(), on_complete is called with report() after the last step
+    """
+
+    def __init__(self, on_complete: Optional[Callable[[dict], None]] = None):
+        self.on_complete = on_complete
+        self._steps = {}  # name -> (callable, dependencies)
+        self._done: Dict[str, Event] = {}
+        self._lock = Lock()
+        self._remaining = 0
+        self._t0 = None
+        self.timings = {}  # name -> {"start", "duration", "error"}
+        self.errors = {}  # name -> error message
+
+    def add(self, name: str, step: Callable[[], None], after: Iterable[str] = ()):
+        self._steps[name] = (step, tuple(after))
+        self._done[name] = Event()
+
+    def start(self):
+        self._t0 = monotonic()
+        self._remaining = len(self._steps)
+        for name in self._steps:
+            # daemon, a hung plugin must not block shutdown
+            Thread(target=self._run, args=(name,), name=f"startup_{name}", daemon=True).start()
+
+    def _run(self, name: str):
+        step, after = self._steps[name]
+        for dep in after:
+            self._done[dep].wait()
+        start = monotonic()
+        failed = [dep for dep in after if dep in self.errors]
+        if failed:
+            self.errors[name] = f"skipped, {failed} failed"
+        else:
+            try:
+                step()
+            except Exception as e:
+                LOG.exception(f"startup step {name} failed: {e}")
+                self.errors[name] = str(e)
+        self.timings[name] = {"start": round(start - self._t0, 3),
+                              "duration": round(monotonic() - start, 3),
+                              "error": self.errors.get(name)}
+        with self._lock:
+            self._remaining -= 1
+            complete = self._remaining == 0
+        # reported before the last step is marked done, wait() covers it
+        if complete and self.on_complete:
+            try:
+                self.on_complete(self.report())
+            except Exception as e:
+                LOG.error(f"startup report failed: {e}")
+        self._done[name].set()
+
+    def wait(self, names: Iterable[str] = None, timeout: float = None) -> bool:
+        """block until the given steps (default all) ran, False on timeout"""
+        deadline = None if timeout is None else monotonic() + timeout
+        for name in names or self._steps:
+            remaining = None if deadline is None else max(0.0, deadline - monotonic())
+            if not self._done[name].wait(remaining):
+                return False
+        return True
+
+    def report(self) -> dict:
+        timings = dict(self.timings)
+        return {"steps": timings,
+                "total": max((t["start"] + t["duration"] for t in timings.values()), default=0.0)}
@@ -1,21 +1,277 @@
+import hashlib
+import json
+import os
+import shutil
+import wave
+from collections import OrderedDict
+from collections.abc import Mapping
+from threading import Lock, Thread
+from typing import Callable, List, NamedTuple, Optional, Tuple
+from uuid import uuid4
+
 from ovos_bus_client.session import Session, SessionManager
-from ovos_config import Configuration
 from ovos_plugin_manager.dialog_transformers import find_dialog_transformer_plugins, find_tts_transformer_plugins
+from ovos_utils.file_utils import get_temp_path
 from ovos_utils.log import LOG
-from typing import Tuple
+from time import monotonic, time
+
+from ovos_audio.config import ConfigStore, freeze, get_config_store, thaw
+from ovos_audio.output import UnsupportedAudio, decode_audio
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class AudioBuffer(NamedTuple):
+    """decoded audio passed between buffer capable tts transformers
+
+    samples are float32 in [-1, 1], shape (frames,) for mono
+    or (frames, channels)
+    """
+    samples: "np.ndarray"
+    sample_rate: int
+
+
+_DTYPES = {1: ("uint8", 128.0, 128.0), 2: ("<i2", 0.0, 32768.0), 4: ("<i4", 0.0, 2147483648.0)}
+
+
+def read_audio_buffer(path: str) -> AudioBuffer:
+    """decode an audio file, raises UnsupportedAudio"""
+    if np is None:
+        raise UnsupportedAudio("pip install numpy")
+    pcm, (rate, channels, width) = decode_audio(path)
+    if width not in _DTYPES:
+        raise UnsupportedAudio(f"{path}: unsupported sample width {width}")
+    dtype, offset, scale = _DTYPES[width]
+    samples = (np.frombuffer(pcm, dtype=dtype).astype(np.float32) - offset) / scale
+    if channels > 1:
+        samples = samples.reshape(-1, channels)
+    return AudioBuffer(samples, rate)
+
+
+def write_audio_buffer(path: str, audio: AudioBuffer) -> str:
+    """write an AudioBuffer as a 16 bit wav file"""
+    samples = np.asarray(audio.samples, dtype=np.float32)
+    channels = 1 if samples.ndim == 1 else samples.shape[1]
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+    with wave.open(path, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(int(audio.sample_rate))
+        w.writeframes(pcm)
+    return path
+
+
+class TransformerChain:
+    """Ordered transformer plugins with time budgets and a circuit breaker
+
+    the order is computed once and only recomputed when the loaded plugins
+    change. Budgets and breaker settings are read from the plugin config,
+    falling back to the same keys in the transformers section:
+        "timeout" - seconds a plugin may take, it is skipped after that (default no limit)
+        "max_failures" - consecutive errors/timeouts before the plugin is disabled (default 5)
+        "cooldown" - seconds a disabled plugin is skipped before being retried (default 60)
+
+    a plugin that ran out of time keeps running in a daemon thread,
+    its result is discarded. fn must not share output files between calls,
+    the abandoned call may still be writing
+    """
+
+    def __init__(self, config, name: str = "transformers"):
+        self.config = config
+        self.name = name
+        self._key = None
+        self._ordered = []
+        self._stats = {}
+        self._lock = Lock()
+
+    def ordered(self, loaded: dict) -> List[tuple]:
+        """(name, plugin) pairs in priority order, higher priority first"""
+        key = tuple((n, id(p)) for n, p in loaded.items())
+        if key != self._key:
+            self._ordered = sorted(loaded.items(), key=lambda k: k[1].priority, reverse=True)
+            self._key = key
+        return self._ordered
+
+    def _setting(self, name: str, key: str, default=None):
+        plugin_cfg = self.config.get(name) or {}
+        return plugin_cfg.get(key, self.config.get(key, default))
+
+    def _plugin_stats(self, name: str) -> dict:
+        st = self._stats.get(name)
+        if st is None:
+            st = self._stats[name] = {"calls": 0, "failures": 0, "timeouts": 0,
+                                      "skipped": 0, "total_time": 0.0, "max_time": 0.0,
+                                      "consecutive_failures": 0, "disabled_until": None}
+        return st
+
+    def _is_disabled(self, st: dict) -> bool:
+        until = st["disabled_until"]
+        return until is not None and monotonic() < until
+
+    def _failed(self, name: str, st: dict):
+        st["consecutive_failures"] += 1
+        if st["consecutive_failures"] >= self._setting(name, "max_failures", 5):
+            cooldown = self._setting(name, "cooldown", 60)
+            st["disabled_until"] = monotonic() + cooldown
+            LOG.warning(f"{self.name}: disabling {name} for {cooldown} seconds, "
+                        f"{st['consecutive_failures']} consecutive failures")
+
+    def _call(self, fn: Callable, plugin, data, context, timeout):
+        if not timeout:
+            return fn(plugin, data, context)
+        result = {}
+
+        def target():
+            try:
+                # may outlive the timeout, give it its own context
+                result["value"] = fn(plugin, data, dict(context or {}))
+            except Exception as e:
+                result["error"] = e
+
+        t = Thread(target=target, daemon=True)
+        t.start()
+        t.join(timeout)
+        if t.is_alive():
+            raise TimeoutError
+        if "error" in result:
+            raise result["error"]
+        return result["value"]
+
+    def run(self, loaded: dict, fn: Callable, data, context, skipped: list = None):
+        """pass data through the chain, fn(plugin, data, context) -> (data, context)
+
+        names of plugins that were skipped or failed are appended to skipped
+        """
+        for name, plugin in self.ordered(loaded):
+            with self._lock:
+                st = self._plugin_stats(name)
+                if self._is_disabled(st):
+                    st["skipped"] += 1
+                    if skipped is not None:
+                        skipped.append(name)
+                    continue
+            LOG.debug(f"checking {self.name} plugin: {name}")
+            start = monotonic()
+            error = None
+            try:
+                data, context = self._call(fn, plugin, data, context,
+                                           self._setting(name, "timeout"))
+                LOG.debug(f"{name}: {data}")
+            except TimeoutError:
+                LOG.warning(f"{self.name}: {name} ran out of time, skipped")
+                error = "timeouts"
+            except Exception as e:
+                LOG.exception(e)
+                error = "failures"
+            elapsed = monotonic() - start
+            with self._lock:
+                st["calls"] += 1
+                st["total_time"] += elapsed
+                st["max_time"] = max(st["max_time"], elapsed)
+                if error:
+                    st[error] += 1
+                    self._failed(name, st)
+                    if skipped is not None:
+                        skipped.append(name)
+                else:
+                    st["consecutive_failures"] = 0
+                    st["disabled_until"] = None
+        return data, context
+
+    @property
+    def stats(self) -> dict:
+        """per plugin call counts and timings, in seconds"""
+        with self._lock:
+            return {name: {"calls": st["calls"],
+                           "failures": st["failures"],
+                           "timeouts": st["timeouts"],
+                           "skipped": st["skipped"],
+                           "avg_time": st["total_time"] / st["calls"] if st["calls"] else 0.0,
+                           "max_time": st["max_time"],
+                           "disabled": self._is_disabled(st)}
+                    for name, st in self._stats.items()}
+
+
+class TransformCache:
+    """LRU memo of transformer results, entries expire after ttl seconds"""
+
+    def __init__(self, max_entries: int = 256, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires, value)
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
 
 
 class DialogTransformersService:
-    """ transform dialogs before being sent to TTS """
+    """ transform dialogs before being sent to TTS
 
-    def __init__(self, bus, config=None):
+    results can be memoized with a "cache": {"max_entries", "ttl"} entry in the
+    dialog_transformers config, only while every active plugin is deterministic,
+    declared by a `cacheable = True` class attribute (or "cacheable" in its config).
+    Context keys a plugin depends on are listed in its `cache_context_keys`
+    """
+
+    def __init__(self, bus, config=None, config_store: Optional[ConfigStore] = None):
         self.loaded_plugins = {}
         self.has_loaded = False
         self.bus = bus
         # to activate a plugin, just add an entry to mycroft.conf for it
-        self.config = config or Configuration().get("dialog_transformers", {})
+        # an explicit config (even an empty one) is used as is and never reloaded
+        if config is None:
+            store = config_store or get_config_store()
+            config = store.snapshot.section("dialog_transformers")
+            store.subscribe(self.handle_config_change, sections=["dialog_transformers"])
+        self.config = config
+        self.chain = TransformerChain(self.config, "dialog_transformers")
+        self.cache = self._create_cache()
         self.load_plugins()
 
+    def _create_cache(self) -> Optional[TransformCache]:
+        cache_cfg = self.config.get("cache")
+        if not cache_cfg:
+            return None
+        # "cache": true uses the defaults
+        return TransformCache(**thaw(cache_cfg)) if isinstance(cache_cfg, Mapping) else TransformCache()
+
+    def handle_config_change(self, snapshot, changes):
+        """reload the plugins whose config changed"""
+        self.config = self.chain.config = snapshot.section("dialog_transformers")
+        self.cache = self._create_cache()
+        self.load_plugins(changes["dialog_transformers"])
+
     @property
     def blacklisted_skills(self):
         # dialog should NEVER be rewritten if it comes from these skills
@@ -23,14 +279,19 @@ class DialogTransformersService:
                                ["skill-ovos-icanhazdadjokes.openvoiceos"] # blacklist jokes by default
                                )
 
-    def load_plugins(self):
+    def load_plugins(self, names=None):
+        """load configured plugins, only the given names if set"""
         for plug_name, plug in find_dialog_transformer_plugins().items():
+            if names is not None:
+                if plug_name not in names:
+                    continue
+                self._unload_plugin(plug_name)
             if plug_name in self.config:
                 # if disabled skip it
                 if not self.config[plug_name].get("active", True):
                     continue
                 try:
-                    self.loaded_plugins[plug_name] = plug(config=self.config[plug_name])
+                    self.loaded_plugins[plug_name] = plug(config=thaw(self.config[plug_name]))
                     self.loaded_plugins[plug_name].bind(self.bus)
                     LOG.info(f"loaded audio transformer plugin: {plug_name}")
                 except Exception as e:
@@ -48,8 +309,19 @@ class DialogTransformersService:
         A plugin of `priority` 1 will override any existing context keys and
         will be the last to modify `audio_data`
         """
-        return sorted(self.loaded_plugins.values(),
-                      key=lambda k: k.priority, reverse=True)
+        return [p for _, p in self.chain.ordered(self.loaded_plugins)]
+
+    @property
+    def stats(self) -> dict:
+        return self.chain.stats
+
+    def _unload_plugin(self, plug_name):
+        module = self.loaded_plugins.pop(plug_name, None)
+        if module is not None:
+            try:
+                module.shutdown()
+            except Exception as e:
+                LOG.warning(e)
 
     def shutdown(self):
         """
@@ -74,37 +346,90 @@ class DialogTransformersService:
         #    sess = Session.deserialize(sess)
         # active_transformers = sess.dialog_transformers or self.plugins
 
-        active_transformers = self.plugins
+        key = self._cache_key(dialog, sess.lang, context) if self.cache else None
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                dialog, changed = cached
+                return dialog, dict(context or {}, **changed)
 
-        for module in active_transformers:
-            try:
-                LOG.debug(f"checking dialog transformer: {module}")
-                dialog, context = module.transform(dialog, context=context)
-                LOG.debug(f"{module.name}: {dialog}")
-            except Exception as e:
-                LOG.exception(e)
+        skipped = []
+        before = dict(context or {})
+        dialog, context = self.chain.run(self.loaded_plugins,
+                                         lambda module, data, ctx: module.transform(data, context=ctx),
+                                         dialog, context, skipped)
+        if key is not None and not skipped:
+            self.cache.put(key, (dialog, {k: v for k, v in (context or {}).items()
+                                          if before.get(k) != v}))
         return dialog, context
 
+    def _cache_key(self, dialog: str, lang: str, context: dict) -> Optional[tuple]:
+        """None if a plugin is not cacheable"""
+        ordered = self.chain.ordered(self.loaded_plugins)
+        context = context or {}
+        plugins = []
+        ctx_keys = set()
+        for name, module in ordered:
+            plugin_cfg = self.config.get(name) or {}
+            if not plugin_cfg.get("cacheable", getattr(module, "cacheable", False)):
+                return None
+            plugins.append((name, freeze(plugin_cfg)))
+            ctx_keys.update(getattr(module, "cache_context_keys", ()))
+        ctx = tuple((k, json.dumps(context.get(k), sort_keys=True, default=str))
+                    for k in sorted(ctx_keys))
+        return dialog, lang, tuple(plugins), ctx
+
 
 class TTSTransformersService:
-    """ transform wav_files after TTS """
+    """ transform wav_files after TTS
+
+    plugins implementing transform_buffer(samples, sample_rate, context)
+    -> (samples, sample_rate, context) receive decoded audio (see AudioBuffer),
+    consecutive buffer plugins share it in memory and a wav file is only
+    written once at the end. Path based plugins get a file written for them
+
+    written files get a unique name in scratch_dir, never next to the source
+    (eg. sounds shipped in a read only package), and are removed after
+    "scratch_ttl" seconds. Cached results are kept next to the TTS cache entry
+    """
 
-    def __init__(self, bus=None, config=None):
+    def __init__(self, bus=None, config=None, autoload: bool = True,
+                 scratch_dir: str = None, config_store: Optional[ConfigStore] = None):
         self.loaded_plugins = {}
+        self.scratch_dir = scratch_dir or get_temp_path("ovos_audio", "tts_transformers")
+        self._last_prune = 0.0
         self.has_loaded = False
         self.bus = bus
         # to activate a plugin, just add an entry to mycroft.conf for it
-        self.config = config or Configuration().get("tts_transformers", {})
-        self.load_plugins()
+        # an explicit config (even an empty one) is used as is and never reloaded
+        if config is None:
+            store = config_store or get_config_store()
+            config = store.snapshot.section("tts_transformers")
+            store.subscribe(self.handle_config_change, sections=["tts_transformers"])
+        self.config = config
+        self.chain = TransformerChain(self.config, "tts_transformers")
+        self._cache_key = (None, None)
+        if autoload:
+            self.load_plugins()
+
+    def handle_config_change(self, snapshot, changes):
+        """reload the plugins whose config changed"""
+        self.config = self.chain.config = snapshot.section("tts_transformers")
+        self.load_plugins(changes["tts_transformers"])
 
-    def load_plugins(self):
+    def load_plugins(self, names=None):
+        """load configured plugins, only the given names if set"""
         for plug_name, plug in find_tts_transformer_plugins().items():
+            if names is not None:
+                if plug_name not in names:
+                    continue
+                self._unload_plugin(plug_name)
             if plug_name in self.config:
                 # if disabled skip it
                 if not self.config[plug_name].get("active", True):
                     continue
                 try:
-                    self.loaded_plugins[plug_name] = plug(config=self.config[plug_name])
+                    self.loaded_plugins[plug_name] = plug(config=thaw(self.config[plug_name]))
                     if self.bus:
                         self.loaded_plugins[plug_name].bind(self.bus)
                     LOG.info(f"loaded audio transformer plugin: {plug_name}")
@@ -128,8 +453,19 @@ class TTSTransformersService:
         A plugin of `priority` 1 will override any existing context keys and
         will be the last to modify `audio_data`
         """
-        return sorted(self.loaded_plugins.values(),
-                      key=lambda k: k.priority, reverse=True)
+        return [p for _, p in self.chain.ordered(self.loaded_plugins)]
+
+    @property
+    def stats(self) -> dict:
+        return self.chain.stats
+
+    def _unload_plugin(self, plug_name):
+        module = self.loaded_plugins.pop(plug_name, None)
+        if module is not None:
+            try:
+                module.shutdown()
+            except Exception as e:
+                LOG.warning(e)
 
     def shutdown(self):
         """
@@ -141,10 +477,100 @@ class TTSTransformersService:
             except Exception as e:
                 LOG.warning(e)
 
-    def transform(self, wav_file: str, context: dict = None, sess: Session = None) -> Tuple[str, dict]:
+    @property
+    def cache_key(self) -> str:
+        """stable hash of the active plugins and their config"""
+        ordered = self.chain.ordered(self.loaded_plugins)
+        if self._cache_key[0] != ordered:
+            cfg = [(name, thaw(self.config.get(name) or {})) for name, _ in ordered]
+            self._cache_key = (ordered, hashlib.md5(
+                json.dumps(cfg, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16])
+        return self._cache_key[1]
+
+    def _cache_index(self, wav_file: str) -> str:
+        return f"{os.path.splitext(wav_file)[0]}.{self.cache_key}.json"
+
+    def _load_cached(self, wav_file: str) -> Optional[Tuple[str, dict]]:
+        try:
+            with open(self._cache_index(wav_file)) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.isfile(cached["path"]):
+            return None
+        return cached["path"], cached["context"]
+
+    def is_cached(self, wav_file: str) -> bool:
+        """transform(wav_file, cache=True) would not run the plugins"""
+        return not self.loaded_plugins or self._load_cached(wav_file) is not None
+
+    def _save_cached(self, wav_file: str, result: str, context: dict) -> Optional[str]:
+        """keep the transformed audio next to the TTS cache entry, returns its path
+
+        context only holds the keys changed by the plugins
+        """
+        base = os.path.splitext(self._cache_index(wav_file))[0]
+        path = base + os.path.splitext(result)[1]
+        # unique part files, the same entry may be saved by concurrent transforms
+        part = f".{uuid4().hex[:12]}.part"
+        try:
+            index = json.dumps({"path": path, "context": context})
+            if result != path:
+                shutil.copyfile(result, path + part)
+                os.replace(path + part, path)
+            with open(base + part, "w") as f:
+                f.write(index)
+            os.replace(base + part, base + ".json")
+        except (OSError, TypeError, ValueError) as e:  # eg. context not serializable
+            LOG.debug(f"tts transformer result not cached: {e}")
+            return None
+        return path
+
+    def _scratch_file(self, wav_file: str) -> str:
+        """a new output path per call, transforms of the same file do not overwrite each other"""
+        os.makedirs(self.scratch_dir, exist_ok=True)
+        self._prune_scratch()
+        stem = os.path.splitext(os.path.basename(wav_file))[0]
+        return os.path.join(self.scratch_dir, f"{stem}.{self.cache_key}.{uuid4().hex[:12]}.wav")
+
+    def _prune_scratch(self):
+        """remove outputs old enough to have been played, at most once a minute"""
+        now = time()
+        if now - self._last_prune < 60:
+            return
+        self._last_prune = now
+        ttl = self.config.get("scratch_ttl", 3600)
+        for name in os.listdir(self.scratch_dir):
+            path = os.path.join(self.scratch_dir, name)
+            try:
+                if now - os.path.getmtime(path) > ttl:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _apply(module, data, context: dict, out_file: str):
+        """call a plugin with a path or a buffer, whatever it supports"""
+        if np is not None and hasattr(module, "transform_buffer"):
+            if not isinstance(data, AudioBuffer):
+                try:
+                    data = read_audio_buffer(data)
+                except UnsupportedAudio as e:
+                    LOG.debug(f"{module}: can not decode {data}, using transform: {e}")
+                    return module.transform(data, context=context)
+            samples, sample_rate, context = module.transform_buffer(
+                data.samples, data.sample_rate, context=context)
+            return AudioBuffer(samples, sample_rate), context
+        if isinstance(data, AudioBuffer):
+            data = write_audio_buffer(out_file, data)
+        return module.transform(data, context=context)
+
+    def transform(self, wav_file: str, context: dict = None, sess: Session = None,
+                  cache: bool = False) -> Tuple[str, dict]:
         """
         Get transformed audio and context for the preceding audio
         @param wav_file: str path for the TTS wav file
+        @param cache: reuse the result for this wav_file and plugin config
         @return: path to transformed wav file
         """
 
@@ -154,13 +580,35 @@ class TTSTransformersService:
         #    sess = Session.deserialize(sess)
         # active_transformers = sess.tts_transformers or self.plugins
 
-        active_transformers = self.plugins
+        if not self.loaded_plugins:
+            return wav_file, context
+        if cache:
+            cached = self._load_cached(wav_file)
+            if cached:
+                path, cached_ctx = cached
+                return path, dict(context or {}, **cached_ctx)
+        skipped = []
+        before = dict(context or {})
+        out_file = self._scratch_file(wav_file)
+        # every plugin call writes to its own file, a call that ran out of
+        # time keeps running and must not overwrite the audio used later
+        call_files = []
 
-        for module in active_transformers:
-            try:
-                LOG.debug(f"checking tts transformer: {module}")
-                wav_file, context = module.transform(wav_file, context=context or {})
-                LOG.debug(f"{module.name}: {wav_file}")
-            except Exception as e:
-                LOG.exception(e)
-        return wav_file, context
+        def apply(module, data, ctx):
+            call_files.append(self._scratch_file(wav_file))
+            return self._apply(module, data, ctx or {}, call_files[-1])
+
+        result, context = self.chain.run(self.loaded_plugins, apply, wav_file, context, skipped)
+        if isinstance(result, AudioBuffer):
+            result = write_audio_buffer(out_file, result)
+        for path in call_files:
+            if path != result and os.path.isfile(path):
+                os.remove(path)
+        # a result missing a plugin is not cached
+        if cache and not skipped and os.path.isfile(result):
+            cached = self._save_cached(wav_file, result,
+                                       {k: v for k, v in (context or {}).items() if before.get(k) != v})
+            if cached and result == out_file:
+                os.remove(out_file)  # served from the cache from now on
+                result = cached
+        return result, context
@@ -1,9 +1,172 @@
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from functools import wraps
+from tempfile import gettempdir
+from threading import BoundedSemaphore, Lock
+
 from ovos_config.config import Configuration
 from ovos_plugin_manager.tts import OVOSTTSFactory
+from ovos_utils.log import LOG
+
+from ovos_audio.config import synth_concurrency
 
 
 class TTSFactory(OVOSTTSFactory):
     @staticmethod
     def create(config=None):
         config = config or Configuration()
-        return OVOSTTSFactory.create(config)
+        tts = OVOSTTSFactory.create(config)
+        # accepts both the full config and the "tts" section
+        tts_cfg = config.get("tts", config)
+        pool_cfg = tts_cfg.get("process_pool", {})
+        if pool_cfg.get("size", 0) > 0:
+            TTSWorkerPool(config, **pool_cfg).attach(tts)
+        return limit_synth(tts, synth_concurrency(tts_cfg))
+
+
+def limit_synth(tts, max_concurrent: int = 1):
+    """allow at most max_concurrent get_tts calls at a time on an engine
+
+    only the synthesis itself is limited, cache lookups, transformers and
+    queueing of different sessions still run in parallel
+    """
+    slots = BoundedSemaphore(max_concurrent)
+    get_tts = tts.get_tts
+
+    # wraps keeps the plugin signature, TTS._get_ctxt filters kwargs with it
+    @wraps(get_tts)
+    def limited_get_tts(sentence, wav_file, **kwargs):
+        with slots:
+            return get_tts(sentence, wav_file, **kwargs)
+
+    tts.get_tts = limited_get_tts
+    return tts
+
+
+# the TTS engine living in a worker process
+_worker_tts = None
+
+
+def _init_worker(factory, config):
+    global _worker_tts
+    _worker_tts = factory(config)
+
+
+def _worker_get_tts(sentence, wav_file, kwargs):
+    return _worker_tts.get_tts(sentence, wav_file, **kwargs)
+
+
+class TTSWorkerPool:
+    """Run the CPU bound part of a TTS engine in worker processes
+
+    The engine created in the main process keeps handling caching, playback
+    queueing and plugin metadata, only get_tts is dispatched to the workers,
+    each one holding its own instance of the engine. Synthesis no longer
+    competes for the GIL with the bus and playback threads.
+
+    Workers write the audio directly to the cache path requested by
+    the main process and send back the path and phonemes
+    """
+
+    def __init__(self, config, size=2, warmup=True, restart_on_crash=True,
+                 max_restarts=3, timeout=60, factory=OVOSTTSFactory.create):
+        # make sure config can be pickled into a spawned process
+        self.config = json.loads(json.dumps(config))
+        self.size = size
+        self.warmup_enabled = warmup
+        self.restart_on_crash = restart_on_crash
+        self.max_restarts = max_restarts
+        self.timeout = timeout
+        self.factory = factory
+        self.restarts = 0
+        self._local_get_tts = None
+        self._lock = Lock()
+        self._executor = None
+        self._start()
+
+    def _start(self):
+        # spawn, forking would copy the bus client threads and their locks
+        ctx = multiprocessing.get_context("spawn")
+        self._executor = ProcessPoolExecutor(max_workers=self.size, mp_context=ctx,
+                                             initializer=_init_worker,
+                                             initargs=(self.factory, self.config))
+        if self.warmup_enabled:
+            self.warmup()
+
+    def warmup(self):
+        """load the engine in the workers before the first real request"""
+        wav_files = [os.path.join(gettempdir(), f"ovos_tts_warmup_{os.getpid()}_{i}.wav")
+                     for i in range(self.size)]
+        futures = [self._executor.submit(_worker_get_tts, "hello", wav_file, {})
+                   for wav_file in wav_files]
+        for f in futures:
+            try:
+                f.result(timeout=self.timeout)
+            except Exception as e:
+                LOG.warning(f"TTS worker warmup failed: {e}")
+        for wav_file in wav_files:
+            if os.path.isfile(wav_file):
+                os.remove(wav_file)
+        LOG.info(f"TTS worker pool ready ({self.size} processes)")
+
+    def restart(self, failed=None):
+        """replace the worker processes, eg. after a crash or a hung synth"""
+        with self._lock:
+            old = self._executor
+            if failed is not None and failed is not old:
+                return  # another request already restarted the pool
+            self.restarts += 1
+            # terminate hung workers, shutdown alone would wait for them
+            for p in list((getattr(old, "_processes", None) or {}).values()):
+                try:
+                    p.terminate()
+                except Exception:
+                    pass
+            old.shutdown(wait=False, cancel_futures=True)
+            LOG.warning(f"restarting TTS worker pool ({self.restarts}/{self.max_restarts})")
+            self._start()
+
+    def get_tts(self, sentence, wav_file, **kwargs):
+        """synthesize in a worker process, same signature as TTS.get_tts"""
+        while True:
+            executor = self._executor
+            try:
+                future = executor.submit(_worker_get_tts, sentence, wav_file, kwargs)
+                return future.result(timeout=self.timeout)
+            except (BrokenProcessPool, TimeoutError) as e:
+                LOG.error(f"TTS worker failed: {e!r}")
+                if not self.restart_on_crash or self.restarts >= self.max_restarts:
+                    break
+                self.restart(executor)
+        # the pool is gone for good, synth in this process
+        if self._local_get_tts is None:
+            raise RuntimeError("TTS worker pool failed")
+        LOG.warning("TTS worker pool unavailable, synthesizing in main process")
+        return self._local_get_tts(sentence, wav_file, **kwargs)
+
+    def attach(self, tts):
+        """route get_tts of a loaded engine through the pool"""
+        self._local_get_tts = tts.get_tts
+        local_shutdown = tts.shutdown
+
+        # wraps keeps the plugin signature, TTS._get_ctxt filters kwargs with it
+        @wraps(self._local_get_tts)
+        def get_tts(sentence, wav_file, **kwargs):
+            return self.get_tts(sentence, wav_file, **kwargs)
+
+        @wraps(local_shutdown)
+        def shutdown():
+            self.shutdown()
+            local_shutdown()
+
+        tts.get_tts = get_tts
+        tts.shutdown = shutdown
+        return tts
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
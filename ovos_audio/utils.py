@@ -12,9 +12,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import re
 import time
 from functools import wraps
 import warnings
+from typing import List
+
+import quebra_frases
 from ovos_bus_client.send_func import send
 from ovos_config import Configuration
 from ovos_utils.log import deprecated, LOG
@@ -95,3 +99,44 @@ def stop_speaking():
 
 def report_timing(ident, stopwatch, data):
     """ TODO - implement metrics upload at some point """
+
+
+def split_sentences(utterance: str, lang: str = None) -> List[str]:
+    """split an utterance into sentences that can be synthesized individually
+
+    SSML is returned untouched, splitting it would break the markup
+
+    Args:
+        utterance (str): text to be spoken
+        lang (str): language of the utterance, selects the sentence boundaries
+    Returns:
+        list: non empty sentences, in order
+    """
+    if "<speak" in utterance or "</" in utterance:
+        return [utterance] if utterance.strip() else []
+    lang = (lang or "").lower().split("-")[0]
+    if lang in ("zh", "ja"):
+        # full width punctuation, no whitespace between sentences
+        chunks = re.split(r"(?<=[。！？!?])", utterance)
+    else:
+        chunks = quebra_frases.sentence_tokenize(utterance)
+    return [c.strip() for c in chunks if c.strip()]
+
+
+def speech_chunks(tts, utterance: str, lang: str, split: bool = False):
+    """the chunks TTS.execute synthesizes for an utterance, in order
+
+    used to fill the TTS cache ahead of time, the chunks must hash the same
+    as the ones spoken later or the cache entries are never used
+
+    Args:
+        tts (TTS): the plugin that will speak the utterance
+        utterance (str): text to be spoken
+        lang (str): language of the utterance
+        split (bool): split into sentences first, like the sentence pipeline
+    """
+    sentences = split_sentences(utterance, lang) if split else [utterance]
+    for sentence in sentences:
+        sentence = tts.validate_ssml(sentence)
+        sentence = tts._replace_phonetic_spellings(sentence, lang)
+        yield from tts.preprocess_sentence(sentence)
@@ -0,0 +1,161 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock, Timer
+from typing import List, Mapping, Optional, Tuple
+
+from ovos_plugin_manager.g2p import OVOSG2PFactory
+from ovos_plugin_manager.templates.g2p import OutOfVocabulary, Grapheme2PhonemePlugin
+from ovos_utils.log import LOG
+
+Visemes = List[Tuple[str, float]]
+
+
+class VisemeService:
+    """Mouth movements for utterances, computed with the configured G2P plugin
+
+    results are kept in a least recently used cache keyed by utterance, lang
+    and plugin, computation runs in a worker thread so it can overlap with
+    the TTS transformers
+
+    the plugin is only loaded while something displays visemes (see
+    add_consumer) and unloaded again after idle_timeout seconds without use
+    """
+
+    def __init__(self, config: Mapping, max_entries: int = 256, idle_timeout: float = 300):
+        self.config = config
+        self.max_entries = config.get("cache_size", max_entries)
+        self.idle_timeout = config.get("idle_timeout", idle_timeout)
+        self.g2p: Optional[Grapheme2PhonemePlugin] = None
+        self._cache = OrderedDict()  # (utterance, lang, module) -> visemes
+        self._consumers = set()
+        self._lock = Lock()
+        self._load_lock = Lock()
+        self._load_failed = False
+        self._unload_timer = None
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="g2p")
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def module(self) -> Optional[str]:
+        return self.config.get("module")
+
+    @property
+    def enabled(self) -> bool:
+        """a G2P plugin is configured and something displays visemes"""
+        with self._lock:
+            return bool(self.module and self._consumers)
+
+    def add_consumer(self, name: str):
+        """something that displays visemes, eg. an enclosure"""
+        with self._lock:
+            self._consumers.add(name)
+            self._load_failed = False
+        if self.module:
+            # load ahead of the first utterance, off the playback path
+            self._pool.submit(self._load)
+
+    def remove_consumer(self, name: str):
+        with self._lock:
+            self._consumers.discard(name)
+            unused = not self._consumers
+        if unused:
+            self.unload()
+
+    def _load(self) -> Optional[Grapheme2PhonemePlugin]:
+        with self._load_lock:
+            return self._load_locked()
+
+    def _load_locked(self) -> Optional[Grapheme2PhonemePlugin]:
+        if self.g2p is None and not self._load_failed:
+            LOG.debug("Loading Grapheme2Phoneme plugin for mouth movements")
+            try:
+                self.g2p = OVOSG2PFactory.create()
+            except:  # not mission critical
+                LOG.warning(f"failed to load G2P plugin {self.module}")
+                self._load_failed = True
+        if self.g2p is not None and self.idle_timeout:
+            if self._unload_timer:
+                self._unload_timer.cancel()
+            self._unload_timer = Timer(self.idle_timeout, self.unload)
+            self._unload_timer.daemon = True
+            self._unload_timer.start()
+        return self.g2p
+
+    def unload(self):
+        """release the G2P plugin, it is loaded again on the next use"""
+        with self._load_lock:
+            if self._unload_timer:
+                self._unload_timer.cancel()
+                self._unload_timer = None
+            g2p, self.g2p = self.g2p, None
+        if g2p is not None:
+            LOG.debug("Unloading unused Grapheme2Phoneme plugin")
+            try:
+                if hasattr(g2p, "shutdown"):
+                    g2p.shutdown()
+            except Exception as e:
+                LOG.warning(e)
+
+    def get(self, utterance: str, lang: str) -> Optional[Visemes]:
+        """visemes of an utterance, None if the G2P plugin does not know it"""
+        if not utterance or not self.enabled:
+            return None
+        key = (utterance, lang, self.module)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+        # held while computing, unload() must not shutdown the plugin in use
+        with self._load_lock:
+            g2p = self._load_locked()
+            if g2p is None:
+                return None
+            visemes = None
+            try:
+                visemes = g2p.utterance2visemes(utterance, lang)
+            except OutOfVocabulary:
+                pass
+            except:
+                # this one is unplanned, let devs know all the info so they can fix it
+                LOG.exception(f"Unexpected failure in G2P plugin: {g2p}")
+                return None  # maybe transient, do not cache
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = visemes
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return visemes
+
+    def submit(self, utterance: str, lang: str) -> Optional[Future]:
+        """compute visemes in the background, None if they are not wanted"""
+        if not utterance or not self.enabled:
+            return None
+        return self._pool.submit(self.get, utterance, lang)
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            return {"module": self.module,
+                    "loaded": self.g2p is not None,
+                    "consumers": sorted(self._consumers),
+                    "cached": len(self._cache),
+                    "hits": self.hits,
+                    "misses": self.misses}
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+        self.unload()
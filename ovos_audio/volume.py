@@ -0,0 +1,89 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from threading import Lock
+from typing import Optional, Tuple
+
+from ovos_bus_client import Message
+from ovos_utils.log import LOG
+from time import monotonic
+
+
+class VolumeCache:
+    """Volume and mute state tracked from the volume events on the bus
+
+    the state is considered fresh for max_age seconds after the last event,
+    mycroft.volume.get is only polled once it went stale
+    """
+
+    def __init__(self, bus, max_age: float = 30, timeout: float = 0.3,
+                 default_volume: int = 80):
+        self.bus = bus
+        self.max_age = max_age
+        self.timeout = timeout
+        self.default_volume = default_volume
+        self.volume: Optional[int] = None
+        self.muted: Optional[bool] = None
+        self.updated_at: Optional[float] = None
+        self._lock = Lock()
+        self.bus.on("mycroft.volume.get.response", self.handle_volume_state)
+        self.bus.on("mycroft.volume.set", self.handle_volume_set)
+        self.bus.on("mycroft.volume.mute", self.handle_mute)
+        self.bus.on("mycroft.volume.unmute", self.handle_unmute)
+        # relative changes, the new value is unknown until polled again
+        self.bus.on("mycroft.volume.increase", self.invalidate)
+        self.bus.on("mycroft.volume.decrease", self.invalidate)
+        self.bus.on("mycroft.volume.mute.toggle", self.invalidate)
+
+    @property
+    def is_fresh(self) -> bool:
+        with self._lock:
+            return self.updated_at is not None and \
+                self.volume is not None and self.muted is not None and \
+                monotonic() - self.updated_at < self.max_age
+
+    def update(self, volume: Optional[int] = None, muted: Optional[bool] = None):
+        with self._lock:
+            if volume is not None:
+                self.volume = volume
+            if muted is not None:
+                self.muted = muted
+            self.updated_at = monotonic()
+
+    def invalidate(self, message: Message = None):
+        with self._lock:
+            self.updated_at = None
+
+    def handle_volume_state(self, message: Message):
+        self.update(message.data.get("percent"), message.data.get("muted"))
+
+    def handle_volume_set(self, message: Message):
+        self.update(message.data.get("percent"))
+
+    def handle_mute(self, message: Message):
+        self.update(muted=True)
+
+    def handle_unmute(self, message: Message):
+        self.update(muted=False)
+
+    def get(self) -> Tuple[int, bool]:
+        """(volume percent, muted), polls the volume service if stale"""
+        if not self.is_fresh:
+            response = self.bus.wait_for_response(Message("mycroft.volume.get"),
+                                                  timeout=self.timeout)
+            if response:
+                self.handle_volume_state(response)
+            else:
+                LOG.debug("volume service did not answer, using last known volume")
+        with self._lock:
+            volume = self.volume if self.volume is not None else self.default_volume
+            return volume, bool(self.muted)
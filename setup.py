@@ -77,5 +77,6 @@ setup(
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: Apache Software License",
     ],
-    entry_points={"console_scripts": ["ovos-audio=ovos_audio.__main__:main"]},
+    entry_points={"console_scripts": ["ovos-audio=ovos_audio.__main__:main",
+                                      "ovos-audio-prerender=ovos_audio.prerender:main"]},
 )
@@ -0,0 +1,65 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import base64
+import binascii
+import os
+import unittest
+from tempfile import mkdtemp
+
+from ovos_audio.blobs import AudioBlobStore
+"""Tests for the audio blob store."""
+
+
+class TestBlobStore(unittest.TestCase):
+    def test_dedup(self):
+        store = AudioBlobStore(mkdtemp())
+        audio = os.urandom(300 * 1024)
+        p1 = store.put_hex(binascii.hexlify(audio).decode("utf-8"), "wav")
+        p2 = store.put_b64(base64.b64encode(audio).decode("utf-8"), "wav")
+        p3 = store.put_bytes(audio, "wav")
+        self.assertEqual(p1, p2)
+        self.assertEqual(p1, p3)
+        self.assertEqual(os.listdir(store.path), [os.path.basename(p1)])
+        with open(p1, "rb") as f:
+            self.assertEqual(f.read(), audio)
+        self.assertEqual(store.get(store.handle(p1)), p1)
+        self.assertIsNone(store.get("0" * 64))
+        self.assertIsNone(store.get("../../etc/passwd"))
+
+    def test_eviction(self):
+        store = AudioBlobStore(mkdtemp(), max_size_mb=0.25)
+        paths = [store.put_bytes(os.urandom(100 * 1024), "wav") for _ in range(4)]
+        self.assertFalse(os.path.isfile(paths[0]))
+        self.assertTrue(os.path.isfile(paths[-1]))
+        total = sum(os.path.getsize(os.path.join(store.path, f))
+                    for f in os.listdir(store.path))
+        self.assertLessEqual(total, store.max_size)
+
+    def test_pinned(self):
+        queued = set()
+        store = AudioBlobStore(mkdtemp(), max_size_mb=0.25, in_use=queued.__contains__)
+        pinned = store.put_bytes(os.urandom(100 * 1024), "wav", pin=True)
+        queued.add(store.put_bytes(os.urandom(100 * 1024), "wav"))
+        for _ in range(3):
+            store.put_bytes(os.urandom(100 * 1024), "wav")
+        # still waiting for playback
+        self.assertTrue(os.path.isfile(pinned))
+        self.assertTrue(os.path.isfile(next(iter(queued))))
+        store.unpin(pinned)
+        queued.clear()
+        store.put_bytes(os.urandom(100 * 1024), "wav")
+        self.assertFalse(os.path.isfile(pinned))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+import unittest
+import unittest.mock as mock
+from tempfile import mkdtemp
+
+from ovos_audio.catalog import PluginCatalog, filter_lang
+
+CATALOG = {
+    "plugins": {"en-us": ["a", "b"], "en-gb": ["a"], "pt-pt": ["c"]},
+    "langs": ["en-us", "en-gb", "pt-pt"],
+    "configs": {"a": {"en-us": [{"voice": "1"}], "en-gb": [{"voice": "2"}]},
+                "b": {"en-us": [{"voice": "3"}]},
+                "c": {"pt-pt": [{"voice": "4"}]}},
+    "options": {"en-us": [{"engine": "a"}, {"engine": "b"}],
+                "en-gb": [{"engine": "a"}],
+                "pt-pt": [{"engine": "c"}]}
+}
+
+
+class TestPluginCatalog(unittest.TestCase):
+    def test_built_once(self):
+        build = mock.Mock(return_value=CATALOG)
+        catalog = PluginCatalog("tts", build)
+        self.assertEqual(catalog.get(), CATALOG)
+        self.assertEqual(catalog.get(), CATALOG)
+        self.assertEqual(build.call_count, 1)
+        # a plugin was installed or upgraded
+        with mock.patch("ovos_audio.catalog.distributions_fingerprint", return_value="new"):
+            catalog.get()
+        self.assertEqual(build.call_count, 2)
+
+    def test_persist(self):
+        path = os.path.join(mkdtemp(), "tts_catalog.json")
+        PluginCatalog("tts", lambda: CATALOG, persist=True, path=path).get()
+        build = mock.Mock()
+        self.assertEqual(PluginCatalog("tts", build, persist=True, path=path).get(), CATALOG)
+        build.assert_not_called()
+
+    def test_filter_lang(self):
+        data = filter_lang(CATALOG, "en-GB")
+        self.assertEqual(data["langs"], ["en-gb"])
+        self.assertEqual(data["configs"], {"a": {"en-gb": [{"voice": "2"}]}})
+        # without a region every dialect is included
+        data = filter_lang(CATALOG, "en")
+        self.assertEqual(data["langs"], ["en-us", "en-gb"])
+        self.assertEqual(set(data["configs"]), {"a", "b"})
+
+
+if __name__ == "__main__":
+    unittest.main()
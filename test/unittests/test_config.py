@@ -0,0 +1,84 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+
+from ovos_utils.messagebus import FakeBus
+
+from ovos_audio.config import ConfigSnapshot, ConfigStore
+from ovos_audio.transformers import DialogTransformersService
+
+
+class TestConfigSnapshot(unittest.TestCase):
+    def test_snapshot(self):
+        cfg = {"lang": "pt-pt", "tts": {"pulse_duck": True, "module": "A",
+                                        "A": {"voices": ["x", "y"]}}}
+        snapshot = ConfigSnapshot(cfg)
+        self.assertTrue(snapshot.pulse_duck)
+        self.assertFalse(snapshot.sentence_pipeline)
+        self.assertEqual(snapshot.lang, "pt-pt")
+        self.assertEqual(snapshot.tts["A"]["voices"], ("x", "y"))
+        # a copy, changes to the source are not seen
+        cfg["tts"]["module"] = "B"
+        self.assertEqual(snapshot.tts["module"], "A")
+        with self.assertRaises(TypeError):
+            snapshot.tts["module"] = "B"
+        with self.assertRaises(AttributeError):
+            snapshot.pulse_duck = False
+        self.assertEqual(hash(snapshot.tts["A"]), hash(ConfigSnapshot(cfg).tts["A"]))
+        self.assertEqual(snapshot.tts.thaw()["A"], {"voices": ["x", "y"]})
+
+    def test_diff(self):
+        old = ConfigSnapshot({"lang": "en-us", "tts": {"module": "A", "A": {}}, "g2p": {}})
+        new = ConfigSnapshot({"lang": "en-us", "tts": {"module": "B", "A": {}}, "Audio": {}})
+        self.assertEqual(old.diff(new), {"tts": {"module"}, "g2p": set(), "Audio": set()})
+        self.assertEqual(old.diff(old), {})
+
+
+class TestConfigStore(unittest.TestCase):
+    def test_subscribe(self):
+        store = ConfigStore({"tts": {"module": "A"}, "lang": "en-us"})
+        calls = []
+
+        class Listener:
+            def on_change(self, snapshot, changes):
+                calls.append(changes)
+
+        listener = Listener()
+        store.subscribe(listener.on_change, sections=["tts"])
+        store.reload({"tts": {"module": "A"}, "lang": "pt-pt"})
+        self.assertEqual(calls, [])
+        store.reload({"tts": {"module": "B"}, "lang": "pt-pt"})
+        self.assertEqual(calls, [{"tts": {"module"}}])
+        self.assertEqual(store.snapshot.tts["module"], "B")
+        # subscribers are weakly referenced
+        del listener
+        store.reload({"tts": {"module": "C"}})
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(store._subscribers, [])
+
+    def test_explicit_config(self):
+        store = ConfigStore({"dialog_transformers": {"cache": True}})
+        # an explicit config wins over the store, even an empty one
+        service = DialogTransformersService(FakeBus(), config={}, config_store=store)
+        self.assertEqual(service.config, {})
+        self.assertIsNone(service.cache)
+        self.assertEqual(store._subscribers, [])
+        # a given store is used instead of the global one
+        service = DialogTransformersService(FakeBus(), config_store=store)
+        self.assertIsNotNone(service.cache)
+        store.reload({"dialog_transformers": {}})
+        self.assertIsNone(service.cache)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+import unittest
+import wave
+from tempfile import mkdtemp
+
+from ovos_audio.output import AudioOutput, AudioSink, FileSink, NullSink, create_audio_output
+"""Tests for the in process audio output engine."""
+
+
+def make_wav(path, seconds=0.5, rate=16000):
+    with wave.open(path, "wb") as w:
+        w.setframerate(rate)
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.writeframes(b"\x01\x00" * int(rate * seconds))
+    return path
+
+
+class TestAudioOutput(unittest.TestCase):
+    def test_gapless_file_sink(self):
+        tmp = mkdtemp()
+        out_path = os.path.join(tmp, "out.wav")
+        output = AudioOutput(FileSink(out_path))
+        handles = [output.play(make_wav(os.path.join(tmp, f"{i}.wav"))) for i in range(3)]
+        for h in handles:
+            h.wait(5)
+        output.shutdown()
+        output.join(5)
+        with wave.open(out_path, "rb") as w:
+            # all items written to the same open stream
+            self.assertEqual(w.getnframes(), 3 * 8000)
+
+    def test_file_sink_segments(self):
+        tmp = mkdtemp()
+        sink = FileSink(os.path.join(tmp, "out.wav"))
+        output = AudioOutput(sink)
+        for i, rate in enumerate([16000, 22050, 16000]):
+            output.play(make_wav(os.path.join(tmp, f"{i}.wav"), rate=rate)).wait(5)
+        output.shutdown()
+        output.join(5)
+        # format changes do not overwrite what was already written
+        self.assertEqual(sink.segments, [os.path.join(tmp, n)
+                                         for n in ("out.wav", "out.1.wav", "out.2.wav")])
+        for path, rate in zip(sink.segments, [16000, 22050, 16000]):
+            with wave.open(path, "rb") as w:
+                self.assertEqual((w.getframerate(), w.getnframes()), (rate, rate // 2))
+
+    def test_sink_interface(self):
+        with self.assertRaises(TypeError):
+            AudioSink()
+
+    def test_terminate(self):
+        tmp = mkdtemp()
+        sink = NullSink(realtime=True)
+        output = AudioOutput(sink, block_ms=20)
+        handle = output.play(make_wav(os.path.join(tmp, "long.wav"), seconds=10))
+        handle.terminate()
+        self.assertEqual(handle.wait(2), 0)
+        self.assertLess(sink.frames_written, 16000 * 10)
+        output.shutdown()
+
+    def test_unsupported(self):
+        output = AudioOutput(NullSink())
+        self.assertIsNone(output.play("/does/not/exist.wav"))
+        output.shutdown()
+
+    def test_factory(self):
+        self.assertIsNone(create_audio_output({}))
+        self.assertIsNone(create_audio_output({"engine": "file"}))
+        output = create_audio_output({"engine": "null", "realtime": False})
+        self.assertIsInstance(output.sink, NullSink)
+        output.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,267 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+import unittest
+import unittest.mock as mock
+import wave
+from tempfile import mkdtemp
+from threading import Event, Thread
+
+from ovos_bus_client.message import Message
+from time import sleep
+
+from ovos_audio.playback import PlaybackThread, PlaybackQueue, PlaybackPriority
+"""Tests for the TTS playback thread."""
+
+
+class FakePlayer:
+    """subprocess.Popen stand in, plays until terminated or finished"""
+
+    def __init__(self, uri, played):
+        self.uri = uri
+        self.done = Event()
+        self.terminated = False
+        played.append(self)
+
+    def finish(self):
+        self.done.set()
+
+    def terminate(self):
+        self.terminated = True
+        self.done.set()
+
+    def communicate(self):
+        self.done.wait(5)
+
+    def wait(self):
+        self.done.wait(5)
+
+
+def wait_for(predicate, timeout=5):
+    for _ in range(int(timeout / 0.01)):
+        if predicate():
+            return True
+        sleep(0.01)
+    return False
+
+
+class TestPlaybackQueue(unittest.TestCase):
+    def test_age_and_clear(self):
+        q = PlaybackQueue()
+        self.assertEqual(q.oldest_age(), 0.0)
+        q.put(("a.wav", None, False, "sounds", Message("")))
+        sleep(0.05)
+        q.put(("b.wav", None, False, "sounds", Message("")))
+        self.assertGreaterEqual(q.oldest_age(), 0.05)
+        self.assertEqual(q.get()[0], "a.wav")
+        self.assertEqual(q.clear(), 1)
+        self.assertTrue(q.empty())
+
+    def test_priority(self):
+        q = PlaybackQueue()
+        q.put(("bg.wav", None, False, "sounds", Message("", {"priority": "background"})))
+        q.put(("a.wav", None, False, "sounds", Message("")))
+        q.put(("alert.wav", None, False, "sounds", Message("", {"priority": 0})))
+        q.put(("b.wav", None, False, "sounds", Message("", {"priority": "speech"})))
+        q.put(("news.wav", None, False, "sounds", Message("", {"priority": "announcement"})))
+        self.assertEqual([q.get()[0] for _ in range(5)],
+                         ["alert.wav", "a.wav", "b.wav", "news.wav", "bg.wav"])
+        self.assertEqual(PlaybackQueue.priority_of(("x", None, False, "", Message(""))),
+                         PlaybackPriority.SPEECH)
+
+
+    def test_groups(self):
+        def item(uri, session_id, tts_id="tts", **data):
+            return (uri, None, False, tts_id,
+                    Message("speak", data, {"session": {"session_id": session_id}}))
+
+        q = PlaybackQueue()
+        q.put(item("a1.wav", "a"))
+        q.put(item("b1.wav", "b"))
+        q.put(item("a2.wav", "a"))
+        self.assertEqual(q.get()[0], "a1.wav")
+        # queued sentences of "a" play back to back
+        q.put(item("alert.wav", "c", priority="alert"))
+        self.assertEqual(q.get()[0], "alert.wav")  # higher classes jump ahead
+        self.assertEqual(q.get()[0], "a2.wav")
+        # "a" still synthesizing, nothing of it queued, "b" does not wait
+        self.assertEqual(q.get()[0], "b1.wav")
+
+    def test_sound_not_held(self):
+        def item(uri, session_id, tts_id="tts"):
+            return (uri, None, False, tts_id,
+                    Message("speak", {}, {"session": {"session_id": session_id}}))
+
+        q = PlaybackQueue()
+        q.put(item("a1.wav", "a"))
+        self.assertEqual(q.get()[0], "a1.wav")
+        # "a" is still synthesizing its next sentence, the sound plays right away
+        q.put(item("ding.wav", "b", "sounds"))
+        self.assertEqual(q.get_nowait()[0], "ding.wav")
+        # speech of "b" waits for the queued sentences of "a", sounds do not
+        q.put(item("a2.wav", "a"))
+        self.assertEqual(q.get()[0], "a2.wav")
+        q.put(item("b1.wav", "b"))
+        q.put(item("ding.wav", "b", "sounds"))
+        q.put(item("a3.wav", "a"))
+        self.assertEqual([q.get()[0] for _ in range(3)], ["ding.wav", "a3.wav", "b1.wav"])
+
+
+class TestPlaybackThread(unittest.TestCase):
+    def setUp(self):
+        self.played = []
+        patcher = mock.patch('ovos_audio.playback.play_audio',
+                             side_effect=lambda uri: FakePlayer(uri, self.played))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.queue = PlaybackQueue()
+        self.thread = PlaybackThread(self.queue, bus=mock.Mock())
+        self.thread.tts_transform.transform = lambda data, ctx, **kwargs: (data, ctx)
+        self.thread.start()
+        self.addCleanup(self.thread.shutdown)
+
+    def put(self, uri, **data):
+        self.queue.put((uri, None, False, "sounds",
+                        Message("speak", dict(data, utterance=uri))))
+
+    def test_order_and_clear(self):
+        self.put("a.wav")
+        self.put("b.wav")
+        self.assertTrue(wait_for(lambda: len(self.played) == 1))
+        self.assertEqual(self.thread.stats["queue_depth"], 1)
+        self.played[0].finish()
+        self.assertTrue(wait_for(lambda: len(self.played) == 2))
+        self.assertEqual(self.played[1].uri, "b.wav")
+
+        self.put("c.wav")
+        self.thread.clear()
+        self.assertTrue(self.played[1].terminated)
+        self.assertTrue(wait_for(lambda: self.thread._now_playing is None))
+        self.assertEqual(len(self.played), 2)
+        self.assertIsNotNone(self.thread.stats["stop_latency"])
+
+    def test_discard(self):
+        late = Message("speak", {"utterance": "late"})
+        self.put("a.wav")
+        self.assertTrue(wait_for(lambda: len(self.played) == 1))
+        self.queue.put(("late.wav", None, False, "tts", late))
+        self.put("ack.wav")  # eg. a sound queued after the stop
+        self.thread.discard(late)
+        self.assertEqual(self.thread.stats["queue_depth"], 1)
+        self.assertFalse(self.played[0].terminated)
+        self.played[0].finish()
+        self.assertTrue(wait_for(lambda: len(self.played) == 2))
+        self.assertEqual(self.played[1].uri, "ack.wav")
+        # a discarded item being played is stopped
+        self.queue.put(("late.wav", None, False, "tts", late))
+        self.played[1].finish()
+        self.assertTrue(wait_for(lambda: len(self.played) == 3))
+        self.thread.discard(late)
+        self.assertTrue(self.played[2].terminated)
+
+    def test_pause_resume(self):
+        self.put("a.wav")
+        self.assertTrue(wait_for(lambda: len(self.played) == 1))
+        self.thread.pause()
+        self.assertTrue(self.played[0].terminated)
+        self.put("b.wav")
+        sleep(0.1)
+        # paused, nothing new is played
+        self.assertEqual(len(self.played), 1)
+        self.assertTrue(self.thread.stats["paused"])
+        self.thread.resume()
+        # the interrupted item is played again from the playback thread
+        self.assertTrue(wait_for(lambda: len(self.played) == 2))
+        self.assertEqual(self.played[1].uri, "a.wav")
+        self.played[1].finish()
+        self.assertTrue(wait_for(lambda: len(self.played) == 3))
+        self.assertEqual(self.played[2].uri, "b.wav")
+
+    def test_preempt(self):
+        self.put("music.wav", priority="background")
+        self.assertTrue(wait_for(lambda: len(self.played) == 1))
+        # queued without preempt, waits for its turn
+        self.put("a.wav")
+        sleep(0.1)
+        self.assertFalse(self.played[0].terminated)
+        self.put("alarm.wav", priority="alert", preempt=True)
+        self.assertTrue(self.played[0].terminated)
+        self.assertTrue(wait_for(lambda: len(self.played) == 2))
+        self.assertEqual(self.played[1].uri, "alarm.wav")
+        self.played[1].finish()
+        self.assertTrue(wait_for(lambda: len(self.played) == 3))
+        self.assertEqual(self.played[2].uri, "a.wav")
+        # same class never preempts
+        self.put("b.wav", preempt=True)
+        sleep(0.1)
+        self.assertFalse(self.played[2].terminated)
+        self.played[2].finish()
+        self.assertTrue(wait_for(lambda: len(self.played) == 4))
+        self.played[3].finish()
+        # the interrupted item is played again from the start
+        self.assertTrue(wait_for(lambda: len(self.played) == 5))
+        self.assertEqual(self.played[4].uri, "music.wav")
+
+    def test_visemes_ready_on_put(self):
+        self.thread.visemes = mock.Mock()
+        self.thread.visemes.submit.return_value.result.return_value = [("4", 0.2)]
+        self.thread.show_visemes = mock.Mock()
+        self.put("a.wav")
+        self.assertTrue(wait_for(lambda: len(self.played) == 1))
+        self.thread.visemes.submit.assert_called_once_with("a.wav", mock.ANY)
+        self.thread.show_visemes.assert_called_once_with([("4", 0.2)])
+
+    def test_enclosure_not_a_consumer(self):
+        # OPM attaches an EnclosureAPI even on headless devices
+        self.thread.enclosure = mock.Mock()
+        self.assertEqual(self.thread.visemes.stats["consumers"], [])
+
+    def test_play_path(self):
+        wav = os.path.join(mkdtemp(), "hello.wav")
+        with wave.open(wav, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(16000)
+            f.writeframes(b"\x00\x00" * 160)
+        bus = mock.Mock()
+        thread = PlaybackThread(PlaybackQueue(), bus=bus)
+        thread.output = None
+        thread._do_playback.set()  # not started, playing is normally enabled by run()
+        thread._now_playing = (wav, None, False, "tts", Message("speak", {"utterance": "hello",
+                                                                         "b64_data": "AAAA"}))
+        player = Thread(target=thread._play, daemon=True)
+        player.start()
+        self.assertTrue(wait_for(lambda: len(self.played) == 1))
+        self.assertTrue(thread.is_queued(wav))
+        # the file path is played, the payload is not echoed back on the bus
+        self.assertEqual(self.played[0].uri, wav)
+        utt_start = [c[0][0] for c in bus.emit.call_args_list
+                     if c[0][0].msg_type == "recognizer_loop:utterance_start"]
+        self.assertEqual(utt_start[0].data, {"utterance": "hello"})
+        self.played[0].finish()
+        player.join(5)
+        self.assertFalse(thread.is_queued(wav))
+
+    def test_detach(self):
+        with self.thread.detach():
+            self.thread.stop()  # a replaced TTS engine shutting down
+        self.assertTrue(self.thread.is_running)
+
+    def test_terminate(self):
+        self.thread.shutdown()
+        self.thread.join(1)
+        self.assertFalse(self.thread.is_alive())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+import unittest
+import unittest.mock as mock
+from tempfile import mkdtemp
+
+from ovos_plugin_manager.utils.tts_cache import hash_sentence
+
+from ovos_audio.prerender import CACHED, SYNTHESIZED, collect_utterances, \
+    persistent_config, render_utterance
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+
+class TestCollect(unittest.TestCase):
+    def test_expand_dialogs(self):
+        root = mkdtemp()
+        write(f"{root}/locale/en-us/dialog/hello.dialog",
+              "# comment\n(hello|hi) there\n\nit is {time}\n")
+        write(f"{root}/dialog/en-us/bye.dialog", "goodbye\nhello there\n")
+        write(f"{root}/locale/pt-pt/ola.dialog", "olá\n")
+        self.assertEqual(collect_utterances([root], ["en-US"]),
+                         [("en-US", "goodbye"), ("en-US", "hello there"), ("en-US", "hi there")])
+
+    def test_persistent_config(self):
+        config = {"tts": {"module": "A", "A": {"voice": "x"}, "process_pool": {"size": 2}}}
+        config = persistent_config(config, "/tmp/cache")
+        self.assertNotIn("process_pool", config["tts"])
+        self.assertEqual(config["tts"]["A"], {"voice": "x", "persist_cache": True,
+                                              "persist_thresh": 1, "preloaded_cache": "/tmp/cache"})
+
+
+class TestRender(unittest.TestCase):
+    @staticmethod
+    def _tts(cache):
+        tts = mock.Mock()
+        tts.validate_ssml.side_effect = lambda s: s.replace("<b>", "")
+        tts._replace_phonetic_spellings.side_effect = lambda s, lang: s
+        tts.preprocess_sentence.side_effect = lambda s: [s]
+        tts.synth.return_value = ("/tmp/a.wav", None)
+        tts._get_ctxt.return_value.get_cache.return_value = {hash_sentence(s) for s in cache}
+        return tts
+
+    def test_skip_cached(self):
+        tts = self._tts(["cached already"])
+        transformer = mock.Mock()
+        self.assertEqual(render_utterance(tts, "<b>new one", "en-us", transformer=transformer),
+                         SYNTHESIZED)
+        tts.synth.assert_called_once_with("new one", tts._get_ctxt.return_value)
+        transformer.transform.assert_called_once_with("/tmp/a.wav", {}, cache=True)
+        self.assertEqual(render_utterance(tts, "cached already", "en-us"), CACHED)
+        self.assertEqual(tts.synth.call_count, 1)
+
+    def test_resume_transformed(self):
+        tts = self._tts(["cached already"])
+        transformer = mock.Mock()
+        # raw audio cached, transformed audio missing
+        transformer.is_cached.return_value = False
+        self.assertEqual(render_utterance(tts, "cached already", "en-us", transformer=transformer),
+                         SYNTHESIZED)
+        transformer.transform.assert_called_once_with("/tmp/a.wav", {}, cache=True)
+        transformer.is_cached.return_value = True
+        self.assertEqual(render_utterance(tts, "cached already", "en-us", transformer=transformer),
+                         CACHED)
+        self.assertEqual(transformer.transform.call_count, 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+import unittest
+from tempfile import mkdtemp
+from threading import Event
+
+from time import monotonic, sleep
+
+from ovos_audio.prewarm import BackgroundSynth, RateLimiter, UtteranceStats, PREFETCH, PREWARM
+
+
+class TestUtteranceStats(unittest.TestCase):
+    def test_top_and_persist(self):
+        path = os.path.join(mkdtemp(), "usage.json")
+        stats = UtteranceStats(path, save_every=100)
+        for utt, n in (("hello", 3), ("timer set", 5), ("bye", 1)):
+            for _ in range(n):
+                stats.record("tts/voice/en-us", "en-us", utt)
+        self.assertEqual(stats.top("tts/voice/en-us", 2), ["timer set", "hello"])
+        self.assertEqual(stats.top("other", 2), [])
+        stats.save()
+
+        loaded = UtteranceStats(path)
+        self.assertEqual(loaded.top("tts/voice/en-us", 3), ["timer set", "hello", "bye"])
+        self.assertEqual(loaded.lang("tts/voice/en-us"), "en-us")
+
+    def test_bounded(self):
+        stats = UtteranceStats(os.path.join(mkdtemp(), "usage.json"), max_entries=2)
+        stats.record("v", "en-us", "keep")
+        stats.record("v", "en-us", "keep")
+        for i in range(10):
+            stats.record("v", "en-us", f"once {i}")
+        self.assertLessEqual(len(stats.voices["v"]["utterances"]), 4)
+        self.assertEqual(stats.top("v", 1), ["keep"])
+
+
+class TestBackgroundSynth(unittest.TestCase):
+    def setUp(self):
+        self.done = []
+        self.idle = Event()
+        self.worker = BackgroundSynth(lambda utt, lang, msg: self.done.append(utt),
+                                      lambda priority: self.idle.is_set(),
+                                      max_cpu=1.0, poll=0.01)
+        self.worker.start()
+        self.addCleanup(self.worker.stop)
+
+    def wait_done(self, n):
+        for _ in range(500):
+            if len(self.done) >= n:
+                return True
+            sleep(0.01)
+        return False
+
+    def test_waits_for_idle(self):
+        self.worker.submit("a")
+        self.assertFalse(self.worker.submit("a"))  # already queued
+        sleep(0.1)
+        self.assertEqual(self.done, [])
+        self.idle.set()
+        self.assertTrue(self.wait_done(1))
+
+    def test_priority_and_deadline(self):
+        self.worker.submit("late", deadline=monotonic() - 1)
+        self.worker.submit("prewarm", priority=PREWARM)
+        self.worker.submit("prefetch", priority=PREFETCH)
+        self.idle.set()
+        self.assertTrue(self.wait_done(2))
+        sleep(0.05)
+        self.assertEqual(self.done, ["prefetch", "prewarm"])
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_burst(self):
+        limiter = RateLimiter(rate=0.001, burst=2)
+        self.assertTrue(limiter.allow())
+        self.assertTrue(limiter.allow())
+        self.assertFalse(limiter.allow())
+
+
+if __name__ == "__main__":
+    unittest.main()
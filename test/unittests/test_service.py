@@ -13,9 +13,12 @@
 from os.path import dirname, join, abspath
 import unittest
 import unittest.mock as mock
+from threading import Event
+from time import monotonic, sleep
 
 from ovos_bus_client import Message
 from ovos_audio.audio import AudioService
+from ovos_audio.config import ConfigStore
 
 from ovos_utils.fakebus import FakeBus
 from .services.working import WorkingBackend
@@ -251,5 +254,92 @@ class TestService(unittest.TestCase):
         service.shutdown()
 
 
+class TestBackendLoading(unittest.TestCase):
+    @mock.patch('ovos_audio.audio.setup_audio_service')
+    @mock.patch('ovos_audio.audio.find_audio_service_plugins')
+    def test_slow_plugin_loads_in_background(self, mock_find, mock_setup):
+        emitter = MockEmitter()
+        release = Event()
+        fast = mock.Mock()
+        fast.name = 'fast'
+        slow = mock.Mock()
+        slow.name = 'slow'
+
+        def setup(module, config, bus):
+            if module == "slow_module":
+                release.wait(5)
+                return [slow]
+            return [fast]
+
+        mock_find.return_value = {"slow": "slow_module", "fast": "fast_module"}
+        mock_setup.side_effect = setup
+        with mock.patch("ovos_audio.audio.Configuration",
+                        return_value={"Audio": {"load_timeout": 0.2, "default-backend": "slow"}}):
+            service = AudioService(emitter, disable_ocp=True)
+        self.assertTrue(service.wait_for_load(1))
+        self.assertEqual(service.service, [fast])
+        self.assertEqual(service.default, fast)
+        self.assertIn("fast", service.load_times)
+
+        release.set()
+        for _ in range(100):
+            if len(service.service) == 2:
+                break
+            sleep(0.01)
+        # discovery order is kept, the configured default is picked up
+        self.assertEqual(service.service, [slow, fast])
+        self.assertEqual(service.default, slow)
+        self.assertIn("slow", service.load_times)
+        service.shutdown()
+
+
+    @mock.patch('ovos_audio.audio.setup_audio_service')
+    @mock.patch('ovos_audio.audio.find_audio_service_plugins')
+    def test_ready_with_default(self, mock_find, mock_setup):
+        release = Event()
+        fast = mock.Mock()
+        fast.name = 'fast'
+
+        def setup(module, config, bus):
+            if module == "slow_module":
+                release.wait(5)
+                return []
+            return [fast]
+
+        mock_find.return_value = {"slow": "slow_module", "fast": "fast_module"}
+        mock_setup.side_effect = setup
+        start = monotonic()
+        with mock.patch("ovos_audio.audio.Configuration",
+                        return_value={"Audio": {"load_timeout": 5, "default-backend": "fast"}}):
+            service = AudioService(MockEmitter(), disable_ocp=True)
+        # the timeout only applies while the default backend is loading
+        self.assertLess(monotonic() - start, 2)
+        self.assertTrue(service.wait_for_load(1))
+        self.assertEqual(service.default, fast)
+        release.set()
+        service.shutdown()
+
+
+    @mock.patch('ovos_audio.audio.setup_audio_service')
+    @mock.patch('ovos_audio.audio.find_audio_service_plugins')
+    def test_config_store(self, mock_find, mock_setup):
+        a = mock.Mock()
+        a.name = 'a'
+        b = mock.Mock()
+        b.name = 'b'
+        mock_find.return_value = {"a": "a_module", "b": "b_module"}
+        mock_setup.side_effect = lambda module, config, bus: [a] if module == "a_module" else [b]
+        store = ConfigStore({"Audio": {"default-backend": "b"}})
+        # mycroft.conf is not read when a store is given
+        with mock.patch("ovos_audio.audio.Configuration",
+                        return_value={"Audio": {"default-backend": "a"}}):
+            service = AudioService(MockEmitter(), disable_ocp=True, config_store=store)
+        self.assertEqual(service.config, {"default-backend": "b"})
+        self.assertEqual(service.default, b)
+        store.reload({"Audio": {"default-backend": "a"}})
+        self.assertEqual(service.default, a)
+        service.shutdown()
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,53 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+import unittest.mock as mock
+
+from ovos_audio.sounds import SoundCache, bundled_sounds
+
+
+class TestSoundCache(unittest.TestCase):
+    def test_resolve_hit_skips_filesystem(self):
+        cache = SoundCache()
+        path = cache.resolve("snd/start_listening.wav")
+        self.assertTrue(path.endswith("start_listening.wav"))
+        with mock.patch("ovos_audio.sounds.resolve_sound_uri") as resolve:
+            self.assertEqual(cache.resolve("snd/start_listening.wav"), path)
+            resolve.assert_not_called()
+        with self.assertRaises(FileNotFoundError):
+            cache.resolve("snd/does_not_exist.wav")
+
+    def test_decoded_pcm(self):
+        cache = SoundCache()
+        cache.warmup(["snd/start_listening.wav"])
+        path = cache.resolve("snd/start_listening.wav")
+        self.assertEqual(cache.stats["decoded"], 1)
+        with mock.patch("ovos_audio.sounds.decode_audio") as decode:
+            pcm, fmt = cache.decode(path)
+            decode.assert_not_called()
+        self.assertTrue(pcm)
+
+    def test_bounds(self):
+        cache = SoundCache(max_entries=1, max_size_mb=0.001)
+        cache.warmup(["snd/start_listening.wav"])
+        # larger than the whole cache, only the path is kept
+        self.assertEqual(cache.stats["decoded"], 0)
+        cache.resolve("snd/blop-mark-diangelo.wav")
+        self.assertEqual(cache.stats["paths"], 1)
+
+    def test_bundled(self):
+        self.assertIn("snd/start_listening.wav", bundled_sounds())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -10,12 +10,21 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import base64
 import json
+import os
 import unittest
 import unittest.mock as mock
 from queue import Queue
+from tempfile import mkdtemp
+from threading import Event, Thread
+from time import sleep
 
+from ovos_audio.config import ConfigStore
+
+from ovos_audio.prewarm import PREFETCH, PREWARM
 from ovos_audio.service import PlaybackService
+from ovos_audio.startup import StartupGraph
 from ovos_config import Configuration
 from ovos_utils.messagebus import Message, FakeBus
 from ovos_utils.process_utils import ProcessState
@@ -134,6 +143,8 @@ class TestSpeech(unittest.TestCase):
 
         speech = PlaybackService(bus=bus)
         self.assertTrue(tts_factory_mock.create.called)
+        # the fallback loads in parallel with the main TTS
+        speech.startup.wait()
         self.assertTrue(speech._get_tts_fallback.called)
 
         PlaybackService._get_tts_fallback = _real
@@ -154,12 +165,96 @@ class TestSpeech(unittest.TestCase):
         speech.execute_tts("hello", "123")
         self.assertTrue(speech.fallback_tts.execute.called)
 
+    def test_hot_swap(self, tts_factory_mock, config_mock):
+        setup_mocks(config_mock, tts_factory_mock)
+        speech = PlaybackService(bus=mock.Mock())
+        speech.startup.wait()
+        tts_factory_mock.create.reset_mock()
+        old_tts = speech.tts = mock.Mock()
+        new_tts = mock.Mock()
+        loading = Event()
+        tts_factory_mock.create.side_effect = lambda cfg: loading.wait(5) and new_tts
+        speech.config_store = ConfigStore({"tts": {"module": "B", "reload_debounce": 0.05}})
+        for _ in range(3):  # a burst of changes reloads once
+            speech.handle_config_change(speech.config, {"tts": {"module": "B"}})
+
+        # the old voice keeps speaking while the new one loads
+        sleep(0.2)
+        speech.execute_tts("hello", "123")
+        self.assertTrue(old_tts.execute.called)
+
+        with speech._use_tts() as tts:
+            loading.set()
+            for _ in range(500):
+                if speech.tts is new_tts:
+                    break
+                sleep(0.01)
+            self.assertIs(speech.tts, new_tts)
+            self.assertTrue(new_tts.get_tts.called)  # warmed up before the swap
+            # retired only once the request using it is done
+            self.assertIs(tts, old_tts)
+            old_tts.shutdown.assert_not_called()
+        old_tts.shutdown.assert_called_once()
+        self.assertEqual(tts_factory_mock.create.call_count, 1)
+        tts_factory_mock.create.side_effect = None
+
+    def test_config_store(self, tts_factory_mock, config_mock):
+        setup_mocks(config_mock, tts_factory_mock, fallback="B")
+        # the patched Configuration is what the service sees
+        speech = PlaybackService(bus=mock.Mock())
+        self.assertEqual(speech.config.tts["fallback_module"], "B")
+        speech.shutdown()
+        # unless a store is given explicitly
+        store = ConfigStore({"tts": {"module": "C"}})
+        speech = PlaybackService(bus=mock.Mock(), config_store=store)
+        self.assertIs(speech.config, store.snapshot)
+        self.assertIs(speech.playback_thread._config_store, store)
+        speech.shutdown()
+        # or a config is assigned
+        speech = PlaybackService(bus=mock.Mock())
+        speech.config = {"tts": {"module": "A", "pulse_duck": True}}
+        self.assertTrue(speech.config.pulse_duck)
+        self.assertTrue(speech.playback_thread.config.pulse_duck)
+        speech.handle_config_reload()  # mycroft.conf is not read again
+        self.assertTrue(speech.config.pulse_duck)
+        speech.shutdown()
+
+    def test_config_bus_update(self, tts_factory_mock, config_mock):
+        setup_mocks(config_mock, tts_factory_mock)
+        bus = FakeBus()
+        speech = PlaybackService(bus=bus)
+        speech.init_messagebus()
+        self.assertFalse(speech.playback_thread.config.pulse_duck)
+        # eg. Configuration.patch applied the change, nothing changed on disk
+        config_mock.return_value = dict(config_mock.return_value,
+                                        tts={"module": "A", "pulse_duck": True})
+        bus.emit(Message("configuration.patch", {"config": {"tts": {"pulse_duck": True}}}))
+        self.assertTrue(speech.playback_thread.config.pulse_duck)
+        speech.shutdown()
+
+    def test_fallback_removed(self, tts_factory_mock, config_mock):
+        setup_mocks(config_mock, tts_factory_mock, fallback="B")
+        speech = PlaybackService(bus=mock.Mock())
+        speech.startup.wait()
+        old_fallback = speech.fallback_tts = mock.Mock()
+        # TTS.shutdown stops the playback thread shared by all engines
+        old_fallback.shutdown.side_effect = speech.playback_thread.stop
+        speech.config_store = ConfigStore({"tts": {"module": "A"}})
+        speech._reload_fallback_tts()
+        self.assertIsNone(speech.fallback_tts)
+        old_fallback.shutdown.assert_called_once()
+        # the shared playback thread survives the engine shutdown
+        self.assertFalse(speech.playback_thread._terminated)
+        speech.shutdown()
+
     @mock.patch('ovos_audio.service.TTS')
     def test_queue(self, mock_TTS, tts_factory_mock, config_mock):
         mock_TTS.queue = Queue()
         setup_mocks(config_mock, tts_factory_mock)
         bus = mock.Mock()
         speech = PlaybackService(bus=bus)
+        # keep the playback thread from consuming the queue
+        speech.playback_thread.pause()
 
         with self.assertRaises(ValueError):
             msg = Message("", {})
@@ -169,6 +264,17 @@ class TestSpeech(unittest.TestCase):
             msg = Message("", {"filename": "no_exist.mp3"})
             speech.handle_queue_audio(msg)
 
+        b64 = base64.b64encode(b"RIFF fake wav").decode("utf-8")
+        speech.handle_queue_audio(Message("", {"b64_data": b64, "audio_ext": "wav"}))
+        audio_file = mock_TTS.queue.get()[0]
+        with open(audio_file, "rb") as f:
+            self.assertEqual(f.read(), b"RIFF fake wav")
+
+        # the same audio can be referenced by its blob handle
+        blob = speech.blob_store.handle(audio_file)
+        speech.handle_queue_audio(Message("", {"blob": blob}))
+        self.assertEqual(mock_TTS.queue.get()[0], audio_file)
+
         # TODO - fix res path and reenable
         #f = f"{MYCROFT_ROOT_PATH}/mycroft/res/snd/start_listening.wav"
         #msg = Message("", {"filename": f})
@@ -178,6 +284,105 @@ class TestSpeech(unittest.TestCase):
         #self.assertEqual(data[1], f)
         #self.assertEqual(data[-1], False)
 
+    @mock.patch('ovos_audio.service.play_audio')
+    def test_instant_play(self, mock_play, tts_factory_mock, config_mock):
+        setup_mocks(config_mock, tts_factory_mock)
+        played = Event()
+        release = Event()
+        mock_play.return_value.wait.side_effect = lambda: release.wait(5)
+        mock_play.side_effect = lambda uri: played.set() or mock.DEFAULT
+        bus = mock.Mock()
+        speech = PlaybackService(bus=bus)
+        speech.sound_output = None
+        msg = Message("mycroft.audio.play_sound", {"uri": "snd/start_listening.wav"})
+        # returns while the sound is still playing
+        speech.handle_instant_play(msg)
+        self.assertTrue(played.wait(5))
+        # identical sound in the coalesce window is not played again
+        speech.handle_instant_play(msg)
+        self.assertEqual(mock_play.call_count, 1)
+        self.assertFalse(bus.emit.called)
+
+        release.set()
+        speech._sound_pool.shutdown(wait=True)
+        responses = [m[0][0] for m in bus.emit.call_args_list]
+        self.assertEqual(len(responses), 2)
+        self.assertTrue(any(r.data.get("coalesced") for r in responses))
+        speech.shutdown()
+
+    def test_speak_prefetch(self, tts_factory_mock, config_mock):
+        setup_mocks(config_mock, tts_factory_mock)
+        bus = mock.Mock()
+        speech = PlaybackService(bus=bus)
+        speech.background_synth.stop()
+        speech.background_synth = mock.Mock(pending=0)
+        speech.prefetch_limiter.burst = speech.prefetch_limiter._tokens = 1
+        speech.prefetch_limiter.rate = 0.001
+        msg = Message("speak.prefetch", {"utterance": "hello there", "lang": "en-us"})
+        speech.handle_speak_prefetch(msg)
+        speech.background_synth.submit.assert_called_once()
+        self.assertEqual(speech.background_synth.submit.call_args[1]["priority"], PREFETCH)
+        # dialog transformers run in the background job, not on the bus thread
+        self.assertEqual(speech.background_synth.submit.call_args[1]["synth"],
+                         speech._prefetch_to_cache)
+        self.assertTrue(bus.emit.call_args[0][0].data["queued"])
+        # over the rate limit, nothing is synthesized
+        speech.handle_speak_prefetch(msg)
+        self.assertEqual(speech.background_synth.submit.call_count, 1)
+        self.assertEqual(bus.emit.call_args[0][0].data["reason"], "rate limited")
+        # remote clients do not get to synthesize on this device
+        msg.context["session"] = Session("remote").serialize()
+        speech.prefetch_limiter._tokens = 1
+        speech.handle_speak_prefetch(msg)
+        self.assertEqual(speech.background_synth.submit.call_count, 1)
+        speech.shutdown()
+
+    def test_prefetch_ignores_playback(self, tts_factory_mock, config_mock):
+        setup_mocks(config_mock, tts_factory_mock)
+        speech = PlaybackService(bus=mock.Mock())
+        with mock.patch.object(PlaybackService, "is_speaking", True):
+            self.assertTrue(speech._is_idle(PREFETCH))
+            self.assertFalse(speech._is_idle(PREWARM))
+        speech.shutdown()
+
+    def test_dialog_transformers_loading(self, tts_factory_mock, config_mock):
+        setup_mocks(config_mock, tts_factory_mock)
+        speech = PlaybackService(bus=mock.Mock())
+        speech.startup.wait()
+        transformer = mock.Mock(blacklisted_skills=[])
+        transformer.transform.return_value = ("transformed", {})
+
+        def load():
+            sleep(0.2)
+            speech.dialog_transform = transformer
+
+        speech.dialog_transform = None
+        speech.startup = StartupGraph()
+        speech.startup.add("dialog_transformers", load)
+        speech.startup.start()
+        msg = Message("speak", {"utterance": "hello"}, {"skill_id": "skill.test"})
+        # speech waits for the transformers still loading
+        self.assertEqual(speech._transform_dialog("hello", msg, None), "transformed")
+        # unless they did not load in time
+        speech.dialog_transform = None
+        speech._dialog_transform_deadline = 0
+        self.assertEqual(speech._transform_dialog("hello", msg, None), "hello")
+        speech.shutdown()
+
+    def test_synth_to_cache(self, tts_factory_mock, config_mock):
+        setup_mocks(config_mock, tts_factory_mock)
+        speech = PlaybackService(bus=mock.Mock())
+        self.addCleanup(tts_mock.reset_mock, return_value=True, side_effect=True)
+        tts_mock.validate_ssml.side_effect = lambda s: s.replace("<b>", "")
+        tts_mock._replace_phonetic_spellings.side_effect = lambda s, lang: s
+        tts_mock.preprocess_sentence.side_effect = lambda s: [s]
+        tts_mock.synth.return_value = ("/tmp/a.wav", None)
+        speech._synth_to_cache("<b>hello", "en-us")
+        # same chunks TTS.execute would synthesize
+        tts_mock.validate_ssml.assert_called_once_with("<b>hello")
+        self.assertEqual(tts_mock.synth.call_args[0][0], "hello")
+        speech.shutdown()
+
     @mock.patch('ovos_audio.service.report_timing')
     def test_speak(self, mock_timing, tts_factory_mock, config_mock):
         setup_mocks(config_mock, tts_factory_mock)
@@ -199,6 +404,115 @@ class TestSpeech(unittest.TestCase):
         self.assertTrue(mock_timing.called)
         self.assertEqual(mock_timing.call_args[0][0], "default")
 
+    def test_speak_pipelined(self, tts_factory_mock, config_mock):
+        setup_mocks(config_mock, tts_factory_mock)
+        bus = mock.Mock()
+        speech = PlaybackService(bus=bus)
+        speech.execute_tts = mock.Mock()
+        speech.playback_thread = mock.Mock()
+
+        msg = Message("speak", {"utterance": "Hello there. How are you? I am fine",
+                                "expect_response": True})
+        speech.execute_tts_pipelined("Hello there. How are you? I am fine",
+                                     "123", True, msg)
+        calls = speech.execute_tts.call_args_list
+        self.assertEqual([c[0][0] for c in calls],
+                         ["Hello there.", "How are you?", "I am fine"])
+        # listen only applies to the final sentence
+        self.assertEqual([c[0][2] for c in calls], [False, False, True])
+        self.assertTrue(speech.playback_thread.begin_pipeline.called)
+        self.assertTrue(speech.playback_thread.end_pipeline.called)
+
+    def test_speak_pipelined_stop(self, tts_factory_mock, config_mock):
+        setup_mocks(config_mock, tts_factory_mock)
+        bus = mock.Mock()
+        speech = PlaybackService(bus=bus)
+        speech.playback_thread = mock.Mock()
+
+        def stop_after_first(*args, **kwargs):
+            speech.handle_stop(Message("mycroft.stop"))
+
+        speech.execute_tts = mock.Mock(side_effect=stop_after_first)
+        msg = Message("speak", {"utterance": "Hello there. How are you? I am fine"})
+        speech.execute_tts_pipelined("Hello there. How are you? I am fine", "123", message=msg)
+        self.assertEqual(speech.execute_tts.call_count, 1)
+        # only the late sentence of this utterance is dropped
+        speech.playback_thread.discard.assert_called_once_with(msg)
+        speech.playback_thread.clear.assert_not_called()
+
+    @mock.patch('ovos_audio.service.report_timing')
+    def test_speak_sessions_concurrent(self, mock_timing, tts_factory_mock, config_mock):
+        setup_mocks(config_mock, tts_factory_mock)
+        bus = mock.Mock()
+        speech = PlaybackService(bus=bus, validate_source=False)
+        release, rendering = Event(), Event()
+        spoken = []
+
+        def slow_tts(utterance, ident, *args, **kwargs):
+            if ident == "slow":
+                rendering.set()
+                release.wait(5)
+            spoken.append(utterance)
+
+        speech.execute_tts = mock.Mock(side_effect=slow_tts)
+
+        def speak(utt, session_id):
+            msg = Message("speak", {"utterance": utt})
+            msg.context["session"] = Session(session_id).serialize()
+            speech.handle_speak(msg)
+
+        t = Thread(target=speak, args=("first", "slow"), daemon=True)
+        t.start()
+        self.assertTrue(rendering.wait(5))
+        # a different session is not blocked by the slow render
+        speak("second", "fast")
+        self.assertEqual(spoken, ["second"])
+        # the same session is kept in order
+        t2 = Thread(target=speak, args=("third", "slow"), daemon=True)
+        t2.start()
+        t2.join(0.2)
+        self.assertEqual(spoken, ["second"])
+        release.set()
+        t.join(5)
+        t2.join(5)
+        self.assertEqual(spoken, ["second", "first", "third"])
+        self.assertEqual(speech._session_locks, {})
+
+    @mock.patch('ovos_audio.service.report_timing')
+    def test_b64_audio_stream(self, mock_timing, tts_factory_mock, config_mock):
+        setup_mocks(config_mock, tts_factory_mock)
+        bus = FakeBus()
+        speech = PlaybackService(bus=bus)
+        speech.startup.wait()
+        tmp = mkdtemp()
+
+        def synth(sentence, ctxt):
+            path = os.path.join(tmp, f"{len(sentence)}.wav")
+            with open(path, "wb") as f:
+                f.write(sentence.encode("utf-8"))
+            return path, None
+
+        speech.tts.synth = mock.Mock(side_effect=synth)
+        speech.tts.plugin_id = "test-tts"
+        speech.tts._get_ctxt.return_value.lang = "en-us"
+        chunks = []
+        ended = []
+        bus.on("speak:b64_audio.stream.chunk", lambda m: chunks.append(m.data))
+        bus.on("speak:b64_audio.stream.end", lambda m: ended.append(m.data))
+
+        speech.handle_b64_audio_stream(Message("speak:b64_audio.stream",
+                                               {"utterance": "Hello there. How are you?",
+                                                "chunk_size": 4}))
+        self.assertEqual([c["seq"] for c in chunks], list(range(len(chunks))))
+        audio = b"".join(base64.b64decode(c["audio"]) for c in chunks
+                         if c["sentence_index"] == 0)
+        self.assertEqual(audio, b"Hello there.")
+        # the last chunk of each sentence tells the client to decode
+        self.assertEqual([c["sentence_end"] for c in chunks if c["sentence_index"] == 0],
+                         [False, False, True])
+        self.assertEqual(len(ended), 1)
+        self.assertEqual(ended[0]["chunks"], len(chunks))
+        self.assertNotIn("error", ended[0])
 
     @mock.patch('ovos_audio.service.get_tts_lang_configs')
     @mock.patch('ovos_audio.service.get_tts_supported_langs')
@@ -223,6 +537,7 @@ class TestSpeech(unittest.TestCase):
 
         bus = FakeBus()
         speech = PlaybackService(bus=bus)
+        speech.startup.wait()
 
         def rcvm(msg):
             msg = json.loads(msg)
@@ -263,6 +578,7 @@ class TestSpeech(unittest.TestCase):
 
         bus = FakeBus()
         speech = PlaybackService(bus=bus)
+        speech.startup.wait()
 
         def rcvm(msg):
             msg = json.loads(msg)
@@ -285,6 +601,7 @@ class TestSpeech(unittest.TestCase):
 
         bus = FakeBus()
         speech = PlaybackService(bus=bus)
+        speech.startup.wait()
 
         def rcvm(msg):
             msg = json.loads(msg)
@@ -0,0 +1,57 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+import unittest.mock as mock
+from threading import Event
+
+from ovos_audio.startup import StartupGraph
+
+
+class TestStartupGraph(unittest.TestCase):
+    def test_dependencies(self):
+        order = []
+        release = Event()
+        report = mock.Mock()
+        graph = StartupGraph(on_complete=report)
+        graph.add("slow", lambda: release.wait(5) and order.append("slow"))
+        graph.add("a", lambda: order.append("a"))
+        graph.add("b", lambda: order.append("b"), after=["a"])
+        graph.start()
+        # b does not wait for the unrelated slow step
+        self.assertTrue(graph.wait(["a", "b"], timeout=5))
+        self.assertEqual(order, ["a", "b"])
+        self.assertFalse(graph.wait(timeout=0.05))
+        report.assert_not_called()
+
+        release.set()
+        self.assertTrue(graph.wait(timeout=5))
+        report.assert_called_once()
+        self.assertEqual(set(report.call_args[0][0]["steps"]), {"slow", "a", "b"})
+
+    def test_failed_dependency(self):
+        def fail():
+            raise RuntimeError("no model")
+
+        step = mock.Mock()
+        graph = StartupGraph()
+        graph.add("tts", fail)
+        graph.add("prewarm", step, after=["tts"])
+        graph.start()
+        self.assertTrue(graph.wait(timeout=5))
+        step.assert_not_called()
+        self.assertEqual(graph.timings["tts"]["error"], "no model")
+        self.assertIn("prewarm", graph.errors)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,266 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+import unittest
+import unittest.mock as mock
+import wave
+from tempfile import mkdtemp
+from threading import Event
+from time import sleep
+
+from ovos_audio.transformers import DialogTransformersService, TTSTransformersService, \
+    np, write_audio_buffer
+
+
+class FakeTransformer:
+    def __init__(self, priority, suffix, fail=False, hang=None):
+        self.priority = priority
+        self.suffix = suffix
+        self.fail = fail
+        self.hang = hang
+        self.calls = 0
+
+    def transform(self, dialog, context=None):
+        self.calls += 1
+        if self.hang:
+            self.hang.wait(5)
+        if self.fail:
+            raise RuntimeError("broken plugin")
+        return dialog + self.suffix, context
+
+    def shutdown(self):
+        pass
+
+
+class TestTransformerChain(unittest.TestCase):
+    def make_service(self, config, **plugins):
+        service = DialogTransformersService(bus=None, config=config)
+        service.loaded_plugins = plugins
+        return service
+
+    def test_order_cached(self):
+        service = self.make_service({}, low=FakeTransformer(1, "-low"),
+                                    high=FakeTransformer(10, "-high"))
+        self.assertEqual(service.transform("hi", {})[0], "hi-high-low")
+        chain = service.plugins
+        self.assertIs(service.chain.ordered(service.loaded_plugins), service.chain._ordered)
+        self.assertEqual(service.plugins, chain)
+        # recomputed once the plugins change
+        service.loaded_plugins["top"] = FakeTransformer(50, "-top")
+        self.assertEqual(service.transform("hi", {})[0], "hi-top-high-low")
+
+    def test_timeout(self):
+        hang = Event()
+        self.addCleanup(hang.set)
+        service = self.make_service({"slow": {"timeout": 0.05}},
+                                    slow=FakeTransformer(10, "-slow", hang=hang),
+                                    fast=FakeTransformer(1, "-fast"))
+        self.assertEqual(service.transform("hi", {})[0], "hi-fast")
+        stats = service.stats
+        self.assertEqual(stats["slow"]["timeouts"], 1)
+        self.assertEqual(stats["fast"]["calls"], 1)
+        self.assertGreater(stats["slow"]["max_time"], 0.04)
+
+    def test_circuit_breaker(self):
+        broken = FakeTransformer(10, "-broken", fail=True)
+        service = self.make_service({"max_failures": 2, "cooldown": 60},
+                                    broken=broken, ok=FakeTransformer(1, "-ok"))
+        for _ in range(4):
+            self.assertEqual(service.transform("hi", {})[0], "hi-ok")
+        self.assertEqual(broken.calls, 2)
+        self.assertTrue(service.stats["broken"]["disabled"])
+        self.assertEqual(service.stats["broken"]["skipped"], 2)
+        # retried after the cooldown
+        service.chain._stats["broken"]["disabled_until"] = 0
+        broken.fail = False
+        self.assertEqual(service.transform("hi", {})[0], "hi-broken-ok")
+        self.assertFalse(service.stats["broken"]["disabled"])
+
+    def test_memo_cache(self):
+        cacheable = FakeTransformer(10, "-a")
+        cacheable.cacheable = True
+        cacheable.cache_context_keys = ["persona"]
+        service = self.make_service({"cache": {"max_entries": 2, "ttl": 60}}, a=cacheable)
+        self.assertEqual(service.transform("hi", {"persona": "x"})[0], "hi-a")
+        self.assertEqual(service.transform("hi", {"persona": "x", "other": 1})[0], "hi-a")
+        self.assertEqual(cacheable.calls, 1)
+        # relevant context changed
+        service.transform("hi", {"persona": "y"})
+        self.assertEqual(cacheable.calls, 2)
+        self.assertEqual(service.cache.stats["hits"], 1)
+
+        # a non deterministic plugin disables the cache
+        service.loaded_plugins["b"] = FakeTransformer(1, "-b")
+        service.transform("hi", {"persona": "x"})
+        service.transform("hi", {"persona": "x"})
+        self.assertEqual(cacheable.calls, 4)
+
+    def test_memo_cache_ttl(self):
+        cacheable = FakeTransformer(10, "-a")
+        service = self.make_service({"cache": {"ttl": 0}, "a": {"cacheable": True}},
+                                    a=cacheable)
+        service.transform("hi", {})
+        service.transform("hi", {})
+        self.assertEqual(cacheable.calls, 2)
+
+
+class FakeWavTransformer:
+    priority = 50
+
+    def __init__(self):
+        self.calls = 0
+
+    def transform(self, wav_file, context=None):
+        self.calls += 1
+        out = wav_file.replace(".wav", ".tmp.wav")
+        with open(wav_file, "rb") as f, open(out, "wb") as o:
+            o.write(f.read()[::-1])
+        return out, dict(context, reversed=True)
+
+    def shutdown(self):
+        pass
+
+
+class TestTTSTransformersCache(unittest.TestCase):
+    def test_cache(self):
+        wav = os.path.join(mkdtemp(), "abc.wav")
+        with open(wav, "wb") as f:
+            f.write(b"0123")
+        plugin = FakeWavTransformer()
+        service = TTSTransformersService(config={"reverse": {"gain": 1}})
+        self.assertTrue(service.is_cached(wav))  # nothing to transform
+        service.loaded_plugins = {"reverse": plugin}
+        self.assertFalse(service.is_cached(wav))
+
+        path, ctx = service.transform(wav, {"session": 1}, cache=True)
+        self.assertEqual(ctx, {"session": 1, "reversed": True})
+        self.assertTrue(service.is_cached(wav))
+        path2, ctx2 = service.transform(wav, {"session": 2}, cache=True)
+        self.assertEqual(plugin.calls, 1)
+        self.assertEqual(os.path.dirname(path2), os.path.dirname(wav))
+        with open(path2, "rb") as f:
+            self.assertEqual(f.read(), b"3210")
+        # only keys changed by the plugins are restored
+        self.assertEqual(ctx2, {"session": 2, "reversed": True})
+
+        # different plugin config, different cache entry
+        service.config = {"reverse": {"gain": 2}}
+        service.loaded_plugins = {"reverse": FakeWavTransformer()}
+        service.transform(wav, {}, cache=True)
+        self.assertEqual(service.loaded_plugins["reverse"].calls, 1)
+
+
+class FakeGainTransformer:
+    def __init__(self, priority, gain):
+        self.priority = priority
+        self.gain = gain
+
+    def transform_buffer(self, samples, sample_rate, context=None):
+        return samples * self.gain, sample_rate, dict(context, gain=self.gain)
+
+    def transform(self, wav_file, context=None):
+        raise AssertionError("buffer api should be used")
+
+    def shutdown(self):
+        pass
+
+
+class FakeLegacyTransformer:
+    priority = 1
+
+    def transform(self, wav_file, context=None):
+        self.seen = wav_file
+        return wav_file, context
+
+    def shutdown(self):
+        pass
+
+
+@unittest.skipIf(np is None, "numpy not installed")
+class TestTTSTransformersBuffer(unittest.TestCase):
+    def make_wav(self):
+        wav = os.path.join(mkdtemp(), "abc.wav")
+        with wave.open(wav, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(16000)
+            w.writeframes(np.full(1600, 1000, dtype="<i2").tobytes())
+        return wav
+
+    def read(self, path):
+        with wave.open(path, "rb") as w:
+            return np.frombuffer(w.readframes(w.getnframes()), dtype="<i2"), w.getframerate()
+
+    def test_buffer_chain(self):
+        wav = self.make_wav()
+        service = TTSTransformersService(config={})
+        legacy = FakeLegacyTransformer()
+        service.loaded_plugins = {"double": FakeGainTransformer(50, 2.0),
+                                  "half_again": FakeGainTransformer(40, 1.5),
+                                  "legacy": legacy}
+        with mock.patch("ovos_audio.transformers.write_audio_buffer",
+                        wraps=write_audio_buffer) as write:
+            path, ctx = service.transform(wav, {})
+            # decoded once, written once for the path based plugin at the end of the chain
+            self.assertEqual(write.call_count, 1)
+        self.assertEqual(legacy.seen, path)
+        self.assertEqual(ctx["gain"], 1.5)
+        samples, rate = self.read(path)
+        self.assertEqual(rate, 16000)
+        self.assertTrue(abs(int(samples[0]) - 3000) <= 1)
+        # the source is untouched
+        self.assertEqual(int(self.read(wav)[0][0]), 1000)
+
+    def test_unique_output(self):
+        wav = self.make_wav()
+        scratch = mkdtemp()
+        service = TTSTransformersService(config={}, scratch_dir=scratch)
+        service.loaded_plugins = {"double": FakeGainTransformer(50, 2.0)}
+        # eg. a prefetch and a speak of the same sentence at the same time
+        path, _ = service.transform(wav, {})
+        path2, _ = service.transform(wav, {})
+        self.assertNotEqual(path, path2)
+        # nothing is written next to the source, it may be a read only package
+        self.assertEqual(os.path.dirname(path), scratch)
+        self.assertEqual(os.listdir(os.path.dirname(wav)), ["abc.wav"])
+        # cached results are moved next to the TTS cache entry
+        cached, _ = service.transform(wav, {}, cache=True)
+        self.assertEqual(os.path.dirname(cached), os.path.dirname(wav))
+        self.assertEqual(len(os.listdir(scratch)), 2)
+
+
+    def test_timeout_does_not_overwrite(self):
+        wav = self.make_wav()
+        done = Event()
+
+        class SlowLegacyTransformer(FakeLegacyTransformer):
+            def transform(self, wav_file, context=None):
+                sleep(0.3)
+                with open(wav_file, "wb") as f:  # eg. a plugin converting in place
+                    f.write(b"garbage")
+                done.set()
+                return wav_file, context
+
+        service = TTSTransformersService(config={"slow": {"timeout": 0.05}},
+                                         scratch_dir=mkdtemp())
+        service.loaded_plugins = {"double": FakeGainTransformer(50, 2.0),
+                                  "slow": SlowLegacyTransformer()}
+        path, _ = service.transform(wav, {})
+        self.assertTrue(done.wait(2))
+        # the abandoned call wrote to its own file, not to the result
+        samples, rate = self.read(path)
+        self.assertTrue(abs(int(samples[0]) - 2000) <= 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import inspect
+import os
+import unittest
+from tempfile import mkdtemp
+from threading import Lock, Thread
+from time import sleep
+
+from ovos_audio.tts import TTSWorkerPool, limit_synth
+"""Tests for the TTS worker process pool."""
+
+
+class PidTTS:
+    """fake engine, writes the pid of the process doing the synthesis"""
+
+    def get_tts(self, sentence, wav_file, lang=None):
+        with open(wav_file, "w") as f:
+            f.write(f"{os.getpid()} {sentence} {lang}")
+        return wav_file, None
+
+    def shutdown(self):
+        pass
+
+
+def make_tts(config):
+    return PidTTS()
+
+
+class TestLimitSynth(unittest.TestCase):
+    def test_limit(self):
+        class SlowTTS(PidTTS):
+            running = peak = 0
+            lock = Lock()
+
+            def get_tts(self, sentence, wav_file, lang=None):
+                with self.lock:
+                    SlowTTS.running += 1
+                    SlowTTS.peak = max(SlowTTS.peak, SlowTTS.running)
+                sleep(0.05)
+                with self.lock:
+                    SlowTTS.running -= 1
+                return wav_file, None
+
+        tts = limit_synth(SlowTTS(), 2)
+        # TTS._get_ctxt filters kwargs by the plugin signature
+        self.assertIn("lang", inspect.signature(tts.get_tts).parameters)
+        threads = [Thread(target=tts.get_tts, args=("hello", f"{i}.wav")) for i in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+        self.assertEqual(SlowTTS.peak, 2)
+
+
+class TestWorkerPool(unittest.TestCase):
+    def test_synth_in_worker(self):
+        tts = PidTTS()
+        pool = TTSWorkerPool({}, size=1, warmup=True, factory=make_tts)
+        pool.attach(tts)
+        try:
+            wav = os.path.join(mkdtemp(), "test.wav")
+            path, phonemes = tts.get_tts("hello world", wav, lang="en-us")
+            self.assertEqual(path, wav)
+            with open(wav) as f:
+                pid, text = f.read().split(" ", 1)
+            self.assertNotEqual(int(pid), os.getpid())
+            self.assertEqual(text, "hello world en-us")
+        finally:
+            tts.shutdown()
+
+    def test_restart_after_crash(self):
+        tts = PidTTS()
+        pool = TTSWorkerPool({}, size=1, warmup=False, max_restarts=1, factory=make_tts)
+        pool.attach(tts)
+        try:
+            for p in list(pool._executor._processes.values()):
+                p.kill()
+            wav = os.path.join(mkdtemp(), "test.wav")
+            path, _ = tts.get_tts("hello", wav)
+            self.assertEqual(path, wav)
+        finally:
+            tts.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -21,7 +21,7 @@ from os.path import exists
 
 from ovos_utils.signal import create_signal, check_for_signal
 from ovos_utils.file_utils import get_temp_path
-from ovos_audio.utils import wait_while_speaking, is_speaking, stop_speaking
+from ovos_audio.utils import wait_while_speaking, is_speaking, stop_speaking, split_sentences
 """Tests for public audio service utils."""
 
 
@@ -74,5 +74,18 @@ class TestInterface(unittest.TestCase):
         mock_send.assert_not_called()
 
 
+class TestSplitSentences(unittest.TestCase):
+    def test_split(self):
+        self.assertEqual(split_sentences("Hello there. How are you?", "en-us"),
+                         ["Hello there.", "How are you?"])
+        self.assertEqual(split_sentences("今日は晴れです。明日は雨でしょう。", "ja-jp"),
+                         ["今日は晴れです。", "明日は雨でしょう。"])
+        self.assertEqual(split_sentences("   ", "en-us"), [])
+
+    def test_ssml_untouched(self):
+        ssml = "<speak>Hello there. <break time='1s'/> How are you?</speak>"
+        self.assertEqual(split_sentences(ssml, "en-us"), [ssml])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,106 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+import unittest.mock as mock
+from threading import Event, Thread
+
+from ovos_plugin_manager.templates.g2p import OutOfVocabulary
+from time import sleep
+
+from ovos_audio.visemes import VisemeService
+
+
+def wait_for(predicate, timeout=5):
+    for _ in range(int(timeout / 0.01)):
+        if predicate():
+            return True
+        sleep(0.01)
+    return False
+
+
+@mock.patch("ovos_audio.visemes.OVOSG2PFactory")
+class TestVisemeService(unittest.TestCase):
+    def test_no_module(self, factory):
+        visemes = VisemeService({})
+        factory.create.assert_not_called()
+        self.assertIsNone(visemes.get("hello", "en-us"))
+        self.assertIsNone(visemes.submit("hello", "en-us"))
+        visemes.shutdown()
+
+    def test_cache(self, factory):
+        g2p = factory.create.return_value
+        g2p.utterance2visemes.return_value = [("4", 0.2)]
+        visemes = VisemeService({"module": "A", "cache_size": 1})
+        visemes.add_consumer("enclosure")
+        self.assertEqual(visemes.submit("hello", "en-us").result(), [("4", 0.2)])
+        self.assertEqual(visemes.get("hello", "en-us"), [("4", 0.2)])
+        self.assertEqual(g2p.utterance2visemes.call_count, 1)
+        # bounded, the oldest entry is computed again
+        visemes.get("bye", "en-us")
+        visemes.get("hello", "en-us")
+        self.assertEqual(g2p.utterance2visemes.call_count, 3)
+        # unknown words are cached too
+        g2p.utterance2visemes.side_effect = OutOfVocabulary
+        self.assertIsNone(visemes.get("zzz", "en-us"))
+        self.assertIsNone(visemes.get("zzz", "en-us"))
+        self.assertEqual(g2p.utterance2visemes.call_count, 4)
+        visemes.shutdown()
+
+    def test_lazy_load(self, factory):
+        factory.create.return_value.utterance2visemes.return_value = [("4", 0.2)]
+        visemes = VisemeService({"module": "A", "idle_timeout": 0.1})
+        # nothing displays visemes, nothing is loaded or computed
+        self.assertIsNone(visemes.get("hello", "en-us"))
+        factory.create.assert_not_called()
+
+        visemes.add_consumer("enclosure")
+        self.assertEqual(visemes.get("hello", "en-us"), [("4", 0.2)])
+        self.assertIsNotNone(visemes.g2p)
+        # unloaded once idle, loaded again when needed
+        self.assertTrue(wait_for(lambda: visemes.g2p is None))
+        visemes.get("bye", "en-us")
+        self.assertEqual(factory.create.call_count, 2)
+
+        visemes.remove_consumer("enclosure")
+        self.assertIsNone(visemes.g2p)
+        self.assertIsNone(visemes.submit("hello", "en-us"))
+        visemes.shutdown()
+
+    def test_unload_while_computing(self, factory):
+        computing, release = Event(), Event()
+        g2p = factory.create.return_value
+
+        def utterance2visemes(utt, lang):
+            computing.set()
+            release.wait(5)
+            return [("4", 0.2)]
+
+        g2p.utterance2visemes.side_effect = utterance2visemes
+        visemes = VisemeService({"module": "A"})
+        visemes.add_consumer("gui")
+        t = Thread(target=visemes.get, args=("hello", "en-us"), daemon=True)
+        t.start()
+        self.assertTrue(computing.wait(5))
+        unload = Thread(target=visemes.remove_consumer, args=("gui",), daemon=True)
+        unload.start()
+        unload.join(0.1)
+        # waits for the computation before shutting the plugin down
+        g2p.shutdown.assert_not_called()
+        release.set()
+        unload.join(5)
+        g2p.shutdown.assert_called_once()
+        visemes.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
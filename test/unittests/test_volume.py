@@ -0,0 +1,59 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+
+from ovos_utils.messagebus import Message, FakeBus
+
+from ovos_audio.volume import VolumeCache
+
+
+class TestVolumeCache(unittest.TestCase):
+    def setUp(self):
+        self.bus = FakeBus()
+        self.polls = []
+
+        def answer(message):
+            self.polls.append(message)
+            self.bus.emit(message.response({"percent": 42, "muted": False}))
+
+        self.bus.on("mycroft.volume.get", answer)
+        self.volume = VolumeCache(self.bus, max_age=30, timeout=0.3)
+
+    def test_poll_when_stale(self):
+        self.assertFalse(self.volume.is_fresh)
+        self.assertEqual(self.volume.get(), (42, False))
+        self.assertEqual(len(self.polls), 1)
+        # answered from the cache
+        self.assertEqual(self.volume.get(), (42, False))
+        self.assertEqual(len(self.polls), 1)
+
+    def test_events(self):
+        self.bus.emit(Message("mycroft.volume.get.response", {"percent": 10, "muted": False}))
+        self.bus.emit(Message("mycroft.volume.mute"))
+        self.assertEqual(self.volume.get(), (10, True))
+        self.bus.emit(Message("mycroft.volume.set", {"percent": 70}))
+        self.bus.emit(Message("mycroft.volume.unmute"))
+        self.assertEqual(self.volume.get(), (70, False))
+        self.assertEqual(len(self.polls), 0)
+        # relative change, value unknown until polled
+        self.bus.emit(Message("mycroft.volume.increase"))
+        self.assertEqual(self.volume.get(), (42, False))
+        self.assertEqual(len(self.polls), 1)
+
+    def test_no_volume_service(self):
+        self.bus.remove_all_listeners("mycroft.volume.get")
+        self.assertEqual(self.volume.get(), (80, False))
+
+
+if __name__ == "__main__":
+    unittest.main()